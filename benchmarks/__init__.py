@@ -0,0 +1 @@
+"""Performance benchmarks run against large generated notebooks (see generate.py)"""
@@ -0,0 +1,46 @@
+"""
+Fixtures for the benchmarks. The notebook is generated once per session; its size can be
+changed with the NTBK_BENCH_YEARS, NTBK_BENCH_COLLECTIONS, NTBK_BENCH_TEMPLATES and
+NTBK_BENCH_FILE_SIZE environment variables.
+"""
+
+import os
+import sys
+import pytest
+from ntbk.dispatcher import Dispatcher
+from ntbk.filesystem import Filesystem
+from benchmarks.generate import generate_notebook
+
+
+def env_int(name, default):
+    """Get an int setting from the environment"""
+    return int(os.environ.get(name, default))
+
+@pytest.fixture(name='config', scope='session')
+def config_fixture(tmp_path_factory):
+    """Return a Config for a generated notebook"""
+    return generate_notebook(tmp_path_factory.mktemp('notebook'),
+        years=env_int('NTBK_BENCH_YEARS', 10),
+        collections=env_int('NTBK_BENCH_COLLECTIONS', 500),
+        templates=env_int('NTBK_BENCH_TEMPLATES', 50),
+        file_size=env_int('NTBK_BENCH_FILE_SIZE', 2000))
+
+@pytest.fixture(name='filesystem')
+def filesystem_fixture(config):
+    """Return a Filesystem that doesn't open an editor"""
+    fs_obj = Filesystem(config)
+    fs_obj.open_file_in_editor = lambda path: None
+    return fs_obj
+
+@pytest.fixture(name='dispatcher')
+def dispatcher_fixture(config, filesystem):
+    """Return a Dispatcher for the generated notebook"""
+    return Dispatcher(config, filesystem)
+
+@pytest.fixture(name='devnull', autouse=True)
+def devnull_fixture():
+    """Send output to /dev/null, so writing it is timed but capturing it isn't"""
+    stdout = sys.stdout
+    with open(os.devnull, 'w', encoding='utf-8') as sys.stdout:
+        yield
+    sys.stdout = stdout
@@ -0,0 +1,171 @@
+"""Generates synthetic notebooks for benchmarking ntbk at a realistic scale.
+
+Usage:
+    python -m benchmarks.generate PATH [--years 10] [--collections 500] [--templates 50]
+        [--file-size 2000] [--seed 0]
+"""
+
+# system imports
+import argparse
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+# app imports
+from ntbk.config import Config
+from ntbk.entities.collections import CollectionFile
+from ntbk.entities.logs import LogFile
+from ntbk.filesystem import Filesystem
+
+WORDS = ('meeting', 'notes', 'project', 'review', 'idea', 'book', 'recipe', 'travel', 'call',
+    'email', 'plan', 'draft', 'budget', 'garden', 'run', 'read', 'write', 'fix', 'deploy',
+    'design', 'lunch', 'coffee', 'weekend', 'family', 'doctor', 'invoice', 'release', 'bug')
+
+TAGS = ('#work', '#home', '#health', '#reading', '@alice', '@bob')
+
+
+def generate_notebook(path, *, years=10, collections=500, templates=50, #pylint: disable=too-many-arguments
+        file_size=2000, seed=0, end_date=None):
+    """Build a notebook folder and return a Config for it.
+    Every file and folder gets an mtime from the day it would have been written, like a
+    notebook that has been in use for years.
+
+    Arguments:
+        path -- Path object to the (empty or missing) notebook folder
+        years -- int number of years of daily logs, ending at end_date
+        collections -- int number of collections. About one in ten has a nested collection
+        templates -- int number of templates
+        file_size -- int average size of a file in bytes (actual sizes vary by +/- 50%)
+        seed -- int seed for the random content, so the same arguments build the same notebook
+        end_date -- date object of the last day of logs (defaults to today)
+    """
+    rand = random.Random(seed)
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=365 * years)
+    config = Config({
+        'ntbk_dir': str(path),
+        'editor': 'true',
+        'default_templates': {'log': {'index': 'log_default'}},
+        'template_vars': {}
+    }, Path(path) / '.config/ntbk.yml')
+    filesystem = Filesystem(config)
+
+    _generate_logs(config, filesystem, rand, (start_date, end_date), file_size)
+    _generate_collections(config, filesystem, rand, (start_date, end_date),
+        count=collections, file_size=file_size)
+    _generate_templates(filesystem, rand, templates, _timestamp(start_date))
+    _age_folders(filesystem.get_notebook_base_path())
+    return config
+
+
+def _generate_logs(config, filesystem, rand, dates, file_size):
+    """Write the log files for every day from dates[0] to dates[1]"""
+    day, end_date = dates
+    while day <= end_date:
+        mtime = _timestamp(day)
+        for name in _log_file_names(rand):
+            _write(LogFile(config, filesystem, day, name).get_path(),
+                _content(rand, file_size), mtime)
+        day += timedelta(days=1)
+
+
+def _generate_collections(config, filesystem, rand, dates, *, count, file_size): #pylint: disable=too-many-arguments
+    """Write count collections of 1-20 files each, modified on random days within dates"""
+    start_date, end_date = dates
+    span = (end_date - start_date).days
+    for number in range(count):
+        name = f'{rand.choice(WORDS)}-{number:04d}'
+        if rand.random() < 0.1:
+            name += f'/{rand.choice(WORDS)}'
+        for file_number in range(rand.randint(1, 20)):
+            mtime = _timestamp(start_date + timedelta(days=rand.randint(0, span)))
+            filename = f'{rand.choice(WORDS)}-{file_number}'
+            _write(CollectionFile(config, filesystem, name, filename).get_path(),
+                _content(rand, file_size), mtime)
+
+
+def _generate_templates(filesystem, rand, count, mtime):
+    """Write count templates, including the default log template"""
+    template_path = filesystem.get_templates_base_path()
+    _write(template_path / 'log_default.md', _template(rand), mtime)
+    for number in range(count - 1):
+        _write(template_path / f'template-{number:03d}.md', _template(rand), mtime)
+
+
+def _log_file_names(rand):
+    """Pick the files written on one day - always the index file, often more"""
+    names = ['index']
+    if rand.random() < 0.3:
+        names.append('work')
+    if rand.random() < 0.05:
+        names.append('journal/morning')
+    return names
+
+
+def _content(rand, file_size):
+    """Build markdown content of roughly the given size"""
+    target = int(file_size * rand.uniform(0.5, 1.5))
+    lines = [f'# {rand.choice(WORDS).title()}', '']
+    size = 0
+    while size < target:
+        words = rand.choices(WORDS, k=rand.randint(4, 16))
+        if rand.random() < 0.2:
+            words.append(rand.choice(TAGS))
+        line = ('- [ ] ' if rand.random() < 0.1 else '') + ' '.join(words)
+        lines.append(line)
+        size += len(line) + 1
+    return '\n'.join(lines) + '\n'
+
+
+def _template(rand):
+    """Build a template using the built in variables, a loop and a filter"""
+    return '\n'.join([
+        '# {{ today_long }}',
+        '',
+        '{% for item in ["' + '", "'.join(rand.sample(WORDS, 5)) + '"] %}',
+        '## {{ item | title }}',
+        '{% endfor %}',
+        'Created {{ now_iso }}',
+        ''])
+
+
+def _write(path, content, mtime):
+    """Write a file, creating its folders, and set its mtime"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+
+
+def _timestamp(day):
+    """Get a timestamp for the middle of the given day"""
+    return datetime.combine(day, time(12)).timestamp()
+
+
+def _age_folders(path):
+    """Set every folder's mtime to the newest mtime of its contents, deepest folders first"""
+    for folder, dirnames, filenames in os.walk(path, topdown=False):
+        mtimes = [os.stat(os.path.join(folder, name)).st_mtime for name in dirnames + filenames]
+        if mtimes:
+            os.utime(folder, (max(mtimes), max(mtimes)))
+
+
+def main():
+    """Generate a notebook from the command line"""
+    parser = argparse.ArgumentParser(description='Generate a synthetic ntbk notebook')
+    parser.add_argument('path', type=Path, help='Folder to create the notebook in')
+    parser.add_argument('--years', type=int, default=10, help='Years of daily logs')
+    parser.add_argument('--collections', type=int, default=500, help='Number of collections')
+    parser.add_argument('--templates', type=int, default=50, help='Number of templates')
+    parser.add_argument('--file-size', type=int, default=2000,
+        help='Average file size in bytes')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    generate_notebook(args.path, years=args.years, collections=args.collections,
+        templates=args.templates, file_size=args.file_size, seed=args.seed)
+    print(f'Generated notebook in {args.path}')
+
+
+if __name__ == '__main__':
+    main()
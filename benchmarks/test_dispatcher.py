@@ -0,0 +1,72 @@
+"""
+Benchmarks for the most common commands, run through Dispatcher.run like the app does
+"""
+
+from datetime import date
+from ntbk.entities.logs import LogFile
+from ntbk.entities.templates import Template
+
+
+def test_today_open(benchmark, dispatcher):
+    """Open today's existing log file"""
+    benchmark(dispatcher.run, ['today'])
+
+def test_date_create(benchmark, config, filesystem, dispatcher):
+    """Create a log file from the default template"""
+    path = LogFile(config, filesystem, date(1990, 1, 1), 'index').get_path()
+
+    def remove_file():
+        if path.exists():
+            path.unlink()
+
+    benchmark.pedantic(dispatcher.run, args=(['date', '1990-01-01'],), setup=remove_file,
+        rounds=50)
+
+def test_list_today_recursive(benchmark, dispatcher):
+    """List today's files recursively"""
+    benchmark(dispatcher.run, ['today', '--list', '--recursive'])
+
+def test_list_collection_recursive(benchmark, dispatcher, filesystem):
+    """List the largest collection recursively"""
+    name = max(filesystem.get_collection_base_path().iterdir(),
+        key=lambda path: len(list(path.iterdir()))).name
+    benchmark(dispatcher.run, ['collection', name, '--list', '--recursive'])
+
+def test_collections(benchmark, dispatcher):
+    """List all collections, with the listing cached"""
+    benchmark(dispatcher.run, ['collections'])
+
+def test_collections_uncached(benchmark, dispatcher, filesystem):
+    """List all collections with an empty listing cache"""
+    manifest_path = filesystem.manifest.get_path()
+
+    def clear_manifest():
+        filesystem.manifest.dirs = None
+        if manifest_path.exists():
+            manifest_path.unlink()
+
+    benchmark.pedantic(dispatcher.run, args=(['collections'],), setup=clear_manifest,
+        rounds=50)
+
+def test_collections_stats(benchmark, dispatcher):
+    """Count the files and bytes of every collection"""
+    benchmark(dispatcher.run, ['collections', '--stats'])
+
+def test_templates(benchmark, dispatcher):
+    """List all templates"""
+    benchmark(dispatcher.run, ['templates'])
+
+def test_jot(benchmark, dispatcher):
+    """Append a note to today's log file"""
+    benchmark(dispatcher.run, ['jot', 'a quick note from the benchmarks'])
+
+def test_grep_last_year(benchmark, dispatcher):
+    """Regex search a year of logs without an index"""
+    last_year = date.today().year - 1
+    benchmark(dispatcher.run, ['grep', r'\b[Tt]he\b', '--from', f'{last_year}-01-01',
+        '--to', f'{last_year}-12-31'])
+
+def test_template_render(benchmark, config, filesystem):
+    """Render a template"""
+    template = Template(config, filesystem, 'log_default')
+    benchmark(template.render)
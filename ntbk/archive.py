@@ -0,0 +1,521 @@
+"""Compressed packs of archived log years.
+
+`ntbk archive` packs each old year of the log (log/2015/...) into one zip file (log/2015.zip)
+and removes the loose files. The zip's central directory is the index of its members, so
+files can be listed and read from the pack without unpacking it. Filesystem reads fall back
+to the packs for files that aren't on disk, and writing to an archived day unpacks that day.
+"""
+
+# system imports
+import bisect
+import os
+import re
+import time
+from collections import namedtuple
+from datetime import date
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover - not available on windows
+    fcntl = None
+
+# app imports
+from ntbk.helpers import get_temp_path
+
+PACK_PATTERN = re.compile(r'^([0-9]{4})\.zip$')
+YEAR_PATTERN = re.compile(r'^[0-9]{4}$')
+
+# stat() result for a file inside a pack
+PackStat = namedtuple('PackStat', ['st_size', 'st_mtime', 'st_mtime_ns'])
+
+# an opened pack
+#   signature -- (mtime_ns, size) of the zip file when it was opened
+#   zip -- zipfile.ZipFile
+#   members -- dict of member name (relative to the log folder) -> ZipInfo, for files
+#   names -- sorted list of the member names of the files
+#   dirs -- set of member names of every folder in the pack
+_Pack = namedtuple('_Pack', ['signature', 'zip', 'members', 'names', 'dirs'])
+
+
+class PackEntry():
+    """A file inside a pack, with the same interface as the os.DirEntry objects yielded by
+    Filesystem.iter_markdown_files
+
+    Arguments:
+        path -- string path the file would have on disk
+        stat -- PackStat
+    """
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat = stat
+
+    def stat(self):
+        """Get the PackStat of the file"""
+        return self._stat
+
+    def is_dir(self, follow_symlinks=True): #pylint: disable=unused-argument,no-self-use
+        """Packs only yield entries for files"""
+        return False
+
+
+def get_pack_year(name):
+    """Get the year of a pack from its file name (e.g. 2015 for '2015.zip'), or None
+
+    Arguments:
+        name -- string file name
+    """
+    match = PACK_PATTERN.match(name)
+    return int(match.group(1)) if match else None
+
+
+def get_folder_year(name):
+    """Get the year of a log year folder from its name (e.g. 2015 for '2015'), or None
+
+    Arguments:
+        name -- string folder name
+    """
+    return int(name) if YEAR_PATTERN.match(name) else None
+
+
+class LogArchive():
+    """The packs of archived log years in the log folder.
+    Open packs are cached and re-opened whenever the zip file changes.
+
+    Arguments:
+        filesystem -- Filesystem instance
+
+    Attributes:
+        filesystem -- Filesystem instance
+    """
+
+    def __init__(self, filesystem):
+        self.filesystem = filesystem
+        self._packs = {}
+        self._lock = None
+
+    def get_pack_path(self, year):
+        """Get the pathlib.Path object to the pack of a year"""
+        return self.filesystem.get_log_base_path() / f'{year}.zip'
+
+    def get_years(self):
+        """Get a sorted list of the years that have a pack"""
+        try:
+            with os.scandir(self.filesystem.get_log_base_path()) as entries:
+                years = [get_pack_year(entry.name) for entry in entries]
+        except FileNotFoundError:
+            return []
+        return sorted(year for year in years if year is not None)
+
+    def get_loose_years(self):
+        """Get a sorted list of the years that have a folder of (not yet packed) log files"""
+        try:
+            with os.scandir(self.filesystem.get_log_base_path()) as entries:
+                return sorted(int(entry.name) for entry in entries
+                    if get_folder_year(entry.name) is not None and entry.is_dir())
+        except FileNotFoundError:
+            return []
+
+    def get_days(self, year):
+        """Get a sorted list of date objects for the days that are in the pack of a year"""
+        pack = self._open(year)
+        if pack is None:
+            return []
+        days = set()
+        for name in pack.dirs:
+            parts = name.split('/')
+            if len(parts) == 3:
+                try:
+                    days.add(date.fromisoformat(parts[2]))
+                except ValueError:
+                    continue
+        return sorted(days)
+
+    def get_day_entries(self, year):
+        """Get a dict of date object -> list of (relative path string, is_dir) tuples for
+        everything inside each day folder in the pack of a year, read in one pass
+
+        Arguments:
+            year -- int year
+        """
+        pack = self._open(year)
+        if pack is None:
+            return {}
+        entries = {}
+        for name in [*pack.members, *pack.dirs]:
+            parts = name.split('/')
+            if len(parts) < 4:
+                continue
+            try:
+                day_obj = date.fromisoformat(parts[2])
+            except ValueError:
+                continue
+            entries.setdefault(day_obj, []).append(('/'.join(parts[3:]), name in pack.dirs))
+        return entries
+
+    def is_file(self, path):
+        """Whether the path is a file inside a pack"""
+        located = self._locate(path)
+        return located is not None and located[1] in located[0].members
+
+    def is_dir(self, path):
+        """Whether the path is a folder inside a pack"""
+        located = self._locate(path)
+        return located is not None and located[1] in located[0].dirs
+
+    def stat(self, path):
+        """Get a PackStat for a file inside a pack. Raises FileNotFoundError if it isn't in one."""
+        located = self._locate(path)
+        if located is None or located[1] not in located[0].members:
+            raise FileNotFoundError(path)
+        return _stat(located[0].members[located[1]])
+
+    def read_bytes(self, path):
+        """Get the content of a file inside a pack. Raises FileNotFoundError if it isn't in one."""
+        located = self._locate(path)
+        if located is None or located[1] not in located[0].members:
+            raise FileNotFoundError(path)
+        pack, name = located
+        # reads of a shared ZipFile seek its file, so only one thread can read at a time
+        with self._get_lock():
+            return pack.zip.read(pack.members[name])
+
+    def list_dir(self, path):
+        """Get a list of (name, is_dir) tuples for the entries of a folder inside a pack,
+        sorted by name. Folders that aren't in a pack have no entries.
+
+        Arguments:
+            path -- Path object to a folder
+        """
+        located = self._locate(path, folder=True)
+        if located is None:
+            return []
+        pack, prefix = located
+        prefix = f'{prefix}/' if prefix else ''
+        entries = {(name[len(prefix):], False) for name in pack.members
+            if name.startswith(prefix) and '/' not in name[len(prefix):]}
+        entries.update((name[len(prefix):], True) for name in pack.dirs
+            if name.startswith(prefix) and name != prefix[:-1]
+            and '/' not in name[len(prefix):])
+        return sorted(entries)
+
+    def iter_markdown_files(self, path):
+        """Yield a PackEntry for every markdown file inside the packs under the given folder,
+        in order of their paths
+
+        Arguments:
+            path -- Path object or string to a folder (the log folder or one inside it)
+        """
+        log_base = self.filesystem.get_log_base_path()
+        if Path(path) == log_base:
+            packs = [(self._open(year), '') for year in self.get_years()]
+        else:
+            packs = [self._locate(path, folder=True) or (None, '')]
+
+        for pack, prefix in packs:
+            if pack is None:
+                continue
+            names = pack.names
+            if prefix:
+                # the names under a folder sort between 'folder/' and 'folder0'
+                names = names[bisect.bisect_left(names, prefix + '/'):
+                    bisect.bisect_left(names, prefix + '0')]
+            for name in names:
+                if name.endswith('.md'):
+                    yield PackEntry(os.path.join(log_base, *name.split('/')),
+                        _stat(pack.members[name]))
+
+    def pack_year(self, year):
+        """Pack the loose files of a year into its pack (merging them into an existing pack)
+        and remove them. Returns a tuple of (files packed, bytes before, bytes after), or
+        None if the files changed while they were being packed.
+
+        A file that is written to after it was packed is left on disk, where it takes
+        precedence over its copy in the pack. Symlinks are left in place.
+
+        Arguments:
+            year -- integer year
+        """
+        import zipfile
+
+        year_path = self.filesystem.get_log_base_path() / str(year)
+        loose = _scan_tree(year_path, str(year))
+        pack_path = self.get_pack_path(year)
+        tmp_path = get_temp_path(pack_path)
+
+        loose_names = {name for name, _path, _signature in loose}
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as out:
+            self._copy_members(year, out, lambda name: name not in loose_names)
+            for name, path, signature in loose:
+                _write_member(out, name, path, signature)
+
+        # don't replace anything that was written while the pack was being made
+        if _scan_tree(year_path, str(year)) != loose:
+            tmp_path.unlink()
+            return None
+
+        self._forget(year)
+        os.replace(tmp_path, pack_path)
+        for _name, path, signature in reversed(loose):
+            if signature is None:
+                _remove_empty_dir(path)
+            else:
+                _remove_packed_file(path, signature)
+        _remove_empty_dir(year_path)
+        files = [signature for _name, _path, signature in loose if signature is not None]
+        return len(files), sum(size for _mtime_ns, size in files), pack_path.stat().st_size
+
+    def unpack(self, path):
+        """Unpack the archived day a path belongs to, so it can be written to. The day's
+        files are written back to disk (with their modification times) and removed from
+        the pack. Returns True if anything was unpacked.
+
+        Arguments:
+            path -- Path object to a log file or folder
+        """
+        day_obj = self.filesystem.get_log_date_for_path(path)
+        if day_obj is None or not self.get_pack_path(day_obj.year).exists():
+            return False
+        log_base = self.filesystem.get_log_base_path()
+        pack = self._open(day_obj.year)
+        prefix = self.filesystem.get_log_date_path(day_obj).relative_to(log_base).as_posix()
+        if pack is None or prefix not in pack.dirs:
+            return False
+
+        import zipfile
+
+
+        def in_day(name):
+            return name == prefix or name.startswith(prefix + '/')
+
+        for name in sorted(pack.dirs):
+            if in_day(name):
+                log_base.joinpath(*name.split('/')).mkdir(parents=True, exist_ok=True)
+        for name, info in pack.members.items():
+            path = log_base.joinpath(*name.split('/'))
+            # a file left on disk when the year was packed is newer than its packed copy
+            if in_day(name) and not path.exists():
+                _extract_member(pack.zip, info, path)
+
+        pack_path = self.get_pack_path(day_obj.year)
+        tmp_path = get_temp_path(pack_path)
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as out:
+            kept = self._copy_members(day_obj.year, out, lambda name: not in_day(name))
+        self._forget(day_obj.year)
+        # the year and month folders alone aren't worth keeping the pack for
+        if any(name.count('/') >= 2 for name in kept):
+            os.replace(tmp_path, pack_path)
+        else:
+            tmp_path.unlink()
+            pack_path.unlink()
+        return True
+
+    def close(self):
+        """Close every open pack"""
+        for year in list(self._packs):
+            self._forget(year)
+
+    def _copy_members(self, year, out, keep):
+        """Copy the members of a year's pack for which keep(name) is true into another
+        zip file. Returns a list of the names copied.
+
+        Arguments:
+            year -- integer year
+            out -- zipfile.ZipFile open for writing
+            keep -- callable taking a member name
+        """
+        pack = self._open(year)
+        if pack is None:
+            return []
+        copied = []
+        for info in pack.zip.infolist():
+            if keep(info.filename.rstrip('/')):
+                out.writestr(info, pack.zip.read(info))
+                copied.append(info.filename.rstrip('/'))
+        return copied
+
+    def _relative_parts(self, path):
+        """Get the parts of a path relative to the log folder, or None if it's not in it"""
+        try:
+            return Path(path).relative_to(self.filesystem.get_log_base_path()).parts
+        except ValueError:
+            return None
+
+    def _locate(self, path, folder=False):
+        """Get (pack, member name) for a path inside a pack, or None. With folder=True the
+        year folder itself is located too, with an empty member name.
+
+        Arguments:
+            path -- Path object
+            folder -- True if the path is a folder
+        """
+        parts = self._relative_parts(path)
+        if not parts or get_folder_year(parts[0]) is None:
+            return None
+        pack = self._open(int(parts[0]))
+        if pack is None:
+            return None
+        name = '/'.join(parts)
+        if folder and name not in pack.dirs:
+            return None
+        return pack, name
+
+    def _open(self, year):
+        """Get the _Pack for a year, or None if the year isn't archived"""
+        try:
+            stat = os.stat(self.get_pack_path(year))
+        except FileNotFoundError:
+            self._forget(year)
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        pack = self._packs.get(year)
+        if pack is not None and pack.signature == signature:
+            return pack
+
+        import zipfile
+
+        self._forget(year)
+        archive = zipfile.ZipFile(self.get_pack_path(year)) #pylint: disable=consider-using-with
+        members = {}
+        dirs = set()
+        for info in archive.infolist():
+            name = info.filename.rstrip('/')
+            if info.is_dir():
+                dirs.add(name)
+            else:
+                members[name] = info
+            parts = name.split('/')
+            dirs.update('/'.join(parts[:i]) for i in range(1, len(parts)))
+        pack = self._packs[year] = _Pack(signature, archive, members, sorted(members), dirs)
+        return pack
+
+    def _forget(self, year):
+        """Close and uncache the pack of a year"""
+        pack = self._packs.pop(year, None)
+        if pack is not None:
+            pack.zip.close()
+
+    def _get_lock(self):
+        """Get the lock guarding reads of the open packs"""
+        if self._lock is None:
+            import threading
+
+            self._lock = threading.Lock()
+        return self._lock
+
+
+def _stat(info):
+    """Get the PackStat of a zip member. The exact mtime is kept in the member's comment,
+    as zip dates have a resolution of two seconds.
+    """
+    try:
+        mtime_ns = int(info.comment)
+    except ValueError:
+        mtime_ns = int(time.mktime(info.date_time + (0, 0, -1)) * 1_000_000_000)
+    return PackStat(info.file_size, mtime_ns / 1_000_000_000, mtime_ns)
+
+
+def _write_member(out, name, path, signature):
+    """Write a loose file (or folder) into a zip file, keeping its exact mtime
+
+    Arguments:
+        out -- zipfile.ZipFile open for writing
+        name -- string member name
+        path -- Path object to the file
+        signature -- (mtime_ns, size) of the file, or None for a folder
+    """
+    import zipfile
+
+    if signature is None:
+        out.writestr(name + '/', b'')
+        return
+    mtime_ns = signature[0]
+    info = zipfile.ZipInfo(name, _zip_date_time(mtime_ns / 1_000_000_000))
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.comment = str(mtime_ns).encode('ascii')
+    out.writestr(info, path.read_bytes())
+
+
+def _extract_member(archive, info, path):
+    """Write a zip member back to disk with its original mtime
+
+    Arguments:
+        archive -- zipfile.ZipFile
+        info -- ZipInfo of the member
+        path -- Path object to write it to
+    """
+    path.write_bytes(archive.read(info))
+    mtime_ns = _stat(info).st_mtime_ns
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _zip_date_time(mtime):
+    """Get the zip date_time tuple for a timestamp. Zip files can't hold dates before 1980."""
+    return max(time.localtime(mtime)[:6], (1980, 1, 1, 0, 0, 0))
+
+
+def _scan_tree(path, name):
+    """Get a sorted list of (member name, Path, (mtime_ns, size)) for every file under a
+    folder, and (member name, Path, None) for every folder, with names relative to the log
+    folder
+
+    Arguments:
+        path -- Path object to the folder
+        name -- member name of the folder
+    """
+    found = []
+    try:
+        with os.scandir(path) as entries:
+            entries = list(entries)
+    except FileNotFoundError:
+        return found
+    for entry in sorted(entries, key=lambda entry: entry.name):
+        entry_name = f'{name}/{entry.name}'
+        if entry.is_symlink():
+            # links (and whatever they point to) stay where they are
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            found.append((entry_name, Path(entry.path), None))
+            found.extend(_scan_tree(Path(entry.path), entry_name))
+        else:
+            stat = entry.stat()
+            found.append((entry_name, Path(entry.path), (stat.st_mtime_ns, stat.st_size)))
+    return found
+
+
+def _remove_packed_file(path, signature):
+    """Remove a loose file that was packed, unless it was written to since. The file is
+    locked the same way Filesystem.append_to_file locks it, so an append either happens
+    before the check (and the file is kept) or goes to a new file after it's removed.
+
+    Arguments:
+        path -- Path object to the file
+        signature -- (mtime_ns, size) of the file when it was packed
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # being written to right now
+                return
+        stat = os.fstat(fd)
+        if (stat.st_mtime_ns, stat.st_size) == signature:
+            os.unlink(path)
+    finally:
+        # closing the file also releases the lock
+        os.close(fd)
+
+
+def _remove_empty_dir(path):
+    """Remove a folder if it's empty. Folders still holding files are kept."""
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
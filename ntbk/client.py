@@ -0,0 +1,131 @@
+"""Thin client that forwards a command to a running `ntbk serve` process.
+
+This module is imported on every run, so it must stay cheap: nothing is imported
+unless a server socket actually exists.
+"""
+
+# system imports
+import os
+import sys
+
+DEFAULT_SOCKET = '~/.cache/ntbk.sock'
+
+# message kinds used in both directions. Every message is a kind byte,
+# a 4 byte big endian payload length, then the payload.
+REQUEST = b'r'
+STDOUT = b'o'
+STDERR = b'e'
+EXIT = b'x'
+
+# commands that run until interrupted. They always run in the client's own process,
+# the single-threaded server would be stuck running them and Ctrl+C couldn't stop them
+LONG_RUNNING_COMMANDS = ('serve', 'watch')
+
+
+def get_socket_path(path=None):
+    """Get the expanded socket path - the given one, $NTBK_SOCKET, or the default
+
+    Arguments:
+        path -- optional string path
+    """
+    return os.path.expanduser(path or os.environ.get('NTBK_SOCKET') or DEFAULT_SOCKET)
+
+
+def write_message(file, kind, payload):
+    """Write one framed message to a binary file object
+
+    Arguments:
+        file -- binary file object (e.g. from socket.makefile)
+        kind -- one of the message kind bytes
+        payload -- bytes
+    """
+    file.write(kind + len(payload).to_bytes(4, 'big') + payload)
+
+
+def read_message(file):
+    """Read one framed message from a binary file object.
+    Returns (kind, payload), or (None, None) if the other side closed the connection.
+
+    Arguments:
+        file -- binary file object
+    """
+    header = file.read(5)
+    if len(header) < 5:
+        return None, None
+    payload = file.read(int.from_bytes(header[1:], 'big'))
+    return header[:1], payload
+
+
+def forward(argv, socket_path=None, stdin=None, stdout=None, stderr=None):
+    """Run the command on the server if one is running.
+    Returns the command's exit code, or None if there is no server to forward to.
+
+    Arguments:
+        argv -- list of arguments (usually sys.argv[1:])
+        socket_path -- optional path to the server socket
+        stdin -- text file object for 'jot -' (default sys.stdin)
+        stdout -- binary file object for the output (default sys.stdout.buffer)
+        stderr -- binary file object for errors (default sys.stderr.buffer)
+    """
+    socket_path = get_socket_path(socket_path)
+    if os.environ.get('NTBK_NO_SERVER') or not os.path.exists(socket_path):
+        return None
+
+    import json
+    import socket
+
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout.buffer
+    stderr = stderr or sys.stderr.buffer
+
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+    except OSError:
+        # stale socket file or the server isn't accepting connections - run in-process
+        return None
+
+    request = {
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'tty': stdout.isatty() if hasattr(stdout, 'isatty') else False,
+        'stdin': stdin.read() if '-' in argv else None
+    }
+
+    with sock, sock.makefile('rwb') as conn:
+        write_message(conn, REQUEST, json.dumps(request).encode('utf-8'))
+        conn.flush()
+        sock.shutdown(socket.SHUT_WR)
+
+        while True:
+            kind, payload = read_message(conn)
+            if kind == STDOUT:
+                stdout.write(payload)
+            elif kind == STDERR:
+                stderr.write(payload)
+            elif kind == EXIT:
+                result = json.loads(payload)
+                break
+            else:
+                # the command may already have run, so don't run it again in-process
+                stderr.write(b'ntbk server closed the connection\n')
+                return 1
+
+    stdout.flush()
+    stderr.flush()
+    return _open_in_editor(result)
+
+
+def _open_in_editor(result):
+    """Open the files the command asked for in the editor (the server can't, it has no tty).
+    Returns the exit code of the command.
+
+    Arguments:
+        result -- dict from the server's exit message
+    """
+    if result.get('open'):
+        import subprocess
+
+        for path in result['open']:
+            subprocess.run([result['editor'], path])
+    return result['code']
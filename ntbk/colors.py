@@ -0,0 +1,48 @@
+"""Colored terminal output.
+
+colorama is only imported once colored text is actually produced, so commands that
+don't print colors (and the --help output) don't pay for importing it.
+"""
+
+# system imports
+import sys
+
+_STATE = {'init_on_first_use': False, 'initialized': False}
+
+
+def init_on_first_use():
+    """Have colorama wrap stdout/stderr the first time colored text is produced.
+    This replaces calling colorama.init() up front when the app starts.
+    """
+    _STATE['init_on_first_use'] = True
+
+
+def colorize(text, color):
+    """Wrap text in the ANSI codes for the given color
+
+    Arguments:
+        text -- string (or anything that can be converted to one)
+        color -- name of a colorama.Fore color, e.g. 'blue'
+    """
+    import colorama
+
+    _init()
+    return getattr(colorama.Fore, color.upper()) + str(text) + colorama.Style.RESET_ALL
+
+
+def get_stdout():
+    """Get sys.stdout for writing colored text. colorama wraps stdout on first use, so a
+    stream taken before that would still be the unwrapped one that keeps the color codes
+    when the output isn't a terminal.
+    """
+    _init()
+    return sys.stdout
+
+
+def _init():
+    """Have colorama wrap stdout/stderr if init_on_first_use was called and it hasn't yet"""
+    if _STATE['init_on_first_use'] and not _STATE['initialized']:
+        import colorama
+
+        colorama.init()
+        _STATE['initialized'] = True
@@ -0,0 +1,272 @@
+"""Declarative definitions of every ntbk command and its arguments.
+
+The Dispatcher only turns the definitions it needs into argparse subparsers, so most
+runs only build the parser for the one command that was invoked.
+"""
+
+# system imports
+from collections import namedtuple
+
+# app imports
+from ntbk import helpers
+from ntbk.entities.collections import STATS_SORTS as COLLECTION_SORTS
+from ntbk.indexes.stats import StatsIndex
+from ntbk.listing import FORMATS as LIST_FORMATS
+
+# Command -- one subcommand of ntbk
+#   name -- string command name
+#   aliases -- tuple of string abbreviations for the command
+#   help -- string help shown in `ntbk --help`
+#   arguments -- tuple of Argument
+#   handler -- string name of the Dispatcher method that handles the command
+#   defaults -- dict of extra values set on the parsed args
+Command = namedtuple('Command', ('name', 'aliases', 'help', 'arguments', 'handler', 'defaults'))
+
+# Argument -- positional args and keyword args for ArgumentParser.add_argument()
+Argument = namedtuple('Argument', ('flags', 'options'))
+
+# Used as an argument's default to have it replaced with the configured default_filename
+DEFAULT_FILENAME = object()
+
+
+def arg(*flags, **options):
+    """Define an argument the same way as calling ArgumentParser.add_argument()"""
+    return Argument(flags, options)
+
+
+def file_args(list_help):
+    """Get the arguments shared by every command that opens a log or collection file
+
+    Arguments:
+        list_help -- string help for the --list flag
+    """
+    return (
+        arg('file', nargs='?', default=DEFAULT_FILENAME),
+        arg('--template', '-t',
+            help='If creating, this template file will be used, overriding the default template'),
+        arg('--vars', dest='variables', metavar='KEY=VALUE', nargs='+', default=[],
+            help='Extra template variables in the format key=value. '\
+                'If value contains spaces, enclose it in quotes, e.g. key="my value"'),
+        arg('--list', '-l', action='store_true', help=list_help),
+        arg('--recursive', '-r', action='store_true', help="List recursively"),
+        arg('--long', action='store_true',
+            help="With --list, show the size, modification time and emptiness of each file"),
+        arg('--format', choices=LIST_FORMATS,
+            help="Output format for --list (default is colored text)"),
+        arg('--find', '-f', action='store_true', help="Output the path to the file"),
+        arg('--find-dir', '-d', action='store_true',
+            help="Output the path to the file's directory"),
+    )
+
+
+def date_range_args(verb):
+    """Get the --from and --to arguments for commands that can be limited to some dates
+
+    Arguments:
+        verb -- string what the command does with the logs, e.g. 'search'
+    """
+    return (
+        arg('--from', dest='date_from', metavar='DATE', type=helpers.argparse_valid_iso_date,
+            help=f"Only {verb} logs on or after this date"),
+        arg('--to', dest='date_to', metavar='DATE', type=helpers.argparse_valid_iso_date,
+            help=f"Only {verb} logs on or before this date"),
+    )
+
+
+COMMANDS = (
+    Command('today', ('tod',), "Load today's log file",
+        file_args("List today's files"),
+        'handle_logfile_command', {'command': 'today'}),
+
+    Command('yesterday', ('yest',), "Load yesterday's log file",
+        file_args("List yesterday's files"),
+        'handle_logfile_command', {'command': 'yesterday'}),
+
+    Command('tomorrow', ('tom',), "Load tomorrow's log file",
+        file_args("List tomorrow's files"),
+        'handle_logfile_command', {'command': 'tomorrow'}),
+
+    Command('date', ('dt', 'd'), "Load given date's log file",
+        (arg('date', type=helpers.argparse_valid_iso_date),)
+            + file_args("List given date's files"),
+        'handle_logfile_command', {'command': 'date'}),
+
+    Command('range', (), "List or find the log files of every day in a range of dates", (
+        arg('date_from', metavar='from', type=helpers.argparse_valid_iso_date),
+        arg('date_to', metavar='to', type=helpers.argparse_valid_iso_date),
+        arg('file', nargs='?', help="Only include this file from each day (e.g. 'work')"),
+        arg('--list', '-l', action='store_true', help="List the files of each day (the default)"),
+        arg('--recursive', '-r', action='store_true', help="Include files in subdirectories"),
+        arg('--find', '-f', action='store_true', help="Output the path to each file"),
+    ), 'handle_range_command', {}),
+
+    Command('create', (),
+        "Create log files for a range of dates, or collection files listed in a manifest, "\
+            "without opening the editor", (
+        arg('--from', dest='date_from', metavar='DATE', type=helpers.argparse_valid_iso_date,
+            help="First day to create a log file for"),
+        arg('--to', dest='date_to', metavar='DATE', type=helpers.argparse_valid_iso_date,
+            help="Last day to create a log file for"),
+        arg('--file', default=DEFAULT_FILENAME, help="Name of the log file to create each day"),
+        arg('--template', '-t', help="Template to use instead of the default template"),
+        arg('--vars', dest='variables', metavar='KEY=VALUE', nargs='+', default=[],
+            help='Extra template variables in the format key=value. '\
+                'If value contains spaces, enclose it in quotes, e.g. key="my value"'),
+        arg('--manifest', '-m', metavar='FILE',
+            help="CSV or NDJSON file of collection files to create, with 'collection', 'file' "\
+                "and optional 'template' columns. Other CSV columns (or a 'vars' object in "\
+                "NDJSON) are template variables. Use - to read it from stdin"),
+        arg('--manifest-format', choices=('csv', 'ndjson'),
+            help="Format of the manifest (default is csv for .csv files, otherwise ndjson)"),
+    ), 'handle_create_command', {}),
+
+    Command('collection', ('col', 'c'), "Load given collection",
+        (arg('collection_name'),) + file_args('List the files in given collection'),
+        'handle_collection_command', {'command': 'collection'}),
+
+    Command('collections', ('cols',), "List all collections", (
+        arg('--stats', '-s', action='store_true',
+            help="Show the number of files, total size and last modified time of each"),
+        arg('--sort', choices=COLLECTION_SORTS, default='name',
+            help="Column to sort --stats by (default is name). "
+                "Files, size and modified sort largest/newest first"),
+        arg('--reverse', action='store_true', help="Reverse the --stats order"),
+    ), 'handle_list_collections_command', {}),
+
+    Command('templates', (), "List all templates", (),
+        'handle_list_templates_command', {}),
+
+    Command('jot', (), "Add a quick note to today's log without opening your editor", (
+        arg('text', help="The note to jot. Use - to read notes from stdin, one per line"),
+        arg('file', nargs='?', default=DEFAULT_FILENAME, help="Jot to file other than the default"),
+        arg('--timestamp', '-s', action='store_true',
+            help="Add a timestamp before the jotted note"),
+        arg('--ndjson', action='store_true',
+            help="When reading from stdin, each line is a JSON object with a 'text' key and "\
+                "optional 'file', 'date' and 'timestamp' keys"),
+    ), 'handle_jot_command', {}),
+
+    Command('search', (), "Full-text search of all log and collection files", (
+        arg('query', nargs='+',
+            help='Words to search for. Supports "phrases", OR, NOT and prefix* queries'),
+        *date_range_args('search'),
+        arg('--collection', '-c', help="Only search files in this collection"),
+        arg('--limit', '-n', type=int, default=20, help="Maximum number of results (default 20)"),
+        arg('--rebuild', action='store_true',
+            help="Rebuild the search index from scratch before searching"),
+        arg('--raw', action='store_true',
+            help="Use the query as SQLite FTS5 query syntax, without quoting its words"),
+    ), 'handle_search_command', {}),
+
+    Command('grep', (), "Search log and collection files with a regular expression", (
+        arg('pattern', help="Regular expression to search for"),
+        *date_range_args('search'),
+        arg('--collection', '-c', dest='collections', action='append',
+            help="Search this collection. Can be given more than once"),
+        arg('--ignore-case', '-i', action='store_true', help="Match case insensitively"),
+        arg('--files-with-matches', '-l', action='store_true',
+            help="Only output the paths of files with a match"),
+    ), 'handle_grep_command', {}),
+
+    Command('tags', (), "Show how often each #tag and @mention is used", (
+        arg('--since', metavar='DATE', type=helpers.argparse_valid_iso_date,
+            help="Only count logs on or after this date, and collection files changed since"),
+        arg('--cached', action='store_true',
+            help="Don't check the notebook for changes made outside of ntbk first"),
+    ), 'handle_tags_command', {}),
+
+    Command('tag', (), "Show every line with a #tag or @mention, in date order", (
+        arg('name', help="The tag, e.g. '#project' or '@alice'. Without # or @ both are shown"),
+        arg('--since', metavar='DATE', type=helpers.argparse_valid_iso_date,
+            help="Only show logs on or after this date, and collection files changed since"),
+        arg('--cached', action='store_true',
+            help="Don't check the notebook for changes made outside of ntbk first"),
+    ), 'handle_tag_command', {}),
+
+    Command('tasks', (), "Show the '- [ ]' tasks in the log and collections, in date order", (
+        arg('--open', '-o', action='store_true',
+            help="Only show tasks that are still open. A task copied forward to later "\
+                "days is shown once, and not at all if a later copy was ticked off"),
+        arg('--overdue', action='store_true',
+            help="Only show open tasks with a due:YYYY-MM-DD date before today"),
+        arg('--cached', action='store_true',
+            help="Don't check the notebook for changes made outside of ntbk first"),
+    ), 'handle_tasks_command', {}),
+
+    Command('recent', (), "List the files ntbk most recently opened, created or jotted to", (
+        arg('--number', '-n', type=int, default=10, help="How many to list (default 10)"),
+        arg('--open', '-o', type=int, metavar='K',
+            help="Open the K-th most recent file (1 is the most recent) in the editor"),
+        arg('--reconcile', action='store_true',
+            help="First pick up edits made outside of ntbk by checking the listed "
+                "files' modification times"),
+    ), 'handle_recent_command', {}),
+
+    Command('stats', (), "Show a heatmap of how much was written in the log each day", (
+        arg('--year', '-y', type=int,
+            help="Year to show in the heatmap (default is the current year)"),
+        arg('--metric', '-m', choices=StatsIndex.METRICS, default='words',
+            help="What to count in the heatmap (default is words)"),
+        arg('--json', action='store_true',
+            help="Output the per-day, per-month and per-year totals as JSON"),
+        arg('--cached', action='store_true',
+            help="Don't check the log for changes made outside of ntbk first"),
+    ), 'handle_stats_command', {}),
+
+    Command('export', (),
+        "Export log and collection files as JSON lines, one markdown file or tar", (
+        *date_range_args('export'),
+        arg('--collection', '-c', dest='collections', action='append',
+            help="Export this collection. Can be given more than once"),
+        arg('--format', choices=('jsonl', 'md', 'tar'), default='jsonl',
+            help="Output format (default is jsonl)"),
+        arg('--output', '-o', metavar='FILE', help="Write to this file instead of stdout"),
+        arg('--progress', action='store_true', help="Report files/s and MB/s on stderr"),
+    ), 'handle_export_command', {}),
+
+    Command('watch', (),
+        "Keep the indexes up to date with changes made outside of ntbk, e.g. in your editor", (
+        arg('--poll', action='store_true',
+            help="Check file modification times instead of using inotify"),
+        arg('--interval', type=float, default=2.0, metavar='SECONDS',
+            help="Seconds between checks when polling (default 2)"),
+        arg('--debounce', type=float, default=0.2, metavar='SECONDS',
+            help="Wait until files stop changing for this long before updating (default 0.2)"),
+    ), 'handle_watch_command', {}),
+
+    Command('archive', (),
+        "Pack old years of the log into compressed zip files. They can still be read, "
+        "listed, searched and exported, and writing to an archived day unpacks it", (
+        arg('--before', type=int, required=True, metavar='YEAR',
+            help="Pack every year before this one"),
+    ), 'handle_archive_command', {}),
+
+    Command('serve', (),
+        "Keep ntbk running in the background so other commands start instantly", (
+        arg('--socket', metavar='PATH',
+            help="Unix socket to listen on (default is $NTBK_SOCKET or ~/.cache/ntbk.sock)"),
+    ), 'handle_serve_command', {}),
+)
+
+# every command by its name and each of its aliases
+COMMANDS_BY_NAME = {name: command for command in COMMANDS
+    for name in (command.name,) + command.aliases}
+
+
+def select_commands(args):
+    """Get the commands whose subparsers are needed to parse the args: only the invoked
+    command, none if no command was given, or all of them for --help and unknown commands
+    so the help and error messages list every command.
+
+    Arguments:
+        args -- list of arguments (usually sys.argv[1:])
+    """
+    if not args:
+        return ()
+    for value in args:
+        if value in ('-h', '--help'):
+            break
+        if not value.startswith('-'):
+            command = COMMANDS_BY_NAME.get(value)
+            return (command,) if command else COMMANDS
+    return COMMANDS
@@ -1,10 +1,11 @@
 """Handles application configuration"""
 
 # system imports
+import marshal
 from pathlib import Path
 
-# 3rd party imports
-import yaml
+# app imports
+from ntbk.helpers import atomic_write
 
 
 class Config():
@@ -17,6 +18,7 @@ class Config():
         'editor': '',
         'default_filename': 'index',
         'template_dir': '_templates',
+        'lock_timeout': 10,
         'default_templates': {
             'log': {
                 'index': 'log_default'
@@ -58,9 +60,13 @@ class Config():
         self.save()
 
     def save(self):
-        """Write the config to disk"""
-        self._config_path.parent.mkdir(parents=True, exist_ok=True)
-        self._config_path.write_text(yaml.dump(self._config), encoding='utf-8')
+        """Write the config to disk, along with the parsed config cache"""
+        import yaml
+
+        dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+        atomic_write(self._config_path,
+            yaml.dump(self._config, Dumper=dumper).encode('utf-8'))
+        self._save_cache()
 
     def is_valid(self):
         """Whether or not the config file is valid"""
@@ -70,10 +76,67 @@ class Config():
         return True
 
     def load(self):
-        """Load the config yaml from disk into the config class level dict variable"""
-        if self.config_file_exists():
-            with self._config_path.open(encoding='utf-8') as file:
-                self._config = yaml.load(file, Loader=yaml.FullLoader)
+        """Load the config yaml from disk into the config class level dict variable.
+        The YAML is only parsed if the file changed since the parsed config was last cached.
+        """
+        if not self.config_file_exists():
+            return
+
+        # stat before reading, so an edit made while parsing is never cached under
+        # the new file's signature
+        stat = self._config_path.stat()
+        cached = self._load_cache(stat)
+        if cached is not None:
+            self._config = cached
+            return
+
+        import yaml
+
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        with self._config_path.open(encoding='utf-8') as file:
+            self._config = yaml.load(file, Loader=loader) or {}
+        self._save_cache(stat)
+
+    def get_cache_path(self):
+        """Get the Path to the parsed config cache that sits next to the config file"""
+        return self._config_path.with_name(self._config_path.name + '.cache')
+
+    def _load_cache(self, stat):
+        """Get the cached config dict, or None if it's missing or the config file changed
+
+        Arguments:
+            stat -- os.stat_result of the config file
+        """
+        try:
+            version, mtime_ns, size, config = marshal.loads(self.get_cache_path().read_bytes())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if (version, mtime_ns, size) != (marshal.version, stat.st_mtime_ns, stat.st_size):
+            return None
+        return config
+
+    def _save_cache(self, stat=None):
+        """Cache the parsed config, keyed by the config file's mtime and size.
+        If ntbk dies between writing the config file and the cache, the key no longer
+        matches the config file so the stale cache is ignored.
+
+        Arguments:
+            stat -- optional os.stat_result of the config file taken before it was read.
+                Nothing is cached if the file changed since.
+        """
+        current = self._config_path.stat()
+        if stat is not None and (stat.st_mtime_ns, stat.st_size) != \
+                (current.st_mtime_ns, current.st_size):
+            return
+        stat = current
+        try:
+            data = marshal.dumps((marshal.version, stat.st_mtime_ns, stat.st_size, self._config))
+        except ValueError:
+            # config has values marshal can't store (e.g. dates) - always parse the yaml
+            if self.get_cache_path().exists():
+                self.get_cache_path().unlink()
+            return
+        atomic_write(self.get_cache_path(), data)
 
     def config_file_exists(self):
         """Whether or not the config file exists on disk"""
@@ -2,19 +2,26 @@
 
 # system imports
 import argparse
-from datetime import datetime
-
-# 3rd party imports
-from colorama import Fore, Style
+import os
+import sys
+from datetime import datetime, timedelta
 
 # app imports
-from ntbk import helpers
-from ntbk.entities.collections import CollectionFile, get_all_collections
-from ntbk.entities.logs import LogFile
+from ntbk import colors, commands, helpers, listing
+from ntbk.colors import colorize
+from ntbk.entities.collections import CollectionFile, get_all_collection_stats, \
+    get_all_collections, sort_collection_stats
+from ntbk.entities.logs import LogFile, iter_log_day_entries
 from ntbk.entities.templates import Template, get_all_templates
+from ntbk.indexes.search import SearchIndex, quote_query
+from ntbk.indexes.stats import StatsIndex, render_heatmap
+from ntbk.indexes.tags import TagIndex
+from ntbk.indexes.tasks import MARKERS as TASK_MARKERS, TaskIndex
+from ntbk.profiling import span
+from ntbk.recent import RecentFiles
 
 
-class Dispatcher():
+class Dispatcher(): #pylint: disable=too-many-instance-attributes,too-many-public-methods
     """Parses arguments to the program and handles them appropriately.
 
     Arguments:
@@ -24,30 +31,32 @@ class Dispatcher():
     Attributes:
         config - Config used by the dispatcher
         filesystem - Filesystem used by the dispatcher
-        parser - ArgumentParser
-        subparsers - action object with add_parser() method
+        search_index - SearchIndex kept up to date with files written by the dispatcher
+        stats_index - StatsIndex kept up to date with files written by the dispatcher
+        tag_index - TagIndex kept up to date with files written by the dispatcher
+        task_index - TaskIndex kept up to date with files written by the dispatcher
+        recent_files - RecentFiles recording the files opened, created and jotted to
+        parser - ArgumentParser used for the last run, with subparsers for only the
+            commands it needed (see get_parser)
+        subparsers - action object with add_parser() method, of the parser attribute
     """
 
     def __init__(self, config, filesystem):
         self.config = config
         self.filesystem = filesystem
-        self.parser = argparse.ArgumentParser(prog='ntbk',
-            description='NTBK - a simple terminal notebook application')
-        # Default to the "today" command if no args given
-        self.parser.set_defaults(func=self.handle_logfile_command,
-            file=self.config.get('default_filename'),
-            list=False,
-            find=False,
-            find_dir=False,
-            template=None,
-            variables=[])
-
-        self.subparsers = self.parser.add_subparsers(dest='command')
-
-        # setup subparsers
-        self.configure_log_args()
-        self.configure_collection_args()
-        self.configure_other_args()
+        self.search_index = SearchIndex(config, filesystem)
+        self.filesystem.add_listener(self.search_index.on_file_written)
+        self.stats_index = StatsIndex(config, filesystem)
+        self.filesystem.add_listener(self.stats_index.on_file_written)
+        self.tag_index = TagIndex(config, filesystem)
+        self.filesystem.add_listener(self.tag_index.on_file_written)
+        self.task_index = TaskIndex(config, filesystem)
+        self.filesystem.add_listener(self.task_index.on_file_written)
+        self.recent_files = RecentFiles(filesystem)
+        self.filesystem.add_listener(self.recent_files.on_file_used)
+        self.parser = None
+        self.subparsers = None
+        self._parsers = {}
 
     def run(self, sys_args):
         """Parse the args passed into the program and call the appropriate handler function
@@ -55,9 +64,61 @@ class Dispatcher():
         Arguments:
             sys_args -- list of arguments (usually from sys.argv)
         """
+        with span('build parser'):
+            self.parser, self.subparsers = self.get_parser(commands.select_commands(sys_args))
         args = self.parser.parse_args(sys_args)
         args.func(args)
 
+    def get_parser(self, selected):
+        """Get a tuple of (ArgumentParser, its subparsers action) with subparsers for only
+        the selected commands. Parsers are cached, so a long running process only builds
+        each one once.
+
+        Arguments:
+            selected -- tuple of commands.Command
+        """
+        key = tuple(command.name for command in selected)
+        if key not in self._parsers:
+            self._parsers[key] = self._build_parser(selected)
+        return self._parsers[key]
+
+    def _build_parser(self, selected):
+        """Build an ArgumentParser with subparsers for the selected commands.
+        Returns a tuple of (parser, subparsers action).
+
+        Arguments:
+            selected -- tuple of commands.Command
+        """
+        parser = argparse.ArgumentParser(prog='ntbk', formatter_class=_help_formatter,
+            description='NTBK - a simple terminal notebook application')
+        # Default to the "today" command if no args given
+        parser.set_defaults(func=self.handle_logfile_command,
+            file=self.config.get('default_filename'),
+            list=False,
+            find=False,
+            find_dir=False,
+            long=False,
+            format=None,
+            template=None,
+            variables=[])
+
+        # only here for --help, ntbk.main takes it out of the args before they are parsed
+        parser.add_argument('--profile', nargs='?', const='1', metavar='FILE',
+            help="Print how long each phase of the run took on stderr. Use --profile=FILE "\
+                "to also write cProfile stats to FILE and report peak memory")
+
+        subparsers = parser.add_subparsers(dest='command')
+        for command in selected:
+            subparser = subparsers.add_parser(command.name, aliases=list(command.aliases),
+                help=command.help, formatter_class=_help_formatter)
+            for argument in command.arguments:
+                options = dict(argument.options)
+                if options.get('default') is commands.DEFAULT_FILENAME:
+                    options['default'] = self.config.get('default_filename')
+                subparser.add_argument(*argument.flags, **options)
+            subparser.set_defaults(func=getattr(self, command.handler), **command.defaults)
+        return parser, subparsers
+
     def open_or_create_entity(self, args, entity):
         """Open or create log or collection file.
 
@@ -65,45 +126,57 @@ class Dispatcher():
             args -- args from argparse
             entity - either LogFile or CollectionFile object
         """
-        template = None
-
+        self.filesystem.unarchive(entity.get_path())
         entity.create_directories()
 
         if not entity.exists():
-            if args.template:
-                template = Template(self.config, self.filesystem, args.template)
-            elif entity.has_default_template():
-                template = entity.get_default_template()
-
-            if template is not None:
-                variables = {}
-                if isinstance(entity, LogFile):
-                    variables['log_date'] = entity.get_logdate().get_date()
-                variables.update(helpers.convert_key_value_vars_to_dict(args.variables))
-                template.set_extra_vars(variables)
-                self.filesystem.create_file(entity.get_path(), template.render())
+            content = self.render_new_file(entity, args.template,
+                helpers.convert_key_value_vars_to_dict(args.variables))
+            if content is not None:
+                self.filesystem.create_file(entity.get_path(), content)
 
         self.filesystem.open_file_in_editor(entity.get_path())
 
-    def list_contents(self, entity, recursive=False): #pylint: disable=no-self-use
+    def render_new_file(self, entity, template_name=None, variables=None):
+        """Render the content of a new log or collection file from the given template,
+        or the entity's default template. Returns None if there is no template to use.
+
+        Arguments:
+            entity - either LogFile or CollectionFile object
+            template_name - optional string name of the template, overriding the default
+            variables - optional dict of extra template variables
+        """
+        if template_name:
+            template = Template(self.config, self.filesystem, template_name)
+        elif entity.has_default_template():
+            template = entity.get_default_template()
+        else:
+            return None
+
+        extra_vars = {}
+        if isinstance(entity, LogFile):
+            extra_vars['log_date'] = entity.get_logdate().get_date()
+        extra_vars.update(variables or {})
+        template.set_extra_vars(extra_vars)
+        return template.render()
+
+    def list_contents(self, entity, recursive=False, fmt=None, long=False): #pylint: disable=too-many-arguments
         """Takes a LogDate or Collection and lists its contents (files and immediate folders)
 
         Arguments:
             entity - Either LogDate or Collection
             recursive - Boolean - traverse all subdirs and print out all files
+            fmt - None for colored text, or one of listing.FORMATS
+            long - Boolean - include the size, modification time and emptiness of each entry
         """
-        if recursive:
-            for path in sorted(entity.get_contents(recursive), key=lambda p: str(p).lower()):
-                text = path.relative_to(entity.get_path())
-                if path.is_dir():
-                    text = Fore.BLUE + str(text) + '/' + Style.RESET_ALL
-                print(str(text).replace(path.suffix, ''))
-        else:
-            for path in sorted(entity.get_contents(recursive), key=lambda p: p.stem.lower()):
-                if path.is_dir():
-                    print(Fore.BLUE + path.stem + '/' + Style.RESET_ALL)
-                else:
-                    print(path.stem)
+        # only colored text needs colorama to wrap stdout before it's taken
+        out = colors.get_stdout() if fmt is None else sys.stdout
+        if long:
+            listing.write_long_listing(entity.get_metadata(recursive), entity.get_path(),
+                out, fmt)
+            return
+        entries = listing.iter_entries(self.filesystem, entity.get_path(), recursive)
+        listing.write_listing(entries, entity.get_path(), out, fmt)
 
     def handle_logfile_command(self, args):
         """Handler for commands involving log files.
@@ -120,16 +193,104 @@ class Dispatcher():
         logfile = LogFile(self.config, self.filesystem, date_obj, args.file)
 
         if args.list and args.file.endswith('/'):
-            self.list_contents(logfile, args.recursive)
+            self.list_contents(logfile, args.recursive, args.format, args.long)
         elif args.list:
-            self.list_contents(logfile.logdate, args.recursive)
+            self.list_contents(logfile.logdate, args.recursive, args.format, args.long)
         elif args.find:
+            # the path is for use outside ntbk, so it has to be on disk
+            self.filesystem.unarchive(logfile.get_path())
             print(logfile.get_path())
         elif args.find_dir:
+            self.filesystem.unarchive(logfile.get_logdate().get_path())
             print(logfile.get_logdate().get_path())
         else:
             self.open_or_create_entity(args, logfile)
 
+    def handle_range_command(self, args):
+        """Handler for the 'range' command - lists or finds log files across a range of dates
+
+        Arguments:
+            args -- Args from argparse
+        """
+        if args.date_from > args.date_to:
+            self.parser.error('the start date must not be after the end date')
+
+        days = iter_log_day_entries(self.config, self.filesystem, args.date_from, args.date_to,
+            args.recursive and args.file is None)
+        for logdate, entries in days:
+            day_path = logdate.get_path()
+            if args.file is not None:
+                entries = [entry for entry in entries
+                    if entry[0] == f'{args.file}{LogFile.EXTENSION}']
+            for name, is_dir in entries:
+                path = day_path / name
+                if args.find:
+                    if not is_dir:
+                        print(path)
+                    continue
+                if is_dir:
+                    text = colorize(name + '/', 'blue')
+                else:
+                    text = name.replace(path.suffix, '')
+                print(f'{logdate.get_date().isoformat()} {text}')
+
+    def handle_create_command(self, args):
+        """Handler for the 'create' command - creates log files for a range of dates or
+        collection files from a manifest, rendering their templates but never opening the
+        editor. Files that already exist are skipped.
+
+        Arguments:
+            args -- Args from argparse
+        """
+        variables = helpers.convert_key_value_vars_to_dict(args.variables)
+
+        if args.manifest:
+            if args.date_from or args.date_to:
+                self.parser.error('--manifest can not be combined with --from/--to')
+            to_create = self._read_create_manifest(args, variables)
+        else:
+            if not args.date_from or not args.date_to:
+                self.parser.error('--from and --to are required unless --manifest is given')
+            if args.date_from > args.date_to:
+                self.parser.error('the start date must not be after the end date')
+            days = (args.date_to - args.date_from).days + 1
+            to_create = [
+                (LogFile(self.config, self.filesystem, args.date_from + timedelta(days=day),
+                    args.file), args.template, variables)
+                for day in range(days)]
+
+        new = [item for item in to_create if not item[0].exists()]
+        created = self.filesystem.create_new_files(
+            (entity.get_path(), self.render_new_file(entity, template, entity_vars) or '')
+            for entity, template, entity_vars in new)
+
+        skipped = len(to_create) - len(created)
+        print(colorize(f'Created {len(created)} file{"" if len(created) == 1 else "s"}, '
+            f'skipped {skipped} that already existed', 'green'))
+
+    def _read_create_manifest(self, args, variables):
+        """Get a list of (CollectionFile, template name, variables) for each row of the
+        'create' command's manifest
+
+        Arguments:
+            args -- Args from argparse
+            variables -- dict of template variables from --vars
+        """
+        fmt = args.manifest_format or ('csv' if args.manifest.endswith('.csv') else 'ndjson')
+        try:
+            if args.manifest == '-':
+                rows = helpers.parse_create_manifest(sys.stdin, fmt)
+            else:
+                with open(args.manifest, encoding='utf-8', newline='') as manifest:
+                    rows = helpers.parse_create_manifest(manifest, fmt)
+        except OSError as err:
+            self.parser.error(f'could not read manifest: {err}')
+        except ValueError as err:
+            self.parser.error(f'invalid manifest {err}')
+
+        return [(CollectionFile(self.config, self.filesystem, row['collection'], row['file']),
+            row['template'] or args.template, {**variables, **row['vars']}) for row in rows]
+
     def handle_collection_command(self, args):
         """Handler for commands involving collection files.
 
@@ -140,7 +301,8 @@ class Dispatcher():
             args.collection_name, args.file)
 
         if args.list:
-            self.list_contents(collection_file.collection, args.recursive)
+            self.list_contents(collection_file.collection, args.recursive,
+                args.format, args.long)
         elif args.find:
             print(collection_file.get_path())
         elif args.find_dir:
@@ -148,15 +310,39 @@ class Dispatcher():
         else:
             self.open_or_create_entity(args, collection_file)
 
-    def handle_list_collections_command(self, _args):
+    def handle_list_collections_command(self, args):
         """Handler for the 'collections' command - lists all the collections
 
         Arguments:
-            _args -- Args from argparsed. Underscored because they are not used
+            args -- Args from argparse
         """
+        if args.stats:
+            self.print_collection_stats(args.sort, args.reverse)
+            return
         for collection in get_all_collections(self.config, self.filesystem):
             print(collection.get_name())
 
+    def print_collection_stats(self, column='name', reverse=False):
+        """Print a table of the number of files, total size and last modified time of
+        every collection
+
+        Arguments:
+            column -- string column to sort by, one of collections.STATS_SORTS
+            reverse -- True to reverse the order
+        """
+        stats = sort_collection_stats(get_all_collection_stats(self.config, self.filesystem),
+            column, reverse)
+        if not stats:
+            print('No collections found')
+            return
+        width = max(len('collection'), *(len(row.name) for row in stats))
+        print(f'{"collection":<{width}}  {"files":>6}  {"size":>6}  modified')
+        for row in stats:
+            modified = datetime.fromtimestamp(row.mtime).strftime('%Y-%m-%d %H:%M') \
+                if row.mtime is not None else '-'
+            print(f'{colorize(row.name, "blue")}{" " * (width - len(row.name))}  '
+                f'{row.files:>6}  {listing.format_size(row.bytes):>6}  {modified}')
+
     def handle_list_templates_command(self, _args):
         """Handler for the 'templates' command
 
@@ -172,186 +358,334 @@ class Dispatcher():
         Arguments:
             args -- Args from argparse
         """
+        if args.text == '-':
+            self._jot_from_stdin(args)
+            return
+
         date_obj = helpers.get_date_object_for_alias('today')
         logfile = LogFile(self.config, self.filesystem, date_obj, args.file)
-        content = args.text
-        if args.timestamp:
-            content = f"[{datetime.now().strftime('%I:%M %p')}]\n" + content
-        content = '\n\n' + content
-
-        self.filesystem.append_to_file(logfile.get_path(), content)
-        print(f"{Fore.GREEN}Jotted note to today's {logfile.get_name()} file{Style.RESET_ALL}")
+        timestamp = datetime.now() if args.timestamp else None
 
-    def configure_log_args(self):
-        """Configure all the possible args for commands involving log files"""
-        default_file = self.config.get('default_filename')
+        self.filesystem.append_to_file(logfile.get_path(), helpers.format_jot(args.text, timestamp))
+        print(colorize(f"Jotted note to today's {logfile.get_name()} file", 'green'))
 
-        # Setup subparser for 'today' command
-        parser_today = self.subparsers.add_parser('today', aliases=['tod'],
-            help="Load today's log file")
+    def _jot_from_stdin(self, args):
+        """Jot every line of stdin (or every NDJSON object with --ndjson) as a separate note.
+        Notes are grouped by log file so each file is opened and written only once.
 
-        parser_today.add_argument('file', nargs='?', default=default_file)
-
-        parser_today.add_argument('--template', '-t',
-            help='If creating, this template file will be used, overriding the default template')
-
-        parser_today.add_argument("--vars",
-            dest='variables', metavar="KEY=VALUE", nargs='+', default=[],
-            help='Extra template variables in the format key=value. \
-                 If value contains spaces, enclose it in quotes, e.g. key="my value"')
-
-        parser_today.add_argument('--list', '-l', action='store_true', help="List today's files")
-
-        parser_today.add_argument('--recursive', '-r', action='store_true', help="List recursively")
-
-        parser_today.add_argument('--find', '-f', action='store_true',
-            help="Output the path to the file")
-
-        parser_today.add_argument('--find-dir', '-d', action='store_true',
-            help="Output the path to the file's directory")
-
-        parser_today.set_defaults(command='today', func=self.handle_logfile_command)
-
-        # Setup subparser for 'yesterday' command
-        parser_yest = self.subparsers.add_parser('yesterday', aliases=['yest'],
-            help="Load yesterday's log file")
-
-        parser_yest.add_argument('file', nargs='?', default=default_file)
-
-        parser_yest.add_argument('--template', '-t',
-            help='If creating, this template file will be used, overriding the default template')
-
-        parser_yest.add_argument("--vars",
-            dest='variables', metavar="KEY=VALUE", nargs='+', default=[],
-            help='Extra template variables in the format key=value. \
-                If value contains spaces, enclose it in quotes, e.g. key="my value"')
-
-        parser_yest.add_argument('--list', '-l', action='store_true', help="List yesterday's files")
-
-        parser_yest.add_argument('--recursive', '-r', action='store_true', help="List recursively")
-
-        parser_yest.add_argument('--find', '-f', action='store_true',
-            help="Output the path to the file")
-
-        parser_yest.add_argument('--find-dir', '-d', action='store_true',
-            help="Output the path to the file's directory")
-
-        parser_yest.set_defaults(command='yesterday', func=self.handle_logfile_command)
-
-        # Setup subparser for 'tomorrow' command
-        parser_tom = self.subparsers.add_parser('tomorrow', aliases=['tom'],
-            help="Load tomorrow's log file")
-
-        parser_tom.add_argument('file', nargs='?', default=default_file)
-
-        parser_tom.add_argument('--template', '-t',
-            help='If creating, this template file will be used, overriding the default template')
+        Arguments:
+            args -- Args from argparse
+        """
+        today = helpers.get_date_object_for_alias('today')
+        grouped = {}
+
+        for line_number, line in enumerate(sys.stdin, start=1):
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if args.ndjson:
+                try:
+                    entry = helpers.parse_ndjson_jot(line)
+                except ValueError as err:
+                    self.parser.error(f'invalid NDJSON on line {line_number}: {err}')
+            else:
+                entry = {'text': line, 'file': None, 'date': None,
+                    'timestamp': datetime.now() if args.timestamp else None}
+
+            key = (entry['date'] or today, entry['file'] or args.file)
+            if key not in grouped:
+                grouped[key] = (LogFile(self.config, self.filesystem, *key), [])
+            grouped[key][1].append(helpers.format_jot(entry['text'], entry['timestamp']))
+
+        for (date_obj, _filename), (logfile, notes) in grouped.items():
+            self.filesystem.append_to_file(logfile.get_path(), ''.join(notes))
+            day = "today's" if date_obj == today else f"{date_obj.isoformat()}'s"
+            plural = '' if len(notes) == 1 else 's'
+            print(colorize(f'Jotted {len(notes)} note{plural} to {day} {logfile.get_name()} file',
+                'green'))
+
+    def handle_search_command(self, args):
+        """Handler for the 'search' command
 
-        parser_tom.add_argument("--vars",
-            dest='variables', metavar="KEY=VALUE", nargs='+', default=[],
-            help='Extra template variables in the format key=value. \
-                If value contains spaces, enclose it in quotes, e.g. key="my value"')
+        Arguments:
+            args -- Args from argparse
+        """
+        if args.rebuild:
+            self.search_index.rebuild()
+        elif not self._is_kept_up_to_date(self.search_index):
+            self.search_index.refresh()
 
-        parser_tom.add_argument('--list', '-l', action='store_true', help="List tomorrow's files")
+        query = ' '.join(args.query)
+        results = self.search_index.search(query if args.raw else quote_query(query),
+            args.date_from, args.date_to, args.collection, args.limit)
 
-        parser_tom.add_argument('--recursive', '-r', action='store_true', help="List recursively")
+        if not results:
+            print('No results found')
+        for result in results:
+            print(colorize(result.path, 'blue'))
+            print(f'    {result.snippet}')
 
-        parser_tom.add_argument('--find', '-f', action='store_true',
-            help="Output the path to the file")
+    def handle_grep_command(self, args):
+        """Handler for the 'grep' command
 
-        parser_tom.add_argument('--find-dir', '-d', action='store_true',
-            help="Output the path to the file's directory")
+        Arguments:
+            args -- Args from argparse
+        """
+        import re
+        from ntbk import grep
+        from ntbk.export import iter_export_files
+
+        try:
+            regex = grep.compile_pattern(args.pattern, args.ignore_case)
+        except re.error as err:
+            self.parser.error(f'invalid pattern: {err}')
+
+        files = iter_export_files(self.config, self.filesystem,
+            args.date_from, args.date_to, args.collections)
+        found = False
+        for file, matches in grep.grep(self.filesystem, files, regex):
+            found = True
+            if args.files_with_matches:
+                print(colorize(file.name, 'blue'))
+                continue
+            for match in matches:
+                print(f"{colorize(file.name, 'blue')}:{colorize(match.line_number, 'green')}:"
+                    f"{match.line}")
+
+        if not found:
+            print('No matches found')
+
+    def handle_tags_command(self, args):
+        """Handler for the 'tags' command
 
-        parser_tom.set_defaults(command='tomorrow', func=self.handle_logfile_command)
+        Arguments:
+            args -- Args from argparse
+        """
+        if not self._is_kept_up_to_date(self.tag_index, args.cached):
+            self.tag_index.refresh()
 
-        # Setup subparser for 'date' command
-        parser_date = self.subparsers.add_parser('date', aliases=['dt', 'd'],
-            help="Load given date's log file")
+        counts = self.tag_index.get_counts(args.since)
+        if not counts:
+            print('No tags found')
+        width = max((len(count.tag) for count in counts), default=0)
+        for count in counts:
+            print(f"{colorize(count.tag.ljust(width), 'blue')}  {count.count:>5} "
+                f"in {count.files} file{'' if count.files == 1 else 's'}")
 
-        parser_date.add_argument('date', type=helpers.argparse_valid_iso_date)
+    def handle_tag_command(self, args):
+        """Handler for the 'tag' command
 
-        parser_date.add_argument('file', nargs='?', default=default_file)
+        Arguments:
+            args -- Args from argparse
+        """
+        if not self._is_kept_up_to_date(self.tag_index, args.cached):
+            self.tag_index.refresh()
 
-        parser_date.add_argument('--template', '-t',
-            help='If creating, this template file will be used, overriding the default template')
+        lines = self.tag_index.get_lines(args.name, args.since)
+        if not lines:
+            print(f'No lines tagged {args.name}')
+        notebook_path = self.filesystem.get_notebook_base_path()
+        for line in lines:
+            name = line.path.relative_to(notebook_path).as_posix()
+            print(f"{colorize(name, 'blue')}:{colorize(line.line_number, 'green')}:{line.text}")
 
-        parser_date.add_argument("--vars",
-            dest='variables', metavar="KEY=VALUE", nargs='+', default=[],
-            help='Extra template variables in the format key=value. \
-                If value contains spaces, enclose it in quotes, e.g. key="my value"')
+    def handle_tasks_command(self, args):
+        """Handler for the 'tasks' command
 
-        parser_date.add_argument('--list', '-l', action='store_true',
-            help="List given date's files")
+        Arguments:
+            args -- Args from argparse
+        """
+        if not self._is_kept_up_to_date(self.task_index, args.cached):
+            self.task_index.refresh()
 
-        parser_date.add_argument('--recursive', '-r', action='store_true', help="List recursively")
+        if args.open or args.overdue:
+            tasks = self.task_index.get_open_tasks()
+        else:
+            tasks = self.task_index.get_tasks()
+        today = helpers.get_date_object_for_alias('today')
+        if args.overdue:
+            tasks = [task for task in tasks if task.due is not None and task.due < today]
+
+        if not tasks:
+            print('No tasks found')
+        notebook_path = self.filesystem.get_notebook_base_path()
+        for task in tasks:
+            name = task.path.relative_to(notebook_path).as_posix()
+            text = f'[{TASK_MARKERS[task.state]}] {task.text}'
+            if task.state == 'open' and task.due is not None and task.due < today:
+                text = colorize(text, 'red')
+            print(f"{colorize(name, 'blue')}:{task.line_number}: {text}")
+
+    def handle_stats_command(self, args):
+        """Handler for the 'stats' command
 
-        parser_date.add_argument('--find', '-f', action='store_true',
-            help="Output the path to the file")
+        Arguments:
+            args -- Args from argparse
+        """
+        if self._is_kept_up_to_date(self.stats_index, args.cached):
+            self.stats_index.load()
+        else:
+            self.stats_index.reconcile()
 
-        parser_date.add_argument('--find-dir', '-d', action='store_true',
-            help="Output the path to the file's directory")
+        if args.json:
+            import json
 
-        parser_date.set_defaults(command='date', func=self.handle_logfile_command)
+            print(json.dumps(self.stats_index.to_dict(), indent=2))
+            return
 
-    def configure_collection_args(self):
-        """Configure all the possible args for commands involving collection files"""
-        default_file = self.config.get('default_filename')
+        year = args.year or helpers.get_date_object_for_alias('today').year
+        for line in render_heatmap(self.stats_index, year, args.metric):
+            print(line)
 
-        # Setup subparser for 'collection' command
-        parser_collection = self.subparsers.add_parser('collection', aliases=['col', 'c'],
-            help="Load given collection")
+    def handle_export_command(self, args):
+        """Handler for the 'export' command
 
-        parser_collection.add_argument('collection_name')
+        Arguments:
+            args -- Args from argparse
+        """
+        from ntbk import export
 
-        parser_collection.add_argument('file', nargs='?', default=default_file)
+        files = export.iter_export_files(self.config, self.filesystem,
+            args.date_from, args.date_to, args.collections)
+        progress = export.Progress() if args.progress else None
 
-        parser_collection.add_argument('--template', '-t',
-            help='If creating, this template file will be used, overriding the default template')
+        if args.output:
+            with open(args.output, 'wb') as out:
+                export.export(self.filesystem, files, args.format, out, progress)
+        else:
+            export.export(self.filesystem, files, args.format, sys.stdout.buffer, progress)
 
-        parser_collection.add_argument("--vars",
-            dest='variables', metavar="KEY=VALUE", nargs='+', default=[],
-            help='Extra template variables in the format key=value. \
-                If value contains spaces, enclose it in quotes, e.g. key="my value"')
+    def handle_watch_command(self, args):
+        """Handler for the 'watch' command
 
-        parser_collection.add_argument('--list', '-l', action='store_true',
-            help='List the files in given collection')
+        Arguments:
+            args -- Args from argparse
+        """
+        from ntbk import watcher
 
-        parser_collection.add_argument('--recursive', '-r', action='store_true',
-            help="List recursively")
+        # catch up on changes made before the watcher started
+        self.refresh_indexes()
+        file_watcher = watcher.get_watcher(self.filesystem, args.poll, args.interval)
+        print(f'Watching {self.filesystem.get_notebook_base_path()} ({file_watcher.name}). '
+            'Press Ctrl+C to stop.')
 
-        parser_collection.add_argument('--find', '-f', action='store_true',
-            help="Output the path to the file")
+        def report(changed):
+            now = datetime.now().strftime('%H:%M:%S')
+            print(f'{now} updated {len(changed)} file{"" if len(changed) == 1 else "s"}',
+                flush=True)
 
-        parser_collection.add_argument('--find-dir', '-d', action='store_true',
-            help="Output the path to the file's directory")
+        try:
+            watcher.watch(self.filesystem, file_watcher, on_batch=report,
+                debounce=args.debounce, resync=self.refresh_indexes)
+        except KeyboardInterrupt:
+            pass
 
-        parser_collection.set_defaults(command='collection', func=self.handle_collection_command)
+    def handle_recent_command(self, args):
+        """Handler for the 'recent' command - lists (or opens) the files most recently
+        opened, created or jotted to
 
-        parser_collections = self.subparsers.add_parser('collections', aliases=['cols'],
-            help="List all collections")
+        Arguments:
+            args -- Args from argparse
+        """
+        if args.number < 1:
+            self.parser.error('--number must be at least 1')
+        if args.reconcile:
+            self.recent_files.reconcile()
+
+        if args.open is not None:
+            entries = self.recent_files.get_entries(max(args.open, 0))
+            if args.open < 1 or len(entries) < args.open:
+                self.parser.error(f'there is no recent file number {args.open}')
+            self.filesystem.open_file_in_editor(entries[-1].path)
+            return
+
+        entries = self.recent_files.get_entries(args.number)
+        if not entries:
+            print('No recent files')
+            return
+        notebook_path = self.filesystem.get_notebook_base_path()
+        for number, entry in enumerate(entries, 1):
+            when = datetime.fromtimestamp(entry.time_ns / 1e9).strftime('%Y-%m-%d %H:%M')
+            try:
+                path = entry.path.relative_to(notebook_path).as_posix()
+            except ValueError:
+                path = str(entry.path)
+            print(f'{number:>3}  {when}  {colorize(path, "blue")}  {entry.event}')
+
+    def handle_archive_command(self, args):
+        """Handler for the 'archive' command
 
-        parser_collections.set_defaults(func=self.handle_list_collections_command)
+        Arguments:
+            args -- Args from argparse
+        """
+        if args.before > datetime.now().year:
+            self.parser.error('the current year can not be archived')
+
+        archive = self.filesystem.archive
+        years = [year for year in archive.get_loose_years() if year < args.before]
+        if not years:
+            print(f'No loose log years before {args.before} to archive')
+            return
+        for year in years:
+            packed = archive.pack_year(year)
+            if packed is None:
+                print(f'{year}: files changed while packing, skipped. Try again')
+                continue
+            files, size_before, size_after = packed
+            print(f'{year}: packed {files} files, {size_before / 1e6:.1f} MB -> '
+                f'{size_after / 1e6:.1f} MB ({archive.get_pack_path(year)})')
+
+    def _is_kept_up_to_date(self, index, cached=False):
+        """Whether an index can be used without checking the notebook for changes first:
+        it has been built and either --cached was given or `ntbk watch` is running
 
-    def configure_other_args(self):
-        """Configure args for any other commands"""
-        default_file = self.config.get('default_filename')
+        Arguments:
+            index -- SearchIndex, TagIndex, TaskIndex or StatsIndex
+            cached -- True if --cached was given
+        """
+        if not index.exists():
+            return False
+        if cached:
+            return True
+        from ntbk import watcher
 
-        # Setup subparser for 'templates' command
-        parser_templates = self.subparsers.add_parser('templates', help="List all templates")
+        return watcher.is_running(self.filesystem)
 
-        parser_templates.set_defaults(func=self.handle_list_templates_command)
+    def refresh_indexes(self):
+        """Bring every index that has been built up to date with the notebook"""
+        for index in (self.search_index, self.tag_index, self.task_index):
+            if index.exists():
+                index.refresh()
+        if self.stats_index.exists():
+            self.stats_index.reconcile()
 
+    def handle_serve_command(self, args):
+        """Handler for the 'serve' command
 
-        # Setup subparser for 'jot' command
-        parser_jot = self.subparsers.add_parser('jot',
-            help="Add a quick note to today's log without opening your editor")
+        Arguments:
+            args -- Args from argparse
+        """
+        from ntbk import server
 
-        parser_jot.add_argument('text')
+        try:
+            server.serve(type(self), args.socket)
+        except KeyboardInterrupt:
+            pass
 
-        parser_jot.add_argument('file', nargs='?', default=default_file,
-            help="Jot to file other than the default")
 
-        parser_jot.add_argument('--timestamp', '-s', action='store_true',
-            help="Add a timestamp before the jotted note")
+def _help_formatter(prog):
+    """Get an argparse HelpFormatter as wide as the terminal.
+    argparse finds the width with shutil, which imports bz2 and lzma, and it creates
+    a formatter for every argument added - so without this each run pays for them.
 
-        parser_jot.set_defaults(func=self.handle_jot_command)
+    Arguments:
+        prog -- string program name
+    """
+    try:
+        width = int(os.environ['COLUMNS'])
+    except (KeyError, ValueError):
+        try:
+            width = os.get_terminal_size(sys.__stdout__.fileno()).columns
+        except (AttributeError, ValueError, OSError):
+            width = 80
+    return argparse.HelpFormatter(prog, width=width - 2)
@@ -1,7 +1,27 @@
 """Classes to represent Collection entities in the app"""
 
+# system imports
+import os
+from collections import namedtuple
+
 # app imports
 from ntbk.entities.templates import Template
+from ntbk.profiling import span
+
+# CollectionStats -- totals for the markdown files in a collection, including subfolders
+#   name -- string collection name
+#   files -- number of files
+#   bytes -- total size of the files in bytes
+#   mtime -- timestamp of the most recently modified file, or None if there are no files
+CollectionStats = namedtuple('CollectionStats', ['name', 'files', 'bytes', 'mtime'])
+
+# columns CollectionStats can be sorted by -> function getting the sort key
+STATS_SORTS = {
+    'name': lambda stats: stats.name.lower(),
+    'files': lambda stats: stats.files,
+    'size': lambda stats: stats.bytes,
+    'modified': lambda stats: stats.mtime or 0,
+}
 
 
 class Collection():
@@ -53,7 +73,14 @@ class Collection():
     def get_contents(self, recursive = False):
         """Gets a list of files and folders inside this collection"""
         pattern = '**/*' if recursive else '*'
-        return list(self.get_path().glob(pattern))
+        with span('glob'):
+            return list(self.get_path().glob(pattern))
+
+    def get_metadata(self, recursive=False):
+        """Get a list of filesystem.EntryMetadata (size, mtime and emptiness) for the files
+        and folders inside this collection, collected in one pass over the folder
+        """
+        return self.filesystem.list_metadata(self.get_path(), recursive)
 
     def get_files(self):
         """Get a list of CollectionFile objects for each file in this collection"""
@@ -62,7 +89,25 @@ class Collection():
 
     def get_file_count(self):
         """Get int number of files in this collection"""
-        return len(self.get_files())
+        try:
+            with os.scandir(self.get_path()) as entries:
+                return sum(1 for _entry in entries)
+        except FileNotFoundError:
+            return 0
+
+    def get_stats(self):
+        """Get the CollectionStats for this collection, from one os.scandir of each folder"""
+        files = size = 0
+        mtime = None
+        for entry in self.filesystem.iter_markdown_files(self.get_path()):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue # removed while it was counted
+            files += 1
+            size += stat.st_size
+            mtime = stat.st_mtime if mtime is None else max(mtime, stat.st_mtime)
+        return CollectionStats(self.name, files, size, mtime)
 
     def create_directories(self):
         """Create all the directories for this collection on disk"""
@@ -80,6 +125,7 @@ class CollectionFile():
 
     Attributes:
         config - Config instance
+        filesystem - Filesystem instance
         collection - Collection object - collection file belongs to
         filename - string name of the file inside the collection
     """
@@ -88,6 +134,7 @@ class CollectionFile():
 
     def __init__(self, config, filesystem, collection_name, filename):
         self.config = config
+        self.filesystem = filesystem
         self.collection = Collection(config, filesystem, collection_name)
         self.filename = filename
 
@@ -109,12 +156,12 @@ class CollectionFile():
 
     def is_empty(self):
         """
-        Whether or not this file exists and contains any content.
-        Spaces and newlines don't count.
+        Whether this file doesn't exist or contains no content.
+        Spaces and newlines don't count. Only reads up to the first other character.
         """
         if not self.get_path().exists():
             return True
-        return bool(self.get_path().read_text().strip())
+        return self.filesystem.is_blank(self.get_path())
 
     def has_default_template(self):
         """Whether or not this file belongs to a collection that has a default template"""
@@ -140,7 +187,39 @@ def get_all_collections(config, filesystem):
         config - Config instance
         filesystem - Filesystem instance
     """
-    collections = [Collection(config, filesystem, child.stem)
-        for child in filesystem.get_collection_base_path().glob('*/')]
+    collections = [Collection(config, filesystem, name)
+        for name, is_dir in filesystem.list_dir(filesystem.get_collection_base_path()) if is_dir]
 
     return sorted(collections, key=lambda col: col.get_name().lower())
+
+
+def get_all_collection_stats(config, filesystem, workers=None):
+    """Get a list of CollectionStats for all collections in the notebook, sorted by name.
+    Collections are scanned on a thread pool, as each scan mostly waits on the disk (or
+    the network, for notebooks on a network filesystem).
+
+    Arguments:
+        config - Config instance
+        filesystem - Filesystem instance
+        workers - optional number of threads (default is based on the number of CPUs)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    collections = get_all_collections(config, filesystem)
+    if not collections:
+        return []
+    with span('scan collections'), ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(Collection.get_stats, collections))
+
+
+def sort_collection_stats(stats, column='name', reverse=False):
+    """Sort a list of CollectionStats by a column. Names sort A-Z, the other columns
+    largest (or newest) first.
+
+    Arguments:
+        stats - list of CollectionStats
+        column - one of STATS_SORTS
+        reverse - True to reverse the order
+    """
+    descending = column != 'name'
+    return sorted(stats, key=STATS_SORTS[column], reverse=descending != reverse)
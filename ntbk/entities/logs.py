@@ -1,7 +1,12 @@
 """Classes representing log objects in the application"""
 
+# system imports
+import os
+from datetime import date
+
 # app imports
 from ntbk.entities.templates import Template
+from ntbk.profiling import span
 
 
 class LogDate():
@@ -25,18 +30,24 @@ class LogDate():
 
     def get_path(self):
         """Get the pathlib.Path object to this log date (will be a folder)"""
-        return (self.filesystem.get_log_base_path() /
-            f"{self.date_obj.strftime('%Y/%m-%B/%Y-%m-%d').lower()}")
+        return self.filesystem.get_log_date_path(self.date_obj)
 
     def get_contents(self, recursive=False):
         """Get all the files and folders as Path objects for this date"""
-        pattern = '**/*' if recursive else '*'
-        return list(self.get_path().glob(pattern))
+        with span('glob'):
+            return _list_contents(self.filesystem, self.get_path(), recursive)
+
+    def get_metadata(self, recursive=False):
+        """Get a list of filesystem.EntryMetadata (size, mtime and emptiness) for all the
+        files and folders for this date, collected in one pass over the folder
+        """
+        return self.filesystem.list_metadata(self.get_path(), recursive)
 
     def get_files(self):
         """Get all the files for this log date"""
         return [LogFile(self.config, self.filesystem, self.date_obj, child.stem)
-            for child in self.get_path().glob('*.md')]
+            for child in _list_contents(self.filesystem, self.get_path(), False)
+            if child.suffix == LogFile.EXTENSION]
 
     def get_date(self):
         """Return the date object for this LogDate"""
@@ -82,32 +93,38 @@ class LogFile():
 
     def is_dir(self):
         """This is awkward, but sometimes the LogFile is actually a dir"""
-        return (self.logdate.get_path() / self.filename).is_dir()
+        return self.filesystem.is_dir(self.logdate.get_path() / self.filename)
 
     def get_contents(self, recursive):
         """If this is a dir, not file, then this will print its contents"""
         if not self.is_dir():
             raise Exception(f'{self.filename} is a file')
 
-        pattern = '**/*' if recursive else '*'
-        return list(self.get_path().glob(pattern))
+        with span('glob'):
+            return _list_contents(self.filesystem, self.get_path(), recursive)
+
+    def get_metadata(self, recursive=False):
+        """If this is a dir, not file, get a list of filesystem.EntryMetadata for its contents"""
+        if not self.is_dir():
+            raise Exception(f'{self.filename} is a file')
+        return self.filesystem.list_metadata(self.get_path(), recursive)
 
     def get_logdate(self):
         """Get the LogDate object this file belongs to"""
         return self.logdate
 
     def exists(self):
-        """Whether or not this file exists on disk"""
-        return self.get_path().exists()
+        """Whether or not this file exists, on disk or in an archived year"""
+        return self.filesystem.exists(self.get_path())
 
     def is_empty(self):
         """
-        Whether or not this file exists and has any content in it.
-        Spaces and newlines dont count.
+        Whether this file doesn't exist or has no content in it.
+        Spaces and newlines dont count. Only reads up to the first other character.
         """
-        if not self.get_path().exists():
+        if not self.exists():
             return True
-        return bool(self.get_path().read_text().strip())
+        return self.filesystem.is_blank(self.get_path())
 
     def get_default_template_name(self):
         """
@@ -137,3 +154,174 @@ class LogFile():
     def create_directories(self):
         """Creates all the parent directories for this file (does not actually create the file)"""
         self.get_path().parent.mkdir(parents=True, exist_ok=True)
+
+
+def iter_log_dates(config, filesystem, date_from, date_to):
+    """Yield a LogDate, in date order, for every day between date_from and date_to
+    (inclusive) that has a folder in the log, on disk or in an archived year's pack.
+    The log/YYYY/MM-month/ hierarchy is walked once with os.scandir and years and months
+    outside the range are never read, so days without a folder cost nothing.
+
+    Arguments:
+        config - Config instance
+        filesystem - Filesystem instance
+        date_from - date object for the first day of the range
+        date_to - date object for the last day of the range
+    """
+    for day_obj, _day_path, _pack_entries in _iter_days(filesystem, date_from, date_to):
+        yield LogDate(config, filesystem, day_obj)
+
+
+def iter_log_day_entries(config, filesystem, date_from, date_to, recursive=False):
+    """Yield a (LogDate, entries) tuple like iter_log_dates, where entries is a list of
+    (relative path string, is_dir) tuples for the files and folders of the day sorted by
+    path (ignoring case). Day folders are read with os.scandir, whose entries already
+    know whether they're folders, and each archived year's pack is read once.
+
+    Arguments:
+        config - Config instance
+        filesystem - Filesystem instance
+        date_from - date object for the first day of the range
+        date_to - date object for the last day of the range
+        recursive - True to include the contents of subfolders
+    """
+    for day_obj, day_path, pack_entries in _iter_days(filesystem, date_from, date_to, True):
+        entries = {}
+        if day_path is not None:
+            _scan_tree(day_path, '', recursive, entries)
+        for name, is_dir in pack_entries:
+            if recursive or '/' not in name:
+                # files written since the day was packed win over their packed copy
+                entries.setdefault(name.replace('/', os.sep), is_dir)
+        yield LogDate(config, filesystem, day_obj), \
+            sorted(entries.items(), key=lambda entry: entry[0].lower())
+
+
+def _iter_days(filesystem, date_from, date_to, with_pack_entries=False):
+    """Yield (date object, day folder path or None, list of the day's entries in its pack)
+    for every day in the range with a folder, in date order. The entries of the packs are
+    only read with_pack_entries.
+    """
+    first_month = (date_from.year, date_from.month)
+    last_month = (date_to.year, date_to.month)
+
+    year_paths, pack_years = _scan_log_base(filesystem.get_log_base_path())
+    for year in sorted(set(year_paths).union(pack_years)):
+        if not date_from.year <= year <= date_to.year:
+            continue
+        days = {}
+        if year in year_paths:
+            for month, month_path in _scan_numbered_dirs(year_paths[year], 2):
+                if first_month <= (year, month) <= last_month:
+                    days.update(_scan_day_dirs(month_path))
+        pack_days = {}
+        if year in pack_years:
+            if with_pack_entries:
+                pack_days = filesystem.archive.get_day_entries(year)
+            else:
+                pack_days = dict.fromkeys(filesystem.archive.get_days(year), ())
+        for day_obj in sorted(set(days).union(pack_days)):
+            if date_from <= day_obj <= date_to:
+                yield day_obj, days.get(day_obj), pack_days.get(day_obj, ())
+
+
+def _scan_tree(path, prefix, recursive, entries):
+    """Add (relative path string -> is_dir) for the entries of a folder on disk to a dict,
+    and those of its subfolders if recursive (without following symlinks to folders)
+
+    Arguments:
+        path - path to the folder
+        prefix - string relative path of the folder, ending in a separator (or empty)
+        recursive - True to include the contents of subfolders
+        entries - dict to add the entries to
+    """
+    try:
+        with os.scandir(path) as scan:
+            found = [(entry.name, entry.is_dir(), entry.is_symlink(), entry.path)
+                for entry in scan]
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for name, is_dir, is_symlink, entry_path in found:
+        entries[prefix + name] = is_dir
+        if recursive and is_dir and not is_symlink:
+            _scan_tree(entry_path, f'{prefix}{name}{os.sep}', True, entries)
+
+
+def _scan_log_base(path):
+    """Get a dict of year -> path for the year folders in the log folder, and a set of the
+    years that have a pack (YYYY.zip), with one os.scandir
+
+    Arguments:
+        path - path to the log folder
+    """
+    from ntbk.archive import get_folder_year, get_pack_year
+
+    year_paths = {}
+    pack_years = set()
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if get_folder_year(entry.name) is not None and entry.is_dir():
+                    year_paths[get_folder_year(entry.name)] = entry.path
+                elif get_pack_year(entry.name) is not None:
+                    pack_years.add(get_pack_year(entry.name))
+    except FileNotFoundError:
+        pass
+    return year_paths, pack_years
+
+
+def _list_contents(filesystem, path, recursive):
+    """Get the files and folders in a log folder as Path objects, followed by the ones in
+    the pack if its year is archived
+
+    Arguments:
+        filesystem - Filesystem instance
+        path - Path object to the folder
+        recursive - True to include the contents of subfolders
+    """
+    contents = list(path.glob('**/*' if recursive else '*'))
+    if not filesystem.archive.is_dir(path):
+        return contents
+    folders = [path]
+    while folders:
+        folder = folders.pop(0)
+        for name, is_dir in filesystem.archive.list_dir(folder):
+            contents.append(folder / name)
+            if recursive and is_dir:
+                folders.append(folder / name)
+    return contents
+
+
+def _scan_numbered_dirs(path, digits):
+    """Get a sorted list of (number, path) for subdirs whose names start with a number,
+    e.g. '2021' or '01-january'. Anything else in the folder is ignored.
+
+    Arguments:
+        path - path to the folder
+        digits - how many leading digits make up the number
+    """
+    try:
+        with os.scandir(path) as entries:
+            found = [(int(entry.name[:digits]), entry.path) for entry in entries
+                if entry.name[:digits].isdigit() and entry.is_dir()]
+    except FileNotFoundError:
+        return []
+    return sorted(found)
+
+
+def _scan_day_dirs(path):
+    """Get a sorted list of (date object, path) for the YYYY-MM-DD subdirs of a month folder
+
+    Arguments:
+        path - path to the month folder
+    """
+    found = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                day_obj = date.fromisoformat(entry.name)
+            except ValueError:
+                continue
+            if entry.is_dir():
+                found.append((day_obj, entry.path))
+    return sorted(found)
@@ -3,8 +3,15 @@
 # system imports
 from datetime import date, datetime
 
-# 3rd party imports
-from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+# app imports
+from ntbk.variables import ProviderCache, get_referenced_names, is_provider
+from ntbk.profiling import span
+
+# one jinja2 Environment per template folder, shared by every Template in the process
+_ENVIRONMENTS = {}
+
+# names of the variables from get_default_variables
+DEFAULT_VARIABLES = ('now', 'today_iso', 'now_iso', 'today_long', 'now_long')
 
 
 class Template():
@@ -21,7 +28,6 @@ class Template():
         config -- Config instance
         filesystem -- Filesystem instance
         template_path -- Path object to root template dir
-        env -- Environment instance for Jinja2
         name -- string template name
     """
 
@@ -32,7 +38,6 @@ class Template():
         self.config = config
         self.filesystem = filesystem
         self.template_path = self.filesystem.get_templates_base_path()
-        self.env = Environment(loader=FileSystemLoader(str(self.template_path)))
         self.name = name
 
     def get_path(self):
@@ -44,13 +49,25 @@ class Template():
         return self.name
 
     def render(self, extra_vars=None):
-        """Render this template with jinja2 and return the resulting template as a string"""
-        variables = dict(self.get_variables())
-        if extra_vars is not None:
-            variables.update(extra_vars)
+        """Render this template with jinja2 and return the resulting template as a string.
+        Only the variables the template uses are computed.
+        """
+        with span('load jinja2'):
+            from jinja2 import TemplateNotFound
+
+        environment = get_environment(self.filesystem)
         try:
-            template = self.env.get_template(self.name + self.EXTENSION)
-            return template.render(**variables)
+            with span('compile template'):
+                template = environment.get_template(self.name + self.EXTENSION)
+            with span('find variables'):
+                names = get_referenced_names(environment, self.filesystem,
+                    self.name + self.EXTENSION)
+            with span('compute variables'):
+                template_vars = dict(self.get_variables(names))
+            if extra_vars is not None:
+                template_vars.update(extra_vars)
+            with span('render template'):
+                return template.render(**template_vars)
         except TemplateNotFound:
             print(f'Template "{self.name}" not found.')
             return ''
@@ -63,33 +80,94 @@ class Template():
         """
         self.extra_vars = variables
 
-    def get_default_variables(self): #pylint: disable=no-self-use
-        """Get the global default variables available to all templates"""
+    def get_default_variables(self, names=None): #pylint: disable=no-self-use
+        """Get the global default variables available to all templates
+
+        Arguments:
+            names -- optional set of variable names, only these are computed
+        """
+        wanted = [name for name in DEFAULT_VARIABLES if names is None or name in names]
+        if not wanted:
+            return {}
         now = datetime.now()
-        today = date.today()
-        return {
-            'now': now,
-            'today_iso': today.isoformat(),
-            'now_iso': now.isoformat(timespec='seconds'),
-            'today_long': today.strftime('%A, %B %d, %Y'),
-            'now_long': now.strftime('%A, %B %d, %Y %I:%M %p')
+        today = now.date()
+        formatters = {
+            'now': lambda: now,
+            'today_iso': today.isoformat,
+            'now_iso': lambda: now.isoformat(timespec='seconds'),
+            'today_long': lambda: today.strftime('%A, %B %d, %Y'),
+            'now_long': lambda: now.strftime('%A, %B %d, %Y %I:%M %p')
         }
+        return {name: formatters[name]() for name in wanted}
+
+    def get_config_variables(self, names=None):
+        """Get the variables that are defined in the config file. Variables backed by a
+        command or file (see ntbk.variables) get the provider's value.
+
+        Arguments:
+            names -- optional set of variable names, only these are computed
+        """
+        config_vars = self.config.get('template_vars', {}) or {}
+        providers = None
+        result = {}
+        for name, value in config_vars.items():
+            if names is not None and name not in names:
+                continue
+            if is_provider(value):
+                providers = providers or ProviderCache(self.filesystem)
+                value = providers.get_value(name, value)
+            result[name] = value
+        return result
+
+    def get_task_variables(self):
+        """Get the variables read from the task index. They are only read from the index
+        when the template actually uses them."""
+        from ntbk.indexes.tasks import OpenTasks
+
+        before = self.extra_vars.get('log_date')
+        if not isinstance(before, date):
+            before = date.today()
+        return {'open_tasks': OpenTasks(self.config, self.filesystem, before)}
+
+    def get_variables(self, names=None):
+        """Get a dict of the variables to be passed to the template
+
+        Arguments:
+            names -- optional set of the variable names the template uses, only these are
+                computed. None computes every variable.
+        """
+        template_vars = dict(self.get_default_variables(names))
+        if names is None or 'open_tasks' in names:
+            template_vars.update(self.get_task_variables())
+        template_vars.update(self.get_config_variables(names))
+        template_vars.update(self.extra_vars)
+        return template_vars
 
-    def get_config_variables(self):
-        """Get the variables that are defined in the config file"""
-        return self.config.get('template_vars', {}) or {}
 
-    def get_variables(self):
-        """Get a dict of all variables to be passed to the template"""
-        variables = dict(self.get_default_variables())
-        variables.update(self.get_config_variables())
-        variables.update(self.extra_vars)
-        return variables
+def get_environment(filesystem):
+    """Get the shared jinja2 Environment for the notebook's template folder.
+    Compiled templates are cached in memory and as bytecode in .ntbk/jinja, so a template
+    is only compiled again after its file changes.
+
+    Arguments:
+        filesystem - Filesystem instance
+    """
+    # jinja2 is slow to import, so only do it when a template is actually rendered
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+    template_path = str(filesystem.get_templates_base_path())
+    if template_path not in _ENVIRONMENTS:
+        cache_path = filesystem.get_cache_base_path() / 'jinja'
+        cache_path.mkdir(parents=True, exist_ok=True)
+        _ENVIRONMENTS[template_path] = Environment(loader=FileSystemLoader(template_path),
+            bytecode_cache=FileSystemBytecodeCache(str(cache_path)))
+    return _ENVIRONMENTS[template_path]
 
 
 def get_all_templates(config, filesystem):
     """Get a list of Template objects for all templates in the notebook"""
-    templates = [Template(config, filesystem, child.stem)
-        for child in filesystem.get_templates_base_path().glob('*.md')]
+    templates = [Template(config, filesystem, name[:-len(Template.EXTENSION)])
+        for name, is_dir in filesystem.list_dir(filesystem.get_templates_base_path())
+        if not is_dir and name.endswith(Template.EXTENSION)]
 
     return sorted(templates, key=lambda template: template.get_name().lower())
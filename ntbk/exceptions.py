@@ -6,4 +6,32 @@ class InvalidConfigException(Exception):
     def __init__(self):
         super().__init__('Configuration file is not valid. \
             Please review the docs and check your config file.')
-    
\ No newline at end of file
+
+
+class InvalidSearchQueryException(Exception):
+    """Exception that is thrown if a search query can't be understood by the search index"""
+
+    def __init__(self, query):
+        super().__init__(f'Invalid search query: {query}')
+
+
+class FileLockTimeoutException(Exception):
+    """Exception that is thrown if a file stays locked by another process for too long"""
+
+    def __init__(self, filepath):
+        super().__init__(f'Timed out waiting for another process to finish writing {filepath}. '
+            'Increase lock_timeout in your config file if this keeps happening.')
+
+
+class ServerRunningException(Exception):
+    """Exception that is thrown if `ntbk serve` is started while another server is running"""
+
+    def __init__(self, socket_path):
+        super().__init__(f'An ntbk server is already running on {socket_path}')
+
+
+class WatcherRunningException(Exception):
+    """Exception that is thrown if `ntbk watch` is started while another watcher is running"""
+
+    def __init__(self, notebook_path):
+        super().__init__(f'ntbk watch is already running for {notebook_path}')
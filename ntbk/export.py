@@ -0,0 +1,169 @@
+"""Streaming export of log and collection files to JSON lines, a single markdown file or tar"""
+
+# system imports
+import json
+import sys
+import time
+from collections import namedtuple
+from datetime import date
+from pathlib import Path
+
+# app imports
+from ntbk.entities.collections import Collection
+from ntbk.entities.logs import iter_log_dates
+
+
+ExportFile = namedtuple('ExportFile', ['path', 'name', 'log_date', 'collection', 'stat'])
+
+FORMATS = ('jsonl', 'md', 'tar')
+
+
+def iter_export_files(config, filesystem, date_from=None, date_to=None, collections=None):
+    """Lazily yield an ExportFile for each file to export, logs in date order then collections.
+    Without any filters everything is exported. With only dates, only logs are exported and
+    with only collections, only those collections are.
+
+    Arguments:
+        config -- Config instance
+        filesystem -- Filesystem instance
+        date_from -- optional date object of the first log day to export
+        date_to -- optional date object of the last log day to export
+        collections -- optional list of collection names to export
+    """
+    has_dates = date_from is not None or date_to is not None
+    notebook_path = filesystem.get_notebook_base_path()
+
+    if has_dates or not collections:
+        for logdate in iter_log_dates(config, filesystem,
+                date_from or date.min, date_to or date.max):
+            for entry in filesystem.iter_markdown_files(logdate.get_path()):
+                path = Path(entry.path)
+                yield ExportFile(path, path.relative_to(notebook_path).as_posix(),
+                    logdate.get_date(), None, entry.stat())
+
+    if collections or not has_dates:
+        paths = [Collection(config, filesystem, name).get_path() for name in collections] \
+            if collections else [filesystem.get_collection_base_path()]
+        for collection_path in paths:
+            for entry in filesystem.iter_markdown_files(collection_path):
+                path = Path(entry.path)
+                yield ExportFile(path, path.relative_to(notebook_path).as_posix(), None,
+                    filesystem.get_collection_name_for_path(path), entry.stat())
+
+
+def write_jsonl(filesystem, files, out):
+    """Write one JSON object per file (one per line) to the binary stream out
+
+    Arguments:
+        filesystem -- Filesystem instance
+        files -- iterable of ExportFile
+        out -- binary file object
+    """
+    for file in files:
+        record = {
+            'path': file.name,
+            'date': file.log_date.isoformat() if file.log_date else None,
+            'collection': file.collection,
+            'mtime': file.stat.st_mtime,
+            'content': filesystem.read_text(file.path)
+        }
+        out.write(json.dumps(record).encode('utf-8') + b'\n')
+
+
+def write_markdown(filesystem, files, out):
+    """Write all files into one markdown document, each under a heading with its path
+
+    Arguments:
+        filesystem -- Filesystem instance
+        files -- iterable of ExportFile
+        out -- binary file object
+    """
+    for file in files:
+        content = filesystem.read_bytes(file.path).rstrip(b'\n')
+        out.write(f'# {file.name}\n\n'.encode('utf-8') + content + b'\n\n')
+
+
+def write_tar(filesystem, files, out):
+    """Write the files as an uncompressed tar stream, keeping their notebook relative paths.
+    Pipe it into gzip/xz/zstd to compress it.
+
+    Arguments:
+        filesystem -- Filesystem instance
+        files -- iterable of ExportFile
+        out -- binary file object
+    """
+    import tarfile
+
+    # 'w|' streams the archive without ever seeking, so out can be a pipe
+    with tarfile.open(fileobj=out, mode='w|') as tar:
+        for file in files:
+            info = tarfile.TarInfo(file.name)
+            info.size = file.stat.st_size
+            info.mtime = file.stat.st_mtime
+            with filesystem.open_binary(file.path) as data:
+                tar.addfile(info, data)
+
+
+WRITERS = {'jsonl': write_jsonl, 'md': write_markdown, 'tar': write_tar}
+
+
+class Progress():
+    """Counts files and bytes passing through the export and reports throughput on stderr
+
+    Arguments:
+        stream -- text file object to report to (stderr by default)
+        interval -- seconds between reports
+
+    Attributes:
+        files -- number of files exported so far
+        bytes -- number of bytes exported so far
+    """
+
+    def __init__(self, stream=None, interval=1.0):
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.files = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self.reported = self.started
+
+    def track(self, files):
+        """Pass the files through unchanged, counting them and reporting now and then
+
+        Arguments:
+            files -- iterable of ExportFile
+        """
+        for file in files:
+            yield file
+            self.files += 1
+            self.bytes += file.stat.st_size
+            if time.monotonic() - self.reported >= self.interval:
+                self.report()
+
+    def report(self, final=False):
+        """Write the current throughput to the stream"""
+        self.reported = time.monotonic()
+        elapsed = max(self.reported - self.started, 1e-9)
+        megabytes = self.bytes / 1_000_000
+        self.stream.write(f'\r{self.files} files, {megabytes:.1f} MB in {elapsed:.1f}s '
+            f'({self.files / elapsed:.0f} files/s, {megabytes / elapsed:.1f} MB/s)')
+        self.stream.write('\n' if final else '')
+        self.stream.flush()
+
+
+def export(filesystem, files, export_format, out, progress=None):
+    """Stream the files to out in the given format
+
+    Arguments:
+        filesystem -- Filesystem instance
+        files -- iterable of ExportFile (e.g. from iter_export_files)
+        export_format -- one of FORMATS
+        out -- binary file object
+        progress -- optional Progress instance to report throughput with
+    """
+    if progress is not None:
+        files = progress.track(files)
+    WRITERS[export_format](filesystem, files, out)
+    out.flush()
+    if progress is not None:
+        progress.report(final=True)
@@ -1,19 +1,54 @@
 """Provides Fileystem class for interacting with the filesystem"""
 
 # system imports
-import subprocess
+import os
+import time
+from collections import namedtuple
+from datetime import date
 from pathlib import Path
+from stat import S_ISREG
 
+# app imports
+from ntbk.archive import LogArchive
+from ntbk.exceptions import FileLockTimeoutException
+from ntbk.profiling import span
+from ntbk.indexes.manifest import Manifest
 
-class Filesystem():
+try:
+    import fcntl
+except ImportError: # pragma: no cover - not available on windows
+    fcntl = None
+
+# EntryMetadata -- size, mtime and emptiness of one entry of a folder (see list_metadata)
+#   name -- string path relative to the listed folder
+#   is_dir -- whether the entry is a folder
+#   size -- size in bytes (None for folders)
+#   mtime -- modification time as a timestamp
+#   empty -- whether the file has nothing but whitespace in it (None for folders)
+EntryMetadata = namedtuple('EntryMetadata', ['name', 'is_dir', 'size', 'mtime', 'empty'])
+
+# bytes read at a time when checking whether a file is blank
+BLANK_CHUNK_SIZE = 4096
+
+
+class Filesystem(): #pylint: disable=too-many-public-methods
     """This class should always be used to retrieve paths and create files
 
     Arguments:
         config -- Config instance
+
+    Attributes:
+        config -- Config instance
+        listeners -- list of callables notified after a file is written (see add_listener)
+        manifest -- Manifest of cached folder listings (see list_dir)
+        archive -- LogArchive of the packed log years (see `ntbk archive`)
     """
 
     def __init__(self, config):
         self.config = config
+        self.listeners = []
+        self.manifest = Manifest(self)
+        self.archive = LogArchive(self)
 
     def get_notebook_base_path(self):
         """Get the pathlib.Path object to the notebook root folder"""
@@ -31,32 +66,426 @@ class Filesystem():
         """Get the pathlib.Path object to the _templates folder (or whatever is configured)"""
         return self.get_notebook_base_path() / self.config.get('template_dir')
 
-    def create_file(self, filepath, content=None): #pylint: disable=no-self-use
+    def get_cache_base_path(self):
+        """Get the pathlib.Path object to the .ntbk folder holding indexes and other derived data.
+        Everything in it can be deleted safely - it will be rebuilt from the notebook files.
+        """
+        return self.get_notebook_base_path() / '.ntbk'
+
+    def get_log_date_path(self, date_obj):
+        """Get the pathlib.Path object to the folder of a day in the log (see LogDate).
+        The reverse of get_log_date_for_path.
+
+        Arguments:
+            date_obj -- date object
+        """
+        return self.get_log_base_path() / date_obj.strftime('%Y/%m-%B/%Y-%m-%d').lower()
+
+    def get_log_date_for_path(self, filepath):
+        """Get the date object for a path inside the log folder, or None if it isn't a log path
+
+        Arguments:
+            filepath -- Path object to a file or folder
+        """
+        try:
+            parts = Path(filepath).relative_to(self.get_log_base_path()).parts
+        except ValueError:
+            return None
+        if len(parts) < 3:
+            return None
+        try:
+            return date.fromisoformat(parts[2])
+        except ValueError:
+            return None
+
+    def get_collection_name_for_path(self, filepath):
+        """Get the name of the collection (e.g. 'books/fiction') a file belongs to,
+        or None if the path isn't inside the collections folder.
+
+        Arguments:
+            filepath -- Path object to a file
+        """
+        try:
+            parts = Path(filepath).relative_to(self.get_collection_base_path()).parts
+        except ValueError:
+            return None
+        if len(parts) < 2:
+            return None
+        return '/'.join(parts[:-1])
+
+    def iter_notebook_files(self):
+        """Yield an os.DirEntry for every markdown file in the log and collections folders"""
+        for base_path in (self.get_log_base_path(), self.get_collection_base_path()):
+            yield from self.iter_markdown_files(base_path)
+
+    def iter_markdown_files(self, path):
+        """Recursively yield an os.DirEntry for every markdown file under the given folder,
+        sorted by name within each folder. Missing folders yield nothing. In the log folder,
+        archived files are yielded (as archive.PackEntry) after the files on disk.
+
+        Arguments:
+            path -- Path object or string to a folder
+        """
+        yield from self._iter_markdown_files(path)
+        log_base = self.get_log_base_path()
+        if Path(path) == log_base or log_base in Path(path).parents:
+            yield from self.archive.iter_markdown_files(path)
+
+    def _iter_markdown_files(self, path):
+        """Recursive part of iter_markdown_files, for the files on disk
+
+        Arguments:
+            path -- Path object or string to a folder
+        """
+        try:
+            with os.scandir(path) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from self._iter_markdown_files(entry.path)
+            elif entry.name.endswith('.md'):
+                yield entry
+
+    def list_dir(self, path):
+        """Get a list of (name, is_dir) tuples for the entries of a folder, sorted by name.
+        Listings are cached in .ntbk/manifest.json, so a folder that hasn't changed
+        since it was last listed only costs a stat.
+
+        Arguments:
+            path -- Path object to a folder
+        """
+        with span('list folder'):
+            entries = self._list_dir(path)
+            self.manifest.save()
+        return [(name, is_dir) for name, is_dir, _is_symlink in entries]
+
+    def _list_dir(self, path):
+        """Get the cached listing of a folder, merged with its archived entries, as a list
+        of (name, is_dir, is_symlink) tuples
+
+        Arguments:
+            path -- Path object to a folder
+        """
+        entries = self.manifest.list_dir(path)
+        if self.archive.is_dir(path):
+            archived = ((name, is_dir, False) for name, is_dir in self.archive.list_dir(path))
+            entries = sorted(set(entries).union(archived))
+        return entries
+
+    def walk_dir(self, path):
+        """Yield a (relative path string, is_dir) tuple for everything under a folder,
+        depth first with each folder's entries sorted by name (ignoring case). Uses the
+        cached listing for every subfolder that hasn't changed. Symlinks to folders are
+        listed but not walked into, so a symlink loop can't recurse forever.
+
+        Arguments:
+            path -- Path object to a folder
+        """
+        yield from self._walk_dir(path, '')
+        self.manifest.save()
+
+    def _walk_dir(self, folder, prefix):
+        """Recursive part of walk_dir
+
+        Arguments:
+            folder -- Path object to the folder being listed
+            prefix -- string relative path of the folder, ending in a separator (or empty)
+        """
+        with span('list folder'):
+            entries = self._list_dir(folder)
+        for name, is_dir, is_symlink in sorted(entries, key=lambda entry: entry[0].lower()):
+            yield prefix + name, is_dir
+            if is_dir and not is_symlink:
+                yield from self._walk_dir(folder / name, f'{prefix}{name}{os.sep}')
+
+    def list_metadata(self, path, recursive=False):
+        """Get a list of EntryMetadata for the entries of a folder, in the same order as
+        list_dir (or walk_dir if recursive). Each folder is read with a single os.scandir
+        and files are only read up to their first non-whitespace byte.
+
+        Arguments:
+            path -- Path object to a folder
+            recursive -- True to include the entries of every subfolder
+        """
+        with span('list metadata'):
+            return list(self._iter_metadata(path, '', recursive))
+
+    def _iter_metadata(self, folder, prefix, recursive):
+        """Recursive part of list_metadata
+
+        Arguments:
+            folder -- Path object to the folder being listed
+            prefix -- string relative path of the folder, ending in a separator (or empty)
+            recursive -- True to include the entries of every subfolder
+        """
+        entries = {}
+        links = set()
+        try:
+            with os.scandir(folder) as scan:
+                for entry in scan:
+                    if entry.is_symlink():
+                        links.add(entry.name)
+                    try:
+                        entries[entry.name] = _get_metadata(entry)
+                    except FileNotFoundError:
+                        continue # removed while it was listed
+                    except OSError:
+                        # e.g. no permission - listed without its size or time
+                        entries[entry.name] = EntryMetadata(entry.name, False, None, None, None)
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        if self.archive.is_dir(folder):
+            for name, is_dir in self.archive.list_dir(folder):
+                if name not in entries:
+                    entries[name] = self._get_archived_metadata(folder / name, is_dir)
+
+        for name in sorted(entries, key=str.lower):
+            yield entries[name]._replace(name=prefix + name)
+            # symlinks to folders are listed but not followed, so a loop can't recurse forever
+            if recursive and entries[name].is_dir and name not in links:
+                yield from self._iter_metadata(folder / name, f'{prefix}{name}{os.sep}', True)
+
+    def _get_archived_metadata(self, path, is_dir):
+        """Get the EntryMetadata of an entry inside an archived year"""
+        if is_dir:
+            return EntryMetadata(path.name, True, None, None, None)
+        stat = self.archive.stat(path)
+        return EntryMetadata(path.name, False, stat.st_size, stat.st_mtime,
+            _is_blank_text(self.archive.read_bytes(path)))
+
+    def is_blank(self, path):
+        """Whether a file has nothing but whitespace (including Unicode whitespace) in it.
+        Only reads up to the first non-whitespace character. Raises FileNotFoundError if
+        it doesn't exist.
+
+        Arguments:
+            path -- Path object
+        """
+        try:
+            return _is_blank(path)
+        except FileNotFoundError:
+            return _is_blank_text(self.archive.read_bytes(path))
+
+    def exists(self, path):
+        """Whether a file or folder exists, on disk or in the archive
+
+        Arguments:
+            path -- Path object
+        """
+        return path.exists() or self.archive.is_file(path) or self.archive.is_dir(path)
+
+    def is_dir(self, path):
+        """Whether a path is a folder, on disk or in the archive
+
+        Arguments:
+            path -- Path object
+        """
+        return path.is_dir() or self.archive.is_dir(path)
+
+    def stat(self, path):
+        """Get the os.stat_result of a file, or an archive.PackStat if it's archived.
+        Raises FileNotFoundError if it doesn't exist.
+
+        Arguments:
+            path -- Path object
+        """
+        try:
+            return path.stat()
+        except FileNotFoundError:
+            return self.archive.stat(path)
+
+    def read_bytes(self, path):
+        """Get the content of a file as bytes, from disk or the archive.
+        Raises FileNotFoundError if it doesn't exist.
+
+        Arguments:
+            path -- Path object
+        """
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return self.archive.read_bytes(path)
+
+    def read_text(self, path):
+        """Get the content of a file as a string, from disk or the archive.
+        Raises FileNotFoundError if it doesn't exist.
+
+        Arguments:
+            path -- Path object
+        """
+        return self.read_bytes(path).decode('utf-8', errors='replace')
+
+    def open_binary(self, path):
+        """Open a file for reading bytes, from disk or the archive.
+        Raises FileNotFoundError if it doesn't exist.
+
+        Arguments:
+            path -- Path object
+        """
+        try:
+            return path.open('rb')
+        except FileNotFoundError:
+            import io
+
+            return io.BytesIO(self.archive.read_bytes(path))
+
+    def unarchive(self, path):
+        """Unpack the archived day a file or folder belongs to before it is written to.
+        Returns True if anything was unpacked.
+
+        Arguments:
+            path -- Path object
+        """
+        if path.exists():
+            return False
+        return self.archive.unpack(path)
+
+    def add_listener(self, listener):
+        """Register a callable to be notified whenever ntbk writes a file.
+        It is called as listener(event, filepath) where event is 'create' or 'append',
+        'bulk_create' for each of many files created at once (see create_new_files),
+        'open' when a file is about to be opened in the editor, or 'change' for files
+        changed outside of ntbk (see ntbk.watcher) which may no longer exist.
+
+        Arguments:
+            listener -- callable
+        """
+        self.listeners.append(listener)
+
+    def notify_listeners(self, event, filepath):
+        """Call every registered listener for the given event
+
+        Arguments:
+            event -- string event name
+            filepath -- Path object to the file
+        """
+        with span('update indexes'):
+            for listener in self.listeners:
+                listener(event, filepath)
+
+    def create_file(self, filepath, content=None):
         """Create a file. Parent directories will be created.
 
         Arguments:
             filepath -- Path object to file
             content -- optional content to write to file
         """
+        with span('write file'):
+            self.unarchive(filepath)
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+
+            if content is not None:
+                filepath.write_text(content)
+            else:
+                filepath.touch()
+
+        self.notify_listeners('create', filepath)
+
+    def create_new_files(self, files):
+        """Create many files at once, writing them with a pool of worker threads.
+        Files that already exist are left alone. Listeners are notified with a
+        'bulk_create' event for each file once every file is written. Returns a list of
+        the Paths that were created.
+
+        Arguments:
+            files -- iterable of (Path, string content) tuples. Consumed as the files are
+                written, so the content can be produced while earlier files are written.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        with span('write files'), ThreadPoolExecutor() as pool:
+            # map() consumes files in this thread, so archived days are unpacked one at a
+            # time before their files are written (and then left alone as they exist)
+            written = list(pool.map(self._create_new_file, self._unarchive_each(files)))
+
+        created = [path for path in written if path is not None]
+        for path in created:
+            self.notify_listeners('bulk_create', path)
+        return created
+
+    def _unarchive_each(self, files):
+        """Yield the (Path, content) tuples after unpacking each file's archived day
+
+        Arguments:
+            files -- iterable of (Path, string content) tuples
+        """
+        for file in files:
+            self.unarchive(file[0])
+            yield file
+
+    def _create_new_file(self, file):
+        """Write one file for create_new_files (runs in a worker thread).
+        Returns the Path, or None if the file already exists.
+
+        Arguments:
+            file -- (Path, string content) tuple
+        """
+        filepath, content = file
         filepath.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            # 'x' mode fails if the file exists, so a file created meanwhile is never replaced
+            with filepath.open('x', encoding='utf-8') as new_file:
+                new_file.write(content)
+        except FileExistsError:
+            return None
+        return filepath
 
-        if content is not None:
-            filepath.write_text(content)
-        else:
-            filepath.touch()
+    def append_to_file(self, filepath, content):
+        """Write content to the end of the given file (filepath must be a Path object).
 
-    def append_to_file(self, filepath, content): #pylint: disable=no-self-use
-        """Write content to the end of the given file (filepath must be a Path object)
+        Safe with many processes appending to the same file at once: the content is encoded
+        up front and written in one O_APPEND write while holding an exclusive advisory lock,
+        so notes never interleave or get torn. Waits up to the 'lock_timeout' config value
+        (seconds) for the lock.
 
         Arguments:
             filepath -- Path object to the file
             content -- string content to write to the file
         """
-        # in case the parent directories don't exist yet
-        filepath.parent.mkdir(parents=True, exist_ok=True)
+        with span('append to file'):
+            data = content.encode('utf-8')
+            written = False
+            while not written:
+                self.unarchive(filepath)
+                # in case the parent directories don't exist yet
+                filepath.parent.mkdir(parents=True, exist_ok=True)
+
+                fd = os.open(filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+                try:
+                    self._lock(fd, filepath)
+                    if os.fstat(fd).st_nlink == 0:
+                        # packed and removed by `ntbk archive` while waiting for the lock
+                        continue
+                    while data:
+                        data = data[os.write(fd, data):]
+                    written = True
+                finally:
+                    # closing the file also releases the lock
+                    os.close(fd)
 
-        with filepath.open(mode='a') as file:
-            file.write(content)
+        self.notify_listeners('append', filepath)
+
+    def _lock(self, fd, filepath):
+        """Take an exclusive advisory lock on an open file, waiting up to 'lock_timeout' secs
+
+        Arguments:
+            fd -- int file descriptor
+            filepath -- Path object to the file (for the error message)
+        """
+        if fcntl is None:
+            return
+
+        deadline = time.monotonic() + float(self.config.get('lock_timeout', 10))
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError as err:
+                if time.monotonic() >= deadline:
+                    raise FileLockTimeoutException(filepath) from err
+                time.sleep(0.005)
 
     def open_file_in_editor(self, path):
         """Open the given path in the configured editor.
@@ -64,4 +493,51 @@ class Filesystem():
         Arguments:
             path -- String or Path object. Must be the absolute path
         """
-        subprocess.run([self.config.get('editor'), path])
+        import subprocess
+
+        self.notify_listeners('open', Path(path))
+        with span('editor'):
+            subprocess.run([self.config.get('editor'), path])
+
+
+def _get_metadata(entry):
+    """Get the EntryMetadata for an os.DirEntry. Only regular files are read to tell
+    whether they're empty.
+    """
+    if entry.is_dir():
+        return EntryMetadata(entry.name, True, None, entry.stat().st_mtime, None)
+    stat = entry.stat()
+    if not S_ISREG(stat.st_mode):
+        # e.g. a fifo, which would block reading it
+        return EntryMetadata(entry.name, False, None, stat.st_mtime, None)
+    try:
+        empty = stat.st_size == 0 or _is_blank(entry.path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        empty = None
+    return EntryMetadata(entry.name, False, stat.st_size, stat.st_mtime, empty)
+
+
+def _is_blank(path):
+    """Whether a file on disk has nothing but whitespace in it, reading it a chunk at a time
+    until the first non-whitespace character
+    """
+    import codecs
+
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(BLANK_CHUNK_SIZE)
+            # a character split between chunks is held back by the decoder until it's whole
+            if decoder.decode(chunk, final=not chunk).strip():
+                return False
+            if not chunk:
+                return True
+
+
+def _is_blank_text(data):
+    """Whether bytes hold nothing but whitespace, including Unicode whitespace like a
+    no-break space (bytes.strip() only removes ASCII whitespace)
+    """
+    return not data.decode('utf-8', errors='replace').strip()
@@ -0,0 +1,151 @@
+"""Regex search over log and collection files that works without any index.
+
+Files are scanned on a thread pool while results are yielded in the order the files were
+given (logs in date order, then collections), so output streams as soon as the earliest
+files are done.
+"""
+
+# system imports
+import mmap
+import os
+import re
+from collections import deque, namedtuple
+
+# app imports
+from ntbk.archive import PackStat
+
+# GrepMatch -- a line that matched
+#   line_number -- 1-based line number in the file
+#   line -- string contents of the line without the newline
+GrepMatch = namedtuple('GrepMatch', ['line_number', 'line'])
+
+# files larger than this are mmap'd, smaller ones are cheaper to read in one call
+MMAP_MIN_SIZE = 64 * 1024
+
+
+def compile_pattern(pattern, ignore_case=False):
+    """Compile the pattern to a bytes regex that matches against whole files.
+    Raises re.error if the pattern is invalid.
+
+    Arguments:
+        pattern -- string regular expression
+        ignore_case -- True to match case insensitively
+    """
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    return re.compile(pattern.encode('utf-8'), flags)
+
+
+def scan_file(path, regex, size=None):
+    """Get a list of GrepMatch for each line of the file the regex matches.
+    Empty and missing files have no matches.
+
+    Arguments:
+        path -- Path object or string to the file
+        regex -- compiled bytes regex (see compile_pattern)
+        size -- optional size of the file in bytes, if already known from a stat
+    """
+    try:
+        with open(path, 'rb') as file:
+            if size is None:
+                size = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return []
+            if size < MMAP_MIN_SIZE:
+                return _find_lines(file.read(), regex)
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return _find_lines(data, regex)
+    except (FileNotFoundError, ValueError):
+        # ValueError: the file was truncated to nothing after it was stat'd
+        return []
+
+
+def _find_lines(data, regex):
+    """Get a list of GrepMatch for each line of data with a match, only counting lines
+    up to each match so files without matches are never split into lines
+
+    Arguments:
+        data -- bytes or mmap
+        regex -- compiled bytes regex
+    """
+    matches = []
+    line_number = 1
+    counted_to = 0
+    position = 0
+    end = len(data)
+
+    while position <= end:
+        match = regex.search(data, position)
+        if match is None or (match.start() == end and data[end - 1:end] == b'\n'):
+            # an empty match after the final newline isn't on a line
+            break
+        start = data.rfind(b'\n', 0, match.start()) + 1
+        stop = data.find(b'\n', match.start())
+        stop = end if stop == -1 else stop
+
+        # slicing works for mmap too, which has no count() before python 3.13
+        line_number += data[counted_to:start].count(b'\n')
+        counted_to = start
+        matches.append(GrepMatch(line_number,
+            data[start:stop].rstrip(b'\r').decode('utf-8', errors='replace')))
+        # continue on the next line so each line is reported once
+        position = stop + 1
+
+    return matches
+
+
+def scan_archived_file(filesystem, path, regex):
+    """Get a list of GrepMatch for each line of a file inside an archived year's pack
+
+    Arguments:
+        filesystem -- Filesystem instance
+        path -- Path object to the file
+        regex -- compiled bytes regex (see compile_pattern)
+    """
+    try:
+        return _find_lines(filesystem.read_bytes(path), regex)
+    except FileNotFoundError:
+        return []
+
+
+def grep(filesystem, files, regex, workers=None):
+    """Scan the files on a thread pool, yielding (file, list of GrepMatch) for every file with
+    a match in the same order as files. Only a bounded number of files are scanned ahead of
+    the one being yielded, so this streams over notebooks of any size.
+
+    Arguments:
+        filesystem -- Filesystem instance
+        files -- iterable of ExportFile (see ntbk.export.iter_export_files)
+        regex -- compiled bytes regex (see compile_pattern)
+        workers -- optional number of threads (default is based on the number of CPUs)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    pending = deque()
+
+    with ThreadPoolExecutor(workers) as pool:
+        try:
+            for file in files:
+                if file.stat.st_size == 0:
+                    continue
+                if isinstance(file.stat, PackStat):
+                    future = pool.submit(scan_archived_file, filesystem, file.path, regex)
+                else:
+                    future = pool.submit(scan_file, file.path, regex, file.stat.st_size)
+                pending.append((file, future))
+                if len(pending) >= workers * 4:
+                    yield from _collect(pending.popleft())
+            while pending:
+                yield from _collect(pending.popleft())
+        finally:
+            # stop early (e.g. the output pipe was closed) without scanning everything left
+            for _file, future in pending:
+                future.cancel()
+
+
+def _collect(item):
+    """Yield the (file, matches) from a (file, future) pair if the file had any matches"""
+    file, future = item
+    matches = future.result()
+    if matches:
+        yield file, matches
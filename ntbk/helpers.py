@@ -1,10 +1,36 @@
 """Misc helpers used in the application"""
 
 # system imports
-from datetime import date, timedelta
+import os
+from datetime import date, datetime, timedelta
 from argparse import ArgumentTypeError
 
 
+def get_temp_path(path):
+    """Get the Path to write a new version of a file to before moving it into place
+    with os.replace, so readers never see half of it. It's next to the file (so the
+    rename stays on one filesystem) and unique to this process.
+
+    Arguments:
+        path -- Path object to the file
+    """
+    return path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+
+
+def atomic_write(path, data):
+    """Replace a file with the given content in one step (see get_temp_path).
+    Parent directories will be created.
+
+    Arguments:
+        path -- Path object to the file
+        data -- bytes to write
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = get_temp_path(path)
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
 def parse_key_val_var(var_str):
     """Convert key=val string to tuple.
 
@@ -54,3 +80,113 @@ def argparse_valid_iso_date(date_str):
         return date.fromisoformat(date_str)
     except ValueError as err:
         raise ArgumentTypeError(f'not a valid date: {date_str}') from err
+
+
+def format_jot(text, timestamp=None):
+    """Format a jotted note the way it is appended to a log file.
+
+    Arguments:
+        text -- string note
+        timestamp -- optional datetime object to put before the note
+    """
+    if timestamp is not None:
+        text = f"[{timestamp.strftime('%I:%M %p')}]\n" + text
+    return '\n\n' + text
+
+
+def parse_ndjson_jot(line):
+    """Parse one line of NDJSON jot input into a dict with the keys
+    text, file (or None), timestamp (datetime or None) and date (date or None).
+
+    The JSON object must have a 'text' key. 'file' is the log file name, 'date' an ISO date
+    and 'timestamp' either true (the current time) or an ISO datetime. When only a
+    timestamp is given the note goes to that timestamp's day.
+
+    Arguments:
+        line -- string with one JSON object
+    """
+    import json
+
+    record = json.loads(line)
+    if not isinstance(record, dict) or not isinstance(record.get('text'), str):
+        raise ValueError('expected a JSON object with a "text" string')
+
+    for key in ('file', 'date'):
+        if record.get(key) is not None and not isinstance(record[key], str):
+            raise ValueError(f'"{key}" must be a string')
+
+    date_obj = date.fromisoformat(record['date']) if record.get('date') else None
+    timestamp = record.get('timestamp')
+    if timestamp is True:
+        timestamp = datetime.now()
+    elif isinstance(timestamp, str) and timestamp:
+        timestamp = datetime.fromisoformat(timestamp)
+        date_obj = date_obj or timestamp.date()
+    elif timestamp:
+        raise ValueError('"timestamp" must be true or an ISO datetime string')
+    else:
+        timestamp = None
+
+    return {'text': record['text'], 'file': record.get('file'),
+        'timestamp': timestamp, 'date': date_obj}
+
+
+def parse_create_manifest(lines, fmt):
+    """Parse a manifest of collection files to create into a list of dicts with the keys
+    collection, file, template (or None) and vars (dict of template variables).
+
+    CSV manifests need a header row with 'collection' and 'file' columns and may have a
+    'template' column. Any other columns are template variables and empty cells are skipped.
+    NDJSON manifests have one JSON object per line with the same keys, and template variables
+    in a 'vars' object.
+
+    Arguments:
+        lines -- iterable of string lines (e.g. an open file)
+        fmt -- 'csv' or 'ndjson'
+    """
+    rows = []
+    for line_number, record in _iter_manifest_records(lines, fmt):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError('expected a JSON object')
+            row = {key: record.pop(key, None) for key in ('collection', 'file', 'template')}
+            for key, value in row.items():
+                if value is not None and not isinstance(value, str):
+                    raise ValueError(f'"{key}" must be a string')
+            if not row['collection'] or not row['file']:
+                raise ValueError('"collection" and "file" are required')
+            row['vars'] = record if fmt == 'csv' else record.pop('vars', None) or {}
+            if not isinstance(row['vars'], dict):
+                raise ValueError('"vars" must be a JSON object')
+        except ValueError as err:
+            raise ValueError(f'line {line_number}: {err}') from err
+        rows.append(row)
+    return rows
+
+
+def _iter_manifest_records(lines, fmt):
+    """Yield (line number, record) for each row of a CSV or NDJSON manifest.
+    CSV records are dicts of the row's columns. NDJSON lines that aren't valid JSON
+    raise a ValueError.
+    """
+    if fmt == 'csv':
+        import csv
+
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # empty cells count as missing, and values past the end of the header
+            # end up under the None key
+            yield reader.line_num, {key: value for key, value in record.items()
+                if key is not None and value != ''}
+        return
+
+    import json
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as err:
+            raise ValueError(f'line {line_number}: {err}') from err
+        yield line_number, record
@@ -0,0 +1 @@
+"""Derived data (indexes and caches) built from the notebook files and kept in .ntbk/"""
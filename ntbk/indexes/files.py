@@ -0,0 +1,179 @@
+"""Provides the FileIndex class - base class for SQLite indexes of the notebook's files"""
+
+# system imports
+from pathlib import Path
+
+# date of a file - the log day, or the day a collection file was last modified
+FILE_DATE_SQL = "COALESCE(files.log_date, "\
+    "date(files.mtime_ns / 1000000000, 'unixepoch', 'localtime'))"
+
+
+class FileIndex():
+    """Base class for persistent SQLite indexes built from the content of every log and
+    collection file.
+
+    The index is only a cache of the notebook files. Files are re-read only when their
+    mtime or size changed since they were last indexed, and the whole database can be
+    deleted at any time - it is rebuilt on the next query.
+
+    Subclasses set FILENAME and SCHEMA (their own tables, keyed by file id) and implement
+    _index_content and _remove_content.
+
+    Arguments:
+        config -- Config instance
+        filesystem -- Filesystem instance
+
+    Attributes:
+        config -- Config instance
+        filesystem -- Filesystem instance
+    """
+
+    FILENAME = None
+
+    FILES_SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            log_date TEXT,
+            collection TEXT
+        );
+        CREATE INDEX IF NOT EXISTS files_log_date ON files (log_date);
+    '''
+
+    SCHEMA = ''
+
+    def __init__(self, config, filesystem):
+        self.config = config
+        self.filesystem = filesystem
+
+    def get_path(self):
+        """Get the pathlib.Path object to the index database"""
+        return self.filesystem.get_cache_base_path() / self.FILENAME
+
+    def exists(self):
+        """Whether or not the index has been built yet"""
+        return self.get_path().exists()
+
+    def connect(self):
+        """Open a connection to the index database, creating it if necessary"""
+        import sqlite3
+
+        self.get_path().parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.get_path()))
+        conn.executescript(self.FILES_SCHEMA + self.SCHEMA)
+        return conn
+
+    def rebuild(self):
+        """Throw away the index and index every file again"""
+        if self.exists():
+            self.get_path().unlink()
+        return self.refresh()
+
+    def refresh(self):
+        """Bring the index up to date with the notebook.
+        Returns a tuple of (number of files re-indexed, number of files removed)
+        """
+        notebook_path = self.filesystem.get_notebook_base_path()
+        updated = 0
+        with self.connect() as conn:
+            known = {path: (file_id, mtime_ns, size) for file_id, path, mtime_ns, size
+                in conn.execute('SELECT id, path, mtime_ns, size FROM files')}
+
+            for entry in self.filesystem.iter_notebook_files():
+                rel_path = Path(entry.path).relative_to(notebook_path).as_posix()
+                stat = entry.stat()
+                indexed = known.pop(rel_path, None)
+                if indexed is not None and indexed[1:] == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                self._index_file(conn, Path(entry.path), stat)
+                updated += 1
+
+            for file_id, _mtime_ns, _size in known.values():
+                self._remove_file(conn, file_id)
+
+        conn.close()
+        return updated, len(known)
+
+    def update_file(self, filepath):
+        """Re-index a single file (or drop it from the index if it no longer exists)
+
+        Arguments:
+            filepath -- Path object to the file
+        """
+        with self.connect() as conn:
+            if self.filesystem.exists(filepath):
+                self._index_file(conn, filepath, self.filesystem.stat(filepath))
+            else:
+                row = conn.execute('SELECT id FROM files WHERE path = ?',
+                    (self._relative_path(filepath),)).fetchone()
+                if row is not None:
+                    self._remove_file(conn, row[0])
+        conn.close()
+
+    def on_file_written(self, event, filepath):
+        """Filesystem listener keeping an already built index up to date
+
+        Arguments:
+            event -- string event name. Files about to be opened haven't changed yet
+            filepath -- Path object to the file that was written
+        """
+        if event == 'open' or not self.exists() or filepath.suffix != '.md':
+            return
+
+        import sqlite3
+
+        try:
+            self.update_file(filepath)
+        except sqlite3.Error:
+            # never fail a write because of the index - the next refresh picks the file up
+            pass
+
+    def _relative_path(self, filepath):
+        """Get the posix path string stored in the index for the given file"""
+        return Path(filepath).relative_to(self.filesystem.get_notebook_base_path()).as_posix()
+
+    def _index_file(self, conn, filepath, stat):
+        """(Re-)index the content of a file using an open connection"""
+        log_date = self.filesystem.get_log_date_for_path(filepath)
+        body = self.filesystem.read_text(filepath)
+        rel_path = self._relative_path(filepath)
+        values = (stat.st_mtime_ns, stat.st_size, log_date.isoformat() if log_date else None,
+            self.filesystem.get_collection_name_for_path(filepath))
+
+        row = conn.execute('SELECT id FROM files WHERE path = ?', (rel_path,)).fetchone()
+        if row is None:
+            file_id = conn.execute('INSERT INTO files '\
+                '(mtime_ns, size, log_date, collection, path) VALUES (?, ?, ?, ?, ?)',
+                values + (rel_path,)).lastrowid
+        else:
+            file_id = row[0]
+            conn.execute('UPDATE files SET mtime_ns = ?, size = ?, log_date = ?, collection = ? '\
+                'WHERE id = ?', values + (file_id,))
+            self._remove_content(conn, file_id)
+        self._index_content(conn, file_id, body)
+
+    def _remove_file(self, conn, file_id):
+        """Remove a file from the index using an open connection"""
+        self._remove_content(conn, file_id)
+        conn.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def _index_content(self, conn, file_id, body):
+        """Add the indexed data for a file's content. Implemented by subclasses.
+
+        Arguments:
+            conn -- open sqlite3 Connection
+            file_id -- integer id of the file in the files table
+            body -- string content of the file
+        """
+        raise NotImplementedError
+
+    def _remove_content(self, conn, file_id):
+        """Remove the indexed data for a file. Implemented by subclasses.
+
+        Arguments:
+            conn -- open sqlite3 Connection
+            file_id -- integer id of the file in the files table
+        """
+        raise NotImplementedError
@@ -0,0 +1,118 @@
+"""Provides the Manifest class - cached directory listings for the notebook"""
+
+# system imports
+import os
+import time
+
+# app imports
+from ntbk.helpers import atomic_write
+
+
+class Manifest():
+    """Cache of the entries in each notebook folder that has been listed, so listing a
+    folder again only costs one stat of the folder.
+
+    A folder's mtime changes whenever an entry is added, removed or renamed in it, so a
+    cached listing is used only while the folder's mtime is the same as when it was read.
+    Folders modified in the last RACY_SECONDS are not cached: on filesystems with coarse
+    timestamps another change in the same tick would leave the mtime unchanged.
+
+    Only the MAX_DIRS most recently used folders are kept, so the file (which is read
+    whole on the first listing) stays small however many folders have ever been listed.
+    Symlinks to folders are listed as folders, and flagged so walking the notebook can
+    skip recursing into them.
+
+    Arguments:
+        filesystem -- Filesystem instance
+
+    Attributes:
+        filesystem -- Filesystem instance
+        dirs -- dict of folder path ->
+            {'mtime_ns': int, 'entries': [[name, is_dir, is_symlink], ...]}, or None until loaded
+        dirty -- whether dirs changed since it was loaded or saved
+    """
+
+    FILENAME = 'manifest.json'
+    VERSION = 3
+    RACY_SECONDS = 2
+    MAX_DIRS = 2000
+
+    def __init__(self, filesystem):
+        self.filesystem = filesystem
+        self.dirs = None
+        self.dirty = False
+        self._used = set()
+
+    def get_path(self):
+        """Get the pathlib.Path object to the manifest file"""
+        return self.filesystem.get_cache_base_path() / self.FILENAME
+
+    def load(self):
+        """Load the manifest from disk. A missing, corrupt or outdated file loads as empty."""
+        import json
+
+        try:
+            data = json.loads(self.get_path().read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            data = {}
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            data = {}
+        self.dirs = data.get('dirs', {})
+        self.dirty = False
+        self._used = set()
+
+    def save(self):
+        """Write the manifest to disk if it changed (via a temp file so readers never
+        see half of it). The folders are kept in order of use, least recent first, and
+        only the last MAX_DIRS of them are written.
+        """
+        import json
+
+        if not self.dirty:
+            return
+        # moving the folders read from the cache to the end only happens when the file is
+        # written anyway, so cache hits alone never cause a write
+        order = [key for key in self.dirs if key not in self._used] + \
+            [key for key in self.dirs if key in self._used]
+        self.dirs = {key: self.dirs[key] for key in order[-self.MAX_DIRS:]}
+        self._used = set()
+        atomic_write(self.get_path(), json.dumps({'version': self.VERSION, 'dirs': self.dirs},
+            separators=(',', ':')).encode('utf-8'))
+        self.dirty = False
+
+    def list_dir(self, path):
+        """Get a list of (name, is_dir, is_symlink) tuples for the entries of a folder, sorted
+        by name. is_dir follows symlinks. A missing folder has no entries.
+
+        Arguments:
+            path -- Path object or string to a folder
+        """
+        if self.dirs is None:
+            self.load()
+
+        key = str(path)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            cached = self.dirs.get(key)
+            if cached is not None and cached['mtime_ns'] == mtime_ns:
+                self._used.add(key)
+                return [tuple(entry) for entry in cached['entries']]
+            with os.scandir(path) as scan:
+                entries = sorted((entry.name, entry.is_dir(), entry.is_symlink())
+                    for entry in scan)
+        except (FileNotFoundError, NotADirectoryError):
+            self._forget(key)
+            return []
+
+        if time.time() - mtime_ns / 1e9 >= self.RACY_SECONDS:
+            self.dirs[key] = {'mtime_ns': mtime_ns, 'entries': entries}
+            self._used.add(key)
+            self.dirty = True
+        else:
+            self._forget(key)
+        return entries
+
+    def _forget(self, key):
+        """Remove a folder from the manifest"""
+        if self.dirs.pop(key, None) is not None:
+            self.dirty = True
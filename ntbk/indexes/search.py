@@ -0,0 +1,117 @@
+"""Provides the SearchIndex class - a persistent full-text index of the notebook"""
+
+# system imports
+from collections import namedtuple
+
+# app imports
+from ntbk.exceptions import InvalidSearchQueryException
+from ntbk.indexes.files import FileIndex
+
+
+SearchResult = namedtuple('SearchResult', ['path', 'log_date', 'collection', 'snippet'])
+
+# FTS5 operators that are kept as they are when the words of a query are quoted
+OPERATORS = ('AND', 'OR', 'NOT')
+
+
+def quote_query(text):
+    """Turn the words of a search into an FTS5 query that can't be a syntax error.
+    Each word is quoted, so punctuation like foo-bar or c++ is searched for instead of
+    being read as FTS5 syntax, while "phrases", AND, OR, NOT and prefix* words keep
+    their meaning.
+
+    Arguments:
+        text -- string search, e.g. 'follow-up OR "frank herbert"'
+    """
+    import shlex
+
+    try:
+        words = shlex.split(text, posix=False)
+    except ValueError:
+        # unbalanced quotes - search for the quote characters like any other
+        words = text.split()
+
+    terms = []
+    for word in words:
+        if word in OPERATORS:
+            terms.append(word)
+        elif len(word) > 1 and word.startswith('"') and word.endswith('"'):
+            terms.append(_quote(word[1:-1]))
+        elif len(word) > 1 and word.endswith('*'):
+            terms.append(_quote(word[:-1]) + '*')
+        else:
+            terms.append(_quote(word))
+    return ' '.join(terms)
+
+
+def _quote(term):
+    """Quote a string as an FTS5 phrase"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+class SearchIndex(FileIndex):
+    """Full-text index (SQLite FTS5) of all log and collection files.
+    See FileIndex for how the index is kept up to date.
+
+    Arguments:
+        config -- Config instance
+        filesystem -- Filesystem instance
+
+    Attributes:
+        config -- Config instance
+        filesystem -- Filesystem instance
+    """
+
+    FILENAME = 'search.db'
+
+    SCHEMA = '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS contents USING fts5(body);
+    '''
+
+    def search(self, query, date_from=None, date_to=None, collection=None, #pylint: disable=too-many-arguments
+            limit=20):
+        """Search the index and return a list of SearchResult ordered by relevance
+
+        Arguments:
+            query -- FTS5 query string, e.g. 'dune OR "frank herbert"' (see quote_query)
+            date_from -- optional date object, only return log files on or after this date
+            date_to -- optional date object, only return log files on or before this date
+            collection -- optional collection name, only return files in this collection
+            limit -- max number of results
+        """
+        import sqlite3
+
+        sql = '''SELECT files.path, files.log_date, files.collection,
+                snippet(contents, 0, '[', ']', '...', 12)
+            FROM contents JOIN files ON files.id = contents.rowid
+            WHERE contents MATCH ?'''
+        params = [query]
+        if date_from is not None:
+            sql += ' AND files.log_date >= ?'
+            params.append(date_from.isoformat())
+        if date_to is not None:
+            sql += ' AND files.log_date <= ?'
+            params.append(date_to.isoformat())
+        if collection is not None:
+            sql += " AND (files.collection = ? OR files.collection LIKE ? || '/%')"
+            params.extend([collection, collection])
+        sql += ' ORDER BY bm25(contents) LIMIT ?'
+        params.append(limit)
+
+        notebook_path = self.filesystem.get_notebook_base_path()
+        conn = self.connect()
+        try:
+            return [SearchResult(notebook_path / path, log_date, col, snippet)
+                for path, log_date, col, snippet in conn.execute(sql, params)]
+        except sqlite3.OperationalError as err:
+            raise InvalidSearchQueryException(query) from err
+        finally:
+            conn.close()
+
+    def _index_content(self, conn, file_id, body):
+        """Add a file's content to the full-text index"""
+        conn.execute('INSERT INTO contents (rowid, body) VALUES (?, ?)', (file_id, body))
+
+    def _remove_content(self, conn, file_id):
+        """Remove a file's content from the full-text index"""
+        conn.execute('DELETE FROM contents WHERE rowid = ?', (file_id,))
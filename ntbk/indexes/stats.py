@@ -0,0 +1,302 @@
+"""Provides the StatsIndex class - per-day activity totals for the log"""
+
+# system imports
+from array import array
+from datetime import date, timedelta
+from pathlib import Path
+
+# app imports
+from ntbk.entities.logs import LogDate, iter_log_dates
+from ntbk.helpers import atomic_write
+
+
+class StatsIndex():
+    """Compact store of how many files, bytes and words the log has for each day.
+
+    The store is a flat binary file: a small header followed by one column per field, each
+    an array of 64 bit ints with one slot per day starting at January 1st of the first year
+    in the log. Totals for a month or year are sums over a contiguous slice of a column,
+    so they never have to walk the log folders.
+
+    Arguments:
+        config -- Config instance
+        filesystem -- Filesystem instance
+
+    Attributes:
+        config -- Config instance
+        filesystem -- Filesystem instance
+        start -- date object of the first slot in the columns, or None if empty
+        columns -- dict of field name -> array of per-day values
+    """
+
+    FILENAME = 'stats.bin'
+    VERSION = 1
+
+    # mtime_ns is the newest mtime of the day's files. Together with files and bytes
+    # it tells reconcile() whether the day changed without reading any files.
+    FIELDS = ('files', 'bytes', 'mtime_ns', 'words')
+
+    # the fields that are reported, in order
+    METRICS = ('files', 'bytes', 'words')
+
+    def __init__(self, config, filesystem):
+        self.config = config
+        self.filesystem = filesystem
+        self.start = None
+        self.columns = {field: array('q') for field in self.FIELDS}
+
+    def get_path(self):
+        """Get the pathlib.Path object to the stats file"""
+        return self.filesystem.get_cache_base_path() / self.FILENAME
+
+    def exists(self):
+        """Whether or not the stats have been built yet"""
+        return self.get_path().exists()
+
+    def load(self):
+        """Load the stats file from disk. A missing, corrupt or outdated file loads as empty."""
+        self.start = None
+        self.columns = {field: array('q') for field in self.FIELDS}
+        try:
+            data = self.get_path().read_bytes()
+        except FileNotFoundError:
+            return
+
+        values = array('q')
+        if len(data) < 3 * values.itemsize or len(data) % values.itemsize:
+            return # truncated or corrupt, rebuilt on the next reconcile
+        values.frombytes(data)
+        version, start_ordinal, days = values[:3]
+        if version != self.VERSION or days <= 0 or len(values) != 3 + days * len(self.FIELDS) \
+                or not 1 <= start_ordinal <= date.max.toordinal():
+            return
+
+        self.start = date.fromordinal(start_ordinal)
+        for i, field in enumerate(self.FIELDS):
+            offset = 3 + i * days
+            self.columns[field] = values[offset:offset + days]
+
+    def save(self):
+        """Write the stats file to disk (via a temp file so readers never see half of it)"""
+        days = len(self.columns['files'])
+        values = array('q', [self.VERSION, self.start.toordinal() if self.start else 0, days])
+        for field in self.FIELDS:
+            values.extend(self.columns[field])
+
+        atomic_write(self.get_path(), values.tobytes())
+
+    def reconcile(self):
+        """Bring the stats up to date with the log. Only days whose files were added, removed
+        or modified are read again. Returns the number of days that were updated.
+        """
+        self.load()
+        updated = 0
+        seen = set()
+        for logdate in iter_log_dates(self.config, self.filesystem, date.min, date.max):
+            day_obj = logdate.get_date()
+            seen.add(day_obj)
+            entries = list(self.filesystem.iter_markdown_files(logdate.get_path()))
+            signature = _signature(entries)
+            if self._get(day_obj, ('files', 'bytes', 'mtime_ns')) != signature:
+                self._set(day_obj, signature + (_count_words(self.filesystem, entries),))
+                updated += 1
+
+        # days whose folder is gone entirely
+        for offset, files in enumerate(self.columns['files']):
+            day_obj = self.start + timedelta(days=offset)
+            if files and day_obj not in seen:
+                self._set(day_obj, (0, 0, 0, 0))
+                updated += 1
+
+        self.save()
+        return updated
+
+    def update_day(self, day_obj):
+        """Recalculate the totals for a single day and save them
+
+        Arguments:
+            day_obj -- date object
+        """
+        self.load()
+        logdate = LogDate(self.config, self.filesystem, day_obj)
+        entries = list(self.filesystem.iter_markdown_files(logdate.get_path()))
+        self._set(day_obj, _signature(entries) + (_count_words(self.filesystem, entries),))
+        self.save()
+
+    def on_file_written(self, event, filepath):
+        """Filesystem listener keeping already built stats up to date
+
+        Arguments:
+            event -- string event name. Files about to be opened haven't changed yet
+            filepath -- Path object to the file that was written
+        """
+        if event == 'open':
+            return
+        day_obj = self.filesystem.get_log_date_for_path(filepath)
+        if day_obj is not None and self.exists():
+            self.update_day(day_obj)
+
+    def get_totals(self, date_from, date_to):
+        """Get a dict of metric -> total between two dates (inclusive)
+
+        Arguments:
+            date_from -- date object
+            date_to -- date object
+        """
+        if self.start is None:
+            return dict.fromkeys(self.METRICS, 0)
+        first = max((date_from - self.start).days, 0)
+        last = max((date_to - self.start).days + 1, 0)
+        return {metric: sum(self.columns[metric][first:last]) for metric in self.METRICS}
+
+    def get_days(self, date_from, date_to):
+        """Get a list of (date, totals dict) for every day with files between two dates
+
+        Arguments:
+            date_from -- date object
+            date_to -- date object
+        """
+        if self.start is None:
+            return []
+        first = max((date_from - self.start).days, 0)
+        last = min((date_to - self.start).days + 1, len(self.columns['files']))
+        return [(self.start + timedelta(days=offset),
+                {metric: self.columns[metric][offset] for metric in self.METRICS})
+            for offset in range(first, last) if self.columns['files'][offset]]
+
+    def get_years(self):
+        """Get a list of the years that have any files"""
+        if self.start is None:
+            return []
+        last = self.start + timedelta(days=len(self.columns['files']) - 1)
+        years = range(self.start.year, last.year + 1)
+        return [year for year in years
+            if self.get_totals(date(year, 1, 1), date(year, 12, 31))['files']]
+
+    def to_dict(self):
+        """Get the per-day, per-month and per-year totals as a JSON friendly dict"""
+        result = {'years': {}, 'months': {}, 'days': {}}
+        for year in self.get_years():
+            result['years'][str(year)] = self.get_totals(date(year, 1, 1), date(year, 12, 31))
+            for month in range(1, 13):
+                first = date(year, month, 1)
+                last = _month_end(first)
+                totals = self.get_totals(first, last)
+                if totals['files']:
+                    result['months'][first.strftime('%Y-%m')] = totals
+            for day_obj, totals in self.get_days(date(year, 1, 1), date(year, 12, 31)):
+                result['days'][day_obj.isoformat()] = totals
+        return result
+
+    def _get(self, day_obj, fields):
+        """Get a tuple of the given fields' values for a day (zeros if it isn't stored)"""
+        offset = (day_obj - self.start).days if self.start else -1
+        if not 0 <= offset < len(self.columns['files']):
+            return tuple(0 for _field in fields)
+        return tuple(self.columns[field][offset] for field in fields)
+
+    def _set(self, day_obj, values):
+        """Store the values (in FIELDS order) for a day, growing the columns by whole years"""
+        if self.start is None:
+            self.start = date(day_obj.year, 1, 1)
+        if day_obj < self.start:
+            new_start = date(day_obj.year, 1, 1)
+            padding = (self.start - new_start).days
+            for field in self.FIELDS:
+                self.columns[field] = array('q', bytes(8 * padding)) + self.columns[field]
+            self.start = new_start
+
+        offset = (day_obj - self.start).days
+        if offset >= len(self.columns['files']):
+            padding = (date(day_obj.year + 1, 1, 1) - self.start).days - \
+                len(self.columns['files'])
+            for field in self.FIELDS:
+                self.columns[field].frombytes(bytes(8 * padding))
+
+        for field, value in zip(self.FIELDS, values):
+            self.columns[field][offset] = value
+
+
+def render_heatmap(stats, year, metric='words'):
+    """Get a list of lines drawing a calendar heatmap (one column per week) for a year
+
+    Arguments:
+        stats -- loaded StatsIndex
+        year -- int year
+        metric -- one of StatsIndex.METRICS
+    """
+    first = date(year, 1, 1)
+    last = date(year, 12, 31)
+    # the grid starts on the monday of the week january 1st is in
+    grid_start = first - timedelta(days=first.weekday())
+    weeks = (last - grid_start).days // 7 + 1
+    values = {day_obj: totals[metric] for day_obj, totals in stats.get_days(first, last)}
+
+    lines = ['    ' + _heatmap_header(year, grid_start, weeks).rstrip()]
+
+    for weekday, label in enumerate(['Mon', '', 'Wed', '', 'Fri', '', 'Sun']):
+        days = [grid_start + timedelta(days=week * 7 + weekday) for week in range(weeks)]
+        lines.append(f'{label:<4}' + _heatmap_row(days, year, values).rstrip())
+
+    totals = stats.get_totals(first, last)
+    lines.append('')
+    lines.append(f"{year}: {totals['files']} files, {totals['words']} words, "
+        f"{totals['bytes']} bytes on {len(values)} days")
+    return lines
+
+
+def _heatmap_header(year, grid_start, weeks):
+    """Get the line of month names above the heatmap
+
+    Arguments:
+        year -- int year being drawn
+        grid_start -- date object of the first cell of the grid
+        weeks -- number of columns in the grid
+    """
+    header = [' '] * (weeks * 2)
+    for month in range(1, 13):
+        column = (date(year, month, 1) - grid_start).days // 7 * 2
+        header[column:column + 3] = date(year, month, 1).strftime('%b')
+    return ''.join(header[:weeks * 2])
+
+
+def _heatmap_row(days, year, values):
+    """Get the string of shaded cells for one weekday row of the heatmap
+
+    Arguments:
+        days -- list of date objects, one per week
+        year -- int year being drawn. Days in other years are left blank
+        values -- dict of date object -> value of the metric
+    """
+    shades = '·░▒▓█'
+    highest = max(values.values(), default=0)
+    row = []
+    for day_obj in days:
+        if day_obj.year != year:
+            row.append('  ')
+            continue
+        value = values.get(day_obj, 0)
+        level = 0 if not value else 1 + min(3, (value * 4 - 1) // highest)
+        row.append(shades[level] * 2)
+    return ''.join(row)
+
+
+def _signature(entries):
+    """Get (files, bytes, newest mtime_ns) for a list of os.DirEntry"""
+    stats = [entry.stat() for entry in entries]
+    return (len(stats), sum(stat.st_size for stat in stats),
+        max((stat.st_mtime_ns for stat in stats), default=0))
+
+
+def _count_words(filesystem, entries):
+    """Count the words in the files for a list of os.DirEntry (or archive.PackEntry)"""
+    words = 0
+    for entry in entries:
+        words += len(filesystem.read_text(Path(entry.path)).split())
+    return words
+
+
+def _month_end(first):
+    """Get the date of the last day of the month that starts on first"""
+    next_month = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return next_month - timedelta(days=1)
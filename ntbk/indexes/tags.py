@@ -0,0 +1,125 @@
+"""Provides the TagIndex class - a persistent index of #tags and @mentions in the notebook"""
+
+# system imports
+import re
+from collections import namedtuple
+
+# app imports
+from ntbk.indexes.files import FILE_DATE_SQL, FileIndex
+
+
+TagCount = namedtuple('TagCount', ['tag', 'count', 'files'])
+
+TagLine = namedtuple('TagLine', ['path', 'line_number', 'text', 'date'])
+
+# #tag or @mention, not preceded by a word character (emails, urls#anchors) or a slash.
+# Tags can be nested with slashes, e.g. #project/ntbk
+TAG_PATTERN = re.compile(r'(?<![\w/#@])([#@]\w+(?:[/-]\w+)*)')
+
+# lines starting a fenced code block, where # and @ are usually code
+FENCE_PATTERN = re.compile(r'^\s*(```|~~~)')
+
+
+def find_tags(body):
+    """Yield (line number, tag, line text) for each distinct tag on each line of the body.
+    Tags are lowercased and lines in fenced code blocks are skipped.
+
+    Arguments:
+        body -- string content of a file
+    """
+    in_code = False
+    for line_number, line in enumerate(body.splitlines(), 1):
+        if FENCE_PATTERN.match(line):
+            in_code = not in_code
+            continue
+        if in_code:
+            continue
+        tags = {tag.lower() for tag in TAG_PATTERN.findall(line)}
+        for tag in sorted(tags):
+            yield line_number, tag, line.strip()
+
+
+class TagIndex(FileIndex):
+    """Index of the #tags and @mentions on every line of the log and collection files.
+    See FileIndex for how the index is kept up to date.
+
+    Arguments:
+        config -- Config instance
+        filesystem -- Filesystem instance
+
+    Attributes:
+        config -- Config instance
+        filesystem -- Filesystem instance
+    """
+
+    FILENAME = 'tags.db'
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS tags (
+            file_id INTEGER NOT NULL,
+            line INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            text TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);
+        CREATE INDEX IF NOT EXISTS tags_file_id ON tags (file_id);
+    '''
+
+    def get_counts(self, since=None):
+        """Get a list of TagCount with the number of lines and files for every tag,
+        most used first
+
+        Arguments:
+            since -- optional date object, only count files dated on or after this day
+        """
+        sql = 'SELECT tag, COUNT(*), COUNT(DISTINCT file_id) FROM tags '\
+            'JOIN files ON files.id = tags.file_id'
+        params = []
+        if since is not None:
+            sql += f' WHERE {FILE_DATE_SQL} >= ?'
+            params.append(since.isoformat())
+        sql += ' GROUP BY tag ORDER BY COUNT(*) DESC, tag'
+        return [TagCount(*row) for row in self._query(sql, params)]
+
+    def get_lines(self, name, since=None):
+        """Get a list of TagLine for every line with the tag, in date order.
+        A name without # or @ finds both, and nested tags (#name/...) are included.
+
+        Arguments:
+            name -- string tag, e.g. '#project', '@alice' or 'project'
+            since -- optional date object, only return files dated on or after this day
+        """
+        name = name.lower()
+        names = [name] if name[:1] in '#@' else ['#' + name, '@' + name]
+        # nested tags sort between 'name/' and 'name0' ('0' comes right after '/'), so the
+        # tag index is used for them too
+        conditions = ' OR '.join(['tag = ? OR (tag > ? AND tag < ?)'] * len(names))
+        # DISTINCT as a line can have both #name and #name/nested
+        sql = f'SELECT DISTINCT files.path, tags.line, tags.text, {FILE_DATE_SQL} FROM tags '\
+            f'JOIN files ON files.id = tags.file_id WHERE ({conditions})'
+        params = [param for tag in names for param in (tag, tag + '/', tag + '0')]
+        if since is not None:
+            sql += f' AND {FILE_DATE_SQL} >= ?'
+            params.append(since.isoformat())
+        sql += f' ORDER BY {FILE_DATE_SQL}, files.path, tags.line'
+
+        notebook_path = self.filesystem.get_notebook_base_path()
+        return [TagLine(notebook_path / path, line, text, day)
+            for path, line, text, day in self._query(sql, params)]
+
+    def _query(self, sql, params):
+        """Run a query on a new connection and return all the rows"""
+        conn = self.connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _index_content(self, conn, file_id, body):
+        """Add the tags on each line of a file"""
+        conn.executemany('INSERT INTO tags (file_id, line, tag, text) VALUES (?, ?, ?, ?)',
+            ((file_id, line, tag, text) for line, tag, text in find_tags(body)))
+
+    def _remove_content(self, conn, file_id):
+        """Remove the tags of a file"""
+        conn.execute('DELETE FROM tags WHERE file_id = ?', (file_id,))
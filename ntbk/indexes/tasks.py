@@ -0,0 +1,208 @@
+"""Provides the TaskIndex class - a persistent index of the bullet journal tasks in the notebook"""
+
+# system imports
+import re
+import time
+from collections import namedtuple
+from collections.abc import Sequence
+from datetime import date
+
+# app imports
+from ntbk.indexes.files import FILE_DATE_SQL, FileIndex
+
+
+Task = namedtuple('Task', ['path', 'line_number', 'date', 'state', 'text', 'due'])
+
+# - [ ] task, also with * or + bullets. The state is the character in the brackets
+TASK_PATTERN = re.compile(r'^\s*[-*+] \[([ xX>-])\] (.*)$')
+
+STATES = {' ': 'open', 'x': 'done', 'X': 'done', '>': 'migrated', '-': 'cancelled'}
+
+# state -> the character written in the brackets
+MARKERS = {'open': ' ', 'done': 'x', 'migrated': '>', 'cancelled': '-'}
+
+# due:YYYY-MM-DD anywhere in the task text
+DUE_PATTERN = re.compile(r'\bdue:(\d{4}-\d{2}-\d{2})\b')
+
+# path -> time.monotonic() of the last refresh in this process (see TaskIndex.ensure_fresh)
+_LAST_REFRESH = {}
+
+
+def find_tasks(body):
+    """Yield (line number, state, text, due date string or None) for each task in the body
+
+    Arguments:
+        body -- string content of a file
+    """
+    for line_number, line in enumerate(body.splitlines(), 1):
+        match = TASK_PATTERN.match(line)
+        if match is None:
+            continue
+        text = match.group(2).strip()
+        due = DUE_PATTERN.search(text)
+        due = _parse_due(due.group(1)) if due else None
+        yield line_number, STATES[match.group(1)], text, due.isoformat() if due else None
+
+
+def _parse_due(due):
+    """Get the date of a YYYY-MM-DD due date string, or None if there isn't one or it
+    isn't a real date (e.g. 2021-02-30)
+    """
+    try:
+        return date.fromisoformat(due)
+    except (TypeError, ValueError):
+        return None
+
+
+def latest_occurrences(tasks):
+    """Get the tasks with only the most recent occurrence of each task text, so a task
+    that was copied forward to later days (and maybe ticked off there) counts once
+
+    Arguments:
+        tasks -- list of Task in date order
+    """
+    latest = {}
+    for task in tasks:
+        # re-inserting keeps the dict in the order of each task's latest occurrence
+        latest.pop(task.text, None)
+        latest[task.text] = task
+    return list(latest.values())
+
+
+class TaskIndex(FileIndex):
+    """Index of the `- [ ]` tasks in every log and collection file, with their state
+    (open, done, migrated or cancelled) and optional due:YYYY-MM-DD date.
+    See FileIndex for how the index is kept up to date.
+
+    Arguments:
+        config -- Config instance
+        filesystem -- Filesystem instance
+
+    Attributes:
+        config -- Config instance
+        filesystem -- Filesystem instance
+    """
+
+    FILENAME = 'tasks.db'
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS tasks (
+            file_id INTEGER NOT NULL,
+            line INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            text TEXT NOT NULL,
+            due TEXT
+        );
+        CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state);
+        CREATE INDEX IF NOT EXISTS tasks_file_id ON tasks (file_id);
+    '''
+
+    def refresh(self):
+        """Bring the index up to date with the notebook (see FileIndex.refresh)"""
+        result = super().refresh()
+        _LAST_REFRESH[str(self.get_path())] = time.monotonic()
+        return result
+
+    def ensure_fresh(self, max_age=5):
+        """Refresh the index unless `ntbk watch` keeps it up to date or this process
+        already refreshed it within the last max_age seconds, e.g. when rendering many
+        templates in one command
+
+        Arguments:
+            max_age -- seconds
+        """
+        from ntbk import watcher
+
+        if self.exists() and watcher.is_running(self.filesystem):
+            return
+        last_refresh = _LAST_REFRESH.get(str(self.get_path()))
+        if last_refresh is None or time.monotonic() - last_refresh > max_age \
+                or not self.exists():
+            self.refresh()
+
+    def get_tasks(self, state=None, logs_only=False, before=None):
+        """Get a list of Task in date order
+
+        Arguments:
+            state -- optional string state to filter by, e.g. 'open'
+            logs_only -- True to leave out tasks in collections
+            before -- optional date object, only return tasks from logs before this day
+        """
+        conditions = []
+        params = []
+        if state is not None:
+            conditions.append('tasks.state = ?')
+            params.append(state)
+        if logs_only or before is not None:
+            conditions.append('files.log_date IS NOT NULL')
+        if before is not None:
+            conditions.append('files.log_date < ?')
+            params.append(before.isoformat())
+
+        sql = f'SELECT files.path, tasks.line, {FILE_DATE_SQL}, tasks.state, tasks.text, '\
+            'tasks.due FROM tasks JOIN files ON files.id = tasks.file_id'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += f' ORDER BY {FILE_DATE_SQL}, files.path, tasks.line'
+
+        notebook_path = self.filesystem.get_notebook_base_path()
+        conn = self.connect()
+        try:
+            return [Task(notebook_path / path, line, date.fromisoformat(day), task_state,
+                # parsed leniently, the index may have been built before invalid dates were dropped
+                text, _parse_due(due))
+                for path, line, day, task_state, text, due in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def get_open_tasks(self, logs_only=False, before=None):
+        """Get a list of Task that are still open, in date order. Tasks are matched by their
+        text, so one copied forward to later days is only returned once, and not at all if
+        its latest copy was ticked off.
+
+        Arguments:
+            logs_only -- True to leave out tasks in collections
+            before -- optional date object, only return tasks from logs before this day
+        """
+        tasks = latest_occurrences(self.get_tasks(logs_only=logs_only, before=before))
+        return [task for task in tasks if task.state == 'open']
+
+    def _index_content(self, conn, file_id, body):
+        """Add the tasks in a file"""
+        conn.executemany('INSERT INTO tasks (file_id, line, state, text, due) '\
+            'VALUES (?, ?, ?, ?, ?)',
+            ((file_id,) + task for task in find_tasks(body)))
+
+    def _remove_content(self, conn, file_id):
+        """Remove the tasks of a file"""
+        conn.execute('DELETE FROM tasks WHERE file_id = ?', (file_id,))
+
+
+class OpenTasks(Sequence):
+    """The open tasks from the logs before a day, for use as a template variable.
+    The task index is only read the first time the template uses the tasks, so templates
+    that don't use them don't pay for it.
+
+    Arguments:
+        config -- Config instance
+        filesystem -- Filesystem instance
+        before -- date object, only tasks from logs before this day are included
+    """
+
+    def __init__(self, config, filesystem, before):
+        self.index = TaskIndex(config, filesystem)
+        self.before = before
+        self._tasks = None
+
+    def _get_tasks(self):
+        """Get the list of tasks, reading them from the index the first time"""
+        if self._tasks is None:
+            self.index.ensure_fresh()
+            self._tasks = self.index.get_open_tasks(before=self.before)
+        return self._tasks
+
+    def __getitem__(self, index):
+        return self._get_tasks()[index]
+
+    def __len__(self):
+        return len(self._get_tasks())
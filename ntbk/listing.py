@@ -0,0 +1,139 @@
+"""Writes the --list output for log dates, collections and their subfolders"""
+
+# system imports
+import os
+
+# app imports
+from ntbk.colors import colorize
+
+FORMATS = ('plain', 'json', 'ndjson')
+
+
+def iter_entries(filesystem, path, recursive=False):
+    """Yield a (relative path string, is_dir) tuple for each entry of a folder, sorted by
+    name (ignoring case) within each folder. Recursive listings yield each folder's entries
+    right after the folder itself, so the whole listing never has to be sorted at once.
+
+    Arguments:
+        filesystem -- Filesystem instance
+        path -- Path object to the folder
+        recursive -- Boolean - include the entries of all subfolders
+    """
+    if recursive:
+        yield from filesystem.walk_dir(path)
+    else:
+        yield from sorted(filesystem.list_dir(path), key=lambda entry: entry[0].lower())
+
+
+def write_listing(entries, path, out, fmt=None):
+    """Write the entries from iter_entries to a text file object in one pass.
+    Files are shown without their extension and folders with a trailing slash.
+
+    Arguments:
+        entries -- iterable of (relative path string, is_dir) tuples
+        path -- Path object to the folder that was listed
+        out -- text file object, usually sys.stdout
+        fmt -- None for colored text, or one of FORMATS
+    """
+    records = (_record(name, is_dir, path) for name, is_dir in entries)
+    _write_records(records, out, fmt, _text_line)
+
+
+def write_long_listing(entries, path, out, fmt=None):
+    """Write the --list --long output, with the size, modification time and emptiness of
+    every entry, to a text file object in one pass
+
+    Arguments:
+        entries -- iterable of filesystem.EntryMetadata (e.g. from LogDate.get_metadata)
+        path -- Path object to the folder that was listed
+        out -- text file object, usually sys.stdout
+        fmt -- None for colored text, or one of FORMATS
+    """
+    records = (_long_record(entry, path) for entry in entries)
+    _write_records(records, out, fmt, _long_text_line)
+
+
+def _write_records(records, out, fmt, text_line):
+    """Write the records in the given format
+
+    Arguments:
+        records -- iterable of dicts from _record or _long_record
+        out -- text file object
+        fmt -- None for colored text, or one of FORMATS
+        text_line -- callable getting the line of text for a record
+    """
+    if fmt in ('json', 'ndjson'):
+        import json
+
+        lines = (json.dumps(record) + '\n' for record in records)
+        out.writelines(_json_array(lines) if fmt == 'json' else lines)
+    else:
+        # not writelines: colorama's wrapper only strips colors from what goes through write
+        for record in records:
+            out.write(text_line(record, colored=fmt is None))
+    out.flush()
+
+
+def _record(name, is_dir, path):
+    """Get the dict describing one listed entry"""
+    display_name = name if is_dir else os.path.splitext(name)[0]
+    return {
+        'name': display_name,
+        'type': 'dir' if is_dir else 'file',
+        'path': str(path / name)
+    }
+
+
+def _text_line(record, colored):
+    """Get the line of text output for one listed entry"""
+    if record['type'] == 'file':
+        return record['name'] + '\n'
+    text = record['name'] + '/'
+    return (colorize(text, 'blue') if colored else text) + '\n'
+
+
+def _long_record(entry, path):
+    """Get the dict describing one entry of a long listing"""
+    record = _record(entry.name, entry.is_dir, path)
+    record.update(size=entry.size, mtime=entry.mtime, empty=entry.empty)
+    return record
+
+
+def _long_text_line(record, colored):
+    """Get the line of text output for one entry of a long listing:
+    size, modification time, name and whether the file is empty
+    """
+    from datetime import datetime
+
+    size = '-' if record['size'] is None else format_size(record['size'])
+    mtime = '-' if record['mtime'] is None else \
+        datetime.fromtimestamp(record['mtime']).strftime('%Y-%m-%d %H:%M')
+    mtime = f'{mtime:<16}'
+    line = f'{size:>6}  {mtime}  {_text_line(record, colored).rstrip()}'
+    if record['empty']:
+        line += '  ' + (colorize('(empty)', 'yellow') if colored else '(empty)')
+    return line + '\n'
+
+
+def format_size(size):
+    """Get a short human readable size, like ls -lh: 512, 1.5K, 12M
+
+    Arguments:
+        size -- int number of bytes
+    """
+    for unit in ('', 'K', 'M', 'G'):
+        if size < 1024 or unit == 'G':
+            break
+        size /= 1024
+    if not unit:
+        return str(size)
+    return f'{size:.1f}{unit}' if size < 10 else f'{size:.0f}{unit}'
+
+
+def _json_array(lines):
+    """Wrap lines of JSON values into a JSON array, one value per line"""
+    separator = '['
+    for line in lines:
+        yield separator + line
+        separator = ','
+    yield '[]\n' if separator == '[' else ']\n'
@@ -3,15 +3,10 @@
 # system imports
 import sys
 
-# 3rd party imports
-import colorama
-
 # app imports
-from ntbk import initialize
-from ntbk.config import Config
-from ntbk.dispatcher import Dispatcher
-from ntbk.filesystem import Filesystem
-from ntbk.exceptions import InvalidConfigException
+from ntbk import client, profiling
+from ntbk.exceptions import (FileLockTimeoutException, InvalidConfigException,
+    InvalidSearchQueryException, ServerRunningException, WatcherRunningException)
 
 def exit_with_err(err):
     """Print the error and exit the application"""
@@ -20,13 +15,55 @@ def exit_with_err(err):
 
 def run():
     """Run the application"""
+    args, profile = profiling.parse_args(sys.argv[1:])
+
+    if profile:
+        # always run in-process when profiling, the server's run would be invisible
+        profiling.start(profile)
+    elif not is_long_running(args):
+        # hand the command to a running `ntbk serve` if there is one, before importing the app
+        exit_code = client.forward(args)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    try:
+        run_in_process(args)
+    finally:
+        if profile:
+            profiling.finish()
+
+def is_long_running(args):
+    """Check if the command runs until interrupted, so it can't be forwarded to the server
+
+    Arguments:
+        args -- list of arguments (sys.argv[1:] without --profile)
+    """
+    return bool(args) and args[0] in client.LONG_RUNNING_COMMANDS
+
+def run_in_process(args):
+    """Load the app and run the command in this process
+
+    Arguments:
+        args -- list of arguments (sys.argv[1:] without --profile)
+    """
+    with profiling.span('import app'):
+        from ntbk import colors, initialize
+        from ntbk.config import Config
+        from ntbk.dispatcher import Dispatcher
+        from ntbk.filesystem import Filesystem
+
     try:
-        config = Config()
-        filesystem = Filesystem(config)
-        colorama.init()
-        initialize.init_app(config)
-        Dispatcher(config, filesystem).run(sys.argv[1:])
-    except InvalidConfigException as err:
+        with profiling.span('load config'):
+            config = Config()
+            filesystem = Filesystem(config)
+        colors.init_on_first_use()
+        with profiling.span('init app'):
+            initialize.init_app(config)
+        dispatcher = Dispatcher(config, filesystem)
+        with profiling.span('run command'):
+            dispatcher.run(args)
+    except (InvalidConfigException, InvalidSearchQueryException,
+            FileLockTimeoutException, ServerRunningException, WatcherRunningException) as err:
         exit_with_err(err)
     except KeyboardInterrupt:
         sys.exit(0)
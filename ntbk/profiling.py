@@ -0,0 +1,168 @@
+"""Timing spans and profiling for a single run, enabled with --profile or NTBK_PROFILE.
+
+With --profile (or NTBK_PROFILE=1) a table of how long each phase of the run took is
+printed on stderr when ntbk exits. With --profile=FILE (or NTBK_PROFILE=FILE) the run
+is also profiled with cProfile, the stats are written to FILE (open it with pstats or
+snakeviz) and the peak memory seen by tracemalloc is reported. Both make the run slower,
+so compare those timings with each other, not with unprofiled runs.
+
+When profiling isn't enabled span() returns a shared do-nothing context manager,
+so the spans cost next to nothing.
+"""
+
+# system imports
+import os
+import sys
+import time
+
+_STATE = {'enabled': False, 'start': 0.0, 'stack': [], 'totals': {}, 'output': None,
+    'profiler': None}
+
+# NTBK_PROFILE values that only turn on the timing table
+_TABLE_ONLY = ('1', 'true', 'yes', 'on')
+# NTBK_PROFILE values that leave profiling off
+_OFF = ('', '0', 'false', 'no', 'off')
+
+
+class _NoSpan():
+    """Context manager that does nothing, used while profiling is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+
+class _Span():
+    """Context manager that adds the time spent inside it to the totals for its phase.
+    Phases are keyed by the names of the spans they are nested in.
+
+    Arguments:
+        name -- string name of the phase
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.key = None
+        self.start = 0.0
+
+    def __enter__(self):
+        _STATE['stack'].append(self.name)
+        self.key = tuple(_STATE['stack'])
+        # add the key now so phases are reported in the order they started
+        _STATE['totals'].setdefault(self.key, [0, 0.0])
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_exc):
+        elapsed = time.perf_counter() - self.start
+        _STATE['stack'].pop()
+        totals = _STATE['totals'][self.key]
+        totals[0] += 1
+        totals[1] += elapsed
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """Get a context manager timing a phase of the run, e.g. `with span('render template'):`
+
+    Arguments:
+        name -- string name of the phase
+    """
+    if not _STATE['enabled']:
+        return _NO_SPAN
+    return _Span(name)
+
+
+def parse_args(args):
+    """Take the --profile option out of the program's args.
+    Returns (remaining args, profile setting) where the setting is None when profiling
+    is off, '1' for the timing table only, or the path to write cProfile stats to.
+    The --profile option wins over NTBK_PROFILE.
+
+    Arguments:
+        args -- list of arguments (usually sys.argv[1:])
+    """
+    setting = _normalize(os.environ.get('NTBK_PROFILE', ''))
+    remaining = []
+    for arg in args:
+        if arg == '--profile':
+            setting = '1'
+        elif arg.startswith('--profile='):
+            setting = _normalize(arg.split('=', 1)[1] or '1')
+        else:
+            remaining.append(arg)
+    return remaining, setting
+
+
+def _normalize(value):
+    """Turn a profile setting into None (off), '1' (table only) or a file path"""
+    if value.strip().lower() in _OFF:
+        return None
+    if value.strip().lower() in _TABLE_ONLY:
+        return '1'
+    return value
+
+
+def start(setting):
+    """Start timing (and profiling, if the setting is a file path) the run
+
+    Arguments:
+        setting -- profile setting from parse_args
+    """
+    _STATE.update(enabled=True, start=time.perf_counter(), stack=[], totals={}, output=None,
+        profiler=None)
+    if setting.lower() not in _TABLE_ONLY:
+        import cProfile
+        import tracemalloc
+
+        _STATE['output'] = setting
+        tracemalloc.start()
+        _STATE['profiler'] = cProfile.Profile()
+        _STATE['profiler'].enable()
+
+
+def finish(stream=None):
+    """Stop timing, write the cProfile stats if profiling and print the report
+
+    Arguments:
+        stream -- text file object to print the report to (stderr by default)
+    """
+    stream = stream or sys.stderr
+    total = time.perf_counter() - _STATE['start']
+    peak = None
+    if _STATE['profiler'] is not None:
+        import tracemalloc
+
+        _STATE['profiler'].disable()
+        _STATE['profiler'].dump_stats(_STATE['output'])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    _STATE['enabled'] = False
+
+    for line in format_report(_STATE['totals'], total):
+        print(line, file=stream)
+    if peak is not None:
+        print(f'peak memory {peak / 1e6:.1f} MB (tracemalloc)', file=stream)
+        print(f"cProfile stats written to {_STATE['output']}", file=stream)
+
+
+def format_report(totals, total):
+    """Get the lines of the timing table. Nested phases are indented under their parent.
+
+    Arguments:
+        totals -- dict of span key tuple -> [calls, seconds]
+        total -- float seconds the whole run took
+    """
+    width = max([2 * (len(key) - 1) + len(key[-1]) for key in totals] + [len('total')])
+    lines = [f"{'phase':<{width}}  {'calls':>6}  {'ms':>9}  {'%':>5}"]
+    for key, (calls, seconds) in totals.items():
+        name = '  ' * (len(key) - 1) + key[-1]
+        percent = seconds / total * 100 if total else 0
+        lines.append(f'{name:<{width}}  {calls:>6}  {seconds * 1000:>9.2f}  {percent:>5.1f}')
+    lines.append(f"{'total':<{width}}  {'':>6}  {total * 1000:>9.2f}  {100:>5.1f}")
+    return lines
@@ -0,0 +1,164 @@
+"""Keeps track of the files ntbk recently opened, created or jotted to, for `ntbk recent`.
+
+The files are kept in .ntbk/recent, one line per file with the most recent first, and the
+list never grows past MAX_ENTRIES. Updates hold an exclusive lock while they read and
+rewrite the list and replace the file in one rename, so concurrent ntbk processes never
+lose each other's updates and readers never see a partial file.
+"""
+
+# system imports
+import os
+import time
+from collections import namedtuple
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover - not available on windows
+    fcntl = None
+
+# app imports
+from ntbk.helpers import atomic_write
+
+# RecentFile -- a file ntbk used recently
+#   path -- Path object to the file
+#   time_ns -- when it was last used (or modified, after a reconcile) in nanoseconds
+#   event -- string how it was last used: 'open', 'create', 'append' or 'edit' (modified
+#       outside of ntbk, found by reconcile)
+RecentFile = namedtuple('RecentFile', ['path', 'time_ns', 'event'])
+
+# Filesystem listener events that are recorded. Files pre-created in bulk ('bulk_create')
+# aren't, they'd push the files actually used out of the list
+EVENTS = ('open', 'create', 'append')
+
+
+class RecentFiles():
+    """Bounded most-recently-used list of notebook files
+
+    Arguments:
+        filesystem -- Filesystem instance
+
+    Attributes:
+        filesystem -- Filesystem instance
+    """
+
+    FILENAME = 'recent'
+    MAX_ENTRIES = 100
+
+    def __init__(self, filesystem):
+        self.filesystem = filesystem
+
+    def get_path(self):
+        """Get the pathlib.Path object to the list file"""
+        return self.filesystem.get_cache_base_path() / self.FILENAME
+
+    def get_entries(self, limit=None):
+        """Get a list of RecentFile, most recently used first
+
+        Arguments:
+            limit -- optional max number of entries to return
+        """
+        entries = self._read()
+        return entries if limit is None else entries[:limit]
+
+    def record(self, event, filepath):
+        """Move a file to the top of the list
+
+        Arguments:
+            event -- string event, e.g. 'open'
+            filepath -- Path object to the file
+        """
+        entry = RecentFile(Path(filepath), time.time_ns(), event)
+        with self._locked():
+            entries = [existing for existing in self._read() if existing.path != entry.path]
+            self._write([entry] + entries)
+
+    def on_file_used(self, event, filepath):
+        """Filesystem listener recording the files ntbk opens, creates and appends to
+
+        Arguments:
+            event -- string event name
+            filepath -- Path object to the file
+        """
+        if event not in EVENTS or '\n' in str(filepath):
+            return
+        try:
+            self.record(event, filepath)
+        except OSError:
+            # never fail a command because of the recent list
+            pass
+
+    def reconcile(self):
+        """Pick up changes made outside of ntbk to the files in the list by checking only
+        their mtimes: files modified since they were last used move up, and files that
+        no longer exist are dropped. Returns the number of entries that changed.
+        """
+        with self._locked():
+            entries = []
+            changed = 0
+            for entry in self._read():
+                try:
+                    mtime_ns = self.filesystem.stat(entry.path).st_mtime_ns
+                except FileNotFoundError:
+                    changed += 1
+                    continue
+                if mtime_ns > entry.time_ns:
+                    entry = RecentFile(entry.path, mtime_ns, 'edit')
+                    changed += 1
+                entries.append(entry)
+            if changed:
+                entries.sort(key=lambda entry: entry.time_ns, reverse=True)
+                self._write(entries)
+        return changed
+
+    def _read(self):
+        """Read the list from disk. A missing file is an empty list."""
+        notebook_path = self.filesystem.get_notebook_base_path()
+        try:
+            lines = self.get_path().read_text(encoding='utf-8').splitlines()
+        except FileNotFoundError:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                time_ns, event, rel_path = line.split('\t', 2)
+                entries.append(RecentFile(notebook_path / rel_path, int(time_ns), event))
+            except ValueError:
+                continue # a line from a newer or broken version
+        return entries
+
+    def _write(self, entries):
+        """Replace the list on disk with the given entries (only the first MAX_ENTRIES)"""
+        notebook_path = self.filesystem.get_notebook_base_path()
+        lines = []
+        for entry in entries[:self.MAX_ENTRIES]:
+            try:
+                rel_path = entry.path.relative_to(notebook_path).as_posix()
+            except ValueError:
+                rel_path = str(entry.path)
+            lines.append(f'{entry.time_ns}\t{entry.event}\t{rel_path}\n')
+
+        atomic_write(self.get_path(), ''.join(lines).encode('utf-8'))
+
+    def _locked(self):
+        """Get a context manager holding the exclusive lock for updating the list"""
+        return _Lock(self.get_path().with_name(self.FILENAME + '.lock'))
+
+
+class _Lock():
+    """Exclusive advisory lock on a lock file, held for the duration of a with block"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *_exc_info):
+        # closing the file releases the lock
+        os.close(self.fd)
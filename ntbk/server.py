@@ -0,0 +1,255 @@
+"""Resident `ntbk serve` process that keeps the app warm between commands.
+
+Config, Filesystem, the Dispatcher's argument parser, the indexes and the jinja2
+environments are created once and reused for every command forwarded by ntbk.client.
+"""
+
+# system imports
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+# app imports
+from ntbk import client, initialize
+from ntbk.config import Config
+from ntbk.exceptions import InvalidConfigException, ServerRunningException
+from ntbk.filesystem import Filesystem
+
+
+class ServerFilesystem(Filesystem):
+    """Filesystem that records the files to open instead of launching the editor,
+    since the editor has to run in the client's terminal.
+
+    Attributes:
+        to_open -- list of string paths to open once the command is done
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.to_open = []
+
+    def open_file_in_editor(self, path):
+        """Record the path so the client opens it
+
+        Arguments:
+            path -- String or Path object. Must be the absolute path
+        """
+        self.notify_listeners('open', Path(path))
+        self.to_open.append(str(path))
+
+
+class _MessageWriter(io.RawIOBase):
+    """Raw stream that sends everything written to it as framed messages of one kind"""
+
+    def __init__(self, conn, kind):
+        super().__init__()
+        self.conn = conn
+        self.kind = kind
+
+    def writable(self):
+        return True
+
+    def write(self, data): #pylint: disable=arguments-renamed
+        client.write_message(self.conn, self.kind, bytes(data))
+        return len(data)
+
+
+class App():
+    """The warm application state shared by all commands the server runs.
+    It is rebuilt whenever the config file changes.
+
+    Arguments:
+        dispatcher_class -- Dispatcher class that runs the commands
+            (passed in since the dispatcher imports this module for 'serve')
+        config_path -- optional Path to the config file (for tests)
+
+    Attributes:
+        config -- Config instance
+        filesystem -- ServerFilesystem instance
+        dispatcher -- Dispatcher instance
+    """
+
+    def __init__(self, dispatcher_class, config_path=None):
+        self.dispatcher_class = dispatcher_class
+        self.config_path = (config_path or Path(Config.CONFIG_FILEPATH)).expanduser()
+        self.config_signature = None
+        self.config = None
+        self.filesystem = None
+        self.dispatcher = None
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild the app if the config file changed since it was last built.
+        Raises an InvalidConfigException if the changed config can't be used, and tries
+        again on the next command.
+        """
+        import yaml
+
+        signature = _stat_signature(self.config_path)
+        if self.dispatcher is not None and signature == self.config_signature:
+            return
+        try:
+            config = Config(file_path=self.config_path)
+        except yaml.YAMLError as err:
+            raise InvalidConfigException() from err
+        # the same checks as a normal run. The server can't prompt for missing values,
+        # so an incomplete config is an error rather than a question
+        initialize.init_notebook(config)
+        self.config = config
+        self.filesystem = ServerFilesystem(config)
+        self.dispatcher = self.dispatcher_class(config, self.filesystem)
+        self.config_signature = signature
+
+    def run(self, request, conn):
+        """Run one forwarded command, streaming its output over the connection.
+        Returns the dict for the client's exit message.
+
+        Arguments:
+            request -- dict with argv, cwd, tty and stdin
+            conn -- binary file object of the client connection
+        """
+        import colorama
+
+        self.refresh()
+        self.filesystem.to_open = []
+        stdout = io.TextIOWrapper(io.BufferedWriter(_MessageWriter(conn, client.STDOUT)),
+            encoding='utf-8', line_buffering=True)
+        stderr = io.TextIOWrapper(io.BufferedWriter(_MessageWriter(conn, client.STDERR)),
+            encoding='utf-8', line_buffering=True)
+        # like colorama.init() does for a normal run, strip colors when not writing to a tty
+        colored_stdout = colorama.AnsiToWin32(stdout, strip=not request['tty']).stream
+
+        code = 0
+        previous_cwd = os.getcwd()
+        previous_stdin = sys.stdin
+        sys.stdin = io.StringIO(request.get('stdin') or '')
+        try:
+            os.chdir(request['cwd'])
+            with redirect_stdout(colored_stdout), redirect_stderr(stderr):
+                try:
+                    self.dispatcher.run(request['argv'])
+                except SystemExit as err:
+                    code = _exit_code(err)
+                except Exception as err: #pylint: disable=broad-except
+                    print(err, file=sys.stderr)
+                    code = 1
+        finally:
+            sys.stdin = previous_stdin
+            os.chdir(previous_cwd)
+            stdout.flush()
+            stderr.flush()
+
+        return {'code': code, 'open': self.filesystem.to_open,
+            'editor': self.config.get('editor')}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Handles one client connection: read the request, run it, send the exit message"""
+
+    def handle(self):
+        kind, payload = client.read_message(self.rfile)
+        if kind != client.REQUEST:
+            return
+        request = json.loads(payload)
+        command = request['argv'][0] if request['argv'] else None
+        if command in client.LONG_RUNNING_COMMANDS:
+            # it would never finish, and every other command would wait behind it
+            client.write_message(self.wfile, client.STDERR,
+                f"ntbk {command} can't be run by the server, run it with NTBK_NO_SERVER=1\n"
+                .encode('utf-8'))
+            client.write_message(self.wfile, client.EXIT,
+                json.dumps({'code': 1, 'open': []}).encode('utf-8'))
+            return
+        try:
+            result = self.server.app.run(request, self.wfile)
+        except InvalidConfigException as err:
+            client.write_message(self.wfile, client.STDERR, f'{err}\n'.encode('utf-8'))
+            result = {'code': 1, 'open': []}
+        except Exception: #pylint: disable=broad-except
+            client.write_message(self.wfile, client.STDERR, traceback.format_exc().encode())
+            result = {'code': 1, 'open': []}
+        client.write_message(self.wfile, client.EXIT, json.dumps(result).encode('utf-8'))
+
+
+class Server(socketserver.UnixStreamServer):
+    """Unix socket server running forwarded commands one at a time
+
+    Arguments:
+        socket_path -- string path to the socket
+        app -- App instance
+    """
+
+    def __init__(self, socket_path, app):
+        self.app = app
+        _remove_stale_socket(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+        # create the socket private to the owner from the start, not just after the chmod
+        previous_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(socket_path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def serve(dispatcher_class, socket_path=None, config_path=None):
+    """Run the server until interrupted
+
+    Arguments:
+        dispatcher_class -- Dispatcher class that runs the commands
+        socket_path -- optional path to the socket (see client.get_socket_path)
+        config_path -- optional Path to the config file
+    """
+    socket_path = client.get_socket_path(socket_path)
+    with Server(socket_path, App(dispatcher_class, config_path)) as server:
+        print(f'ntbk server listening on {socket_path}')
+        sys.stdout.flush()
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+
+def _remove_stale_socket(socket_path):
+    """Remove a socket file left behind by a server that is no longer running.
+    Raises a ServerRunningException if a server is still running on it.
+    """
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+            return
+    raise ServerRunningException(socket_path)
+
+
+def _stat_signature(path):
+    """Get (mtime_ns, size) of a file, or None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _exit_code(err):
+    """Get the process exit code sys.exit() would have used for a SystemExit"""
+    if err.code is None:
+        return 0
+    if isinstance(err.code, int):
+        return err.code
+    print(err.code, file=sys.stderr)
+    return 1
@@ -0,0 +1,221 @@
+"""Template variables that are only computed when a template uses them.
+
+Each template is analyzed once for the variable names it (and any template it includes,
+imports or extends) references, and the result is cached in .ntbk/template_names.json
+until one of those template files changes.
+
+Variables in the template_vars config can be backed by a provider - a shell command or a
+file - whose value is cached in .ntbk/template_vars.json for the provider's ttl seconds:
+
+    template_vars:
+      branch:
+        command: git -C ~/code/ntbk branch --show-current
+        ttl: 300
+      weather:
+        file: ~/.cache/weather.txt
+"""
+
+# system imports
+import os
+import sys
+import time
+from pathlib import Path
+
+# app imports
+from ntbk.helpers import atomic_write
+
+NAMES_CACHE = 'template_names.json'
+PROVIDER_CACHE = 'template_vars.json'
+
+# keys a template_vars entry can have to be treated as a provider rather than plain data
+PROVIDER_KEYS = {'command', 'file', 'ttl', 'timeout', 'json'}
+
+DEFAULT_TTL = 60
+DEFAULT_TIMEOUT = 10
+
+
+def get_referenced_names(environment, filesystem, template_name):
+    """Get a set of the variable names a template uses, or None if that can't be known
+    (e.g. it includes a template whose name is only known when it's rendered)
+
+    Arguments:
+        environment -- jinja2 Environment the template is loaded from
+        filesystem -- Filesystem instance
+        template_name -- string file name of the template, e.g. 'log_default.md'
+    """
+    import json
+
+    template_path = filesystem.get_templates_base_path()
+    cache_path = filesystem.get_cache_base_path() / NAMES_CACHE
+    try:
+        cache = json.loads(cache_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        cache = {}
+
+    cached = cache.get(template_name)
+    if cached is not None and _get_signatures(template_path, cached['files']) == \
+            cached['files']:
+        return None if cached['names'] is None else set(cached['names'])
+
+    names, files = _analyze(environment, template_name)
+    cache[template_name] = {'names': None if names is None else sorted(names),
+        'files': _get_signatures(template_path, files)}
+    atomic_write(cache_path, json.dumps(cache).encode('utf-8'))
+    return names
+
+
+def _analyze(environment, template_name):
+    """Parse a template and every template it references. Returns a tuple of (set of
+    variable names or None, dict of template file name -> None for each file parsed)
+    """
+    from jinja2 import TemplateNotFound, meta
+
+    names = set()
+    files = {}
+    pending = [template_name]
+    while pending:
+        name = pending.pop()
+        if name in files:
+            continue
+        files[name] = None
+        try:
+            source, _filename, _uptodate = environment.loader.get_source(environment, name)
+        except TemplateNotFound:
+            continue
+        ast = environment.parse(source)
+        names.update(meta.find_undeclared_variables(ast))
+        for referenced in meta.find_referenced_templates(ast):
+            if referenced is None:
+                # a dynamic include - any variable could be used
+                return None, files
+            pending.append(referenced)
+    return names, files
+
+
+def _get_signatures(template_path, files):
+    """Get a dict of template file name -> [mtime_ns, size] (None if it doesn't exist)"""
+    signatures = {}
+    for name in files:
+        try:
+            stat = os.stat(template_path / name)
+            signatures[name] = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            signatures[name] = None
+    return signatures
+
+
+def is_provider(value):
+    """Whether a template_vars value is a provider (a dict with a command or file to get
+    the value from) rather than plain data
+
+    Arguments:
+        value -- value from the template_vars config
+    """
+    return isinstance(value, dict) and ('command' in value) != ('file' in value) \
+        and set(value) <= PROVIDER_KEYS
+
+
+def check_provider(provider):
+    """Check the values of a provider from the config have the right types.
+    Raises a ValueError describing the first one that doesn't.
+
+    Arguments:
+        provider -- dict from the template_vars config (see is_provider)
+    """
+    source = 'command' if 'command' in provider else 'file'
+    if not isinstance(provider[source], str) or not provider[source]:
+        raise ValueError(f'"{source}" must be a string')
+    for key in ('ttl', 'timeout'):
+        value = provider.get(key)
+        if value is not None and (isinstance(value, bool) or
+                not isinstance(value, (int, float)) or value < 0):
+            raise ValueError(f'"{key}" must be a number of seconds')
+    if not isinstance(provider.get('json', False), bool):
+        raise ValueError('"json" must be true or false')
+
+
+class ProviderCache():
+    """The cached values of the template_vars providers, kept in .ntbk/template_vars.json.
+    A value is used for its provider's ttl seconds, and only while the provider's config
+    is unchanged. Failed providers are never cached.
+
+    Arguments:
+        filesystem -- Filesystem instance
+
+    Attributes:
+        filesystem -- Filesystem instance
+    """
+
+    def __init__(self, filesystem):
+        self.filesystem = filesystem
+        self._values = None
+
+    def get_path(self):
+        """Get the pathlib.Path object to the cache file"""
+        return self.filesystem.get_cache_base_path() / PROVIDER_CACHE
+
+    def get_value(self, name, provider):
+        """Get the value of a provider, from the cache if it's fresh enough
+
+        Arguments:
+            name -- string variable name
+            provider -- dict from the template_vars config (see is_provider)
+        """
+        import json
+
+        if self._values is None:
+            try:
+                self._values = json.loads(self.get_path().read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                self._values = {}
+
+        try:
+            check_provider(provider)
+        except ValueError as error:
+            print(f'Template variable "{name}" could not be read: {error}', file=sys.stderr)
+            return ''
+
+        key = json.dumps(provider, sort_keys=True)
+        ttl = provider.get('ttl', DEFAULT_TTL)
+        cached = self._values.get(name)
+        if cached is not None and cached['key'] == key and \
+                0 <= time.time() - cached['time'] < ttl:
+            return cached['value']
+
+        try:
+            value = self._run(provider)
+        except (OSError, ValueError) as error:
+            print(f'Template variable "{name}" could not be read: {error}', file=sys.stderr)
+            return ''
+        if ttl > 0:
+            self._values[name] = {'key': key, 'time': time.time(), 'value': value}
+            self._save()
+        return value
+
+    def _run(self, provider):
+        """Get the value of a provider from its command or file. Raises OSError or
+        ValueError if it fails."""
+        import json
+        import subprocess
+
+        notebook_path = self.filesystem.get_notebook_base_path()
+        if 'command' in provider:
+            try:
+                result = subprocess.run(provider['command'], shell=True, cwd=notebook_path, #pylint: disable=subprocess-run-check
+                    capture_output=True, text=True,
+                    timeout=provider.get('timeout', DEFAULT_TIMEOUT))
+            except subprocess.TimeoutExpired as error:
+                raise OSError(f'timed out after {error.timeout} seconds') from error
+            if result.returncode != 0:
+                raise OSError(result.stderr.strip() or f'exit status {result.returncode}')
+            output = result.stdout
+        else:
+            output = (notebook_path / Path(provider['file']).expanduser()).read_text(
+                encoding='utf-8')
+        return json.loads(output) if provider.get('json') else output.strip()
+
+    def _save(self):
+        """Write the cache to disk (via a temp file so readers never see half of it)"""
+        import json
+
+        atomic_write(self.get_path(), json.dumps(self._values).encode('utf-8'))
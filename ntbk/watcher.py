@@ -0,0 +1,414 @@
+"""Watches the notebook for changes made outside of ntbk (e.g. in an editor) and pushes the
+changed files to the Filesystem listeners, so indexes stay up to date without rescanning.
+
+Uses inotify (through ctypes, so there is nothing to install) on Linux and falls back to
+polling file mtimes everywhere else.
+"""
+
+# system imports
+import errno
+import os
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover - not available on windows
+    fcntl = None
+
+# app imports
+from ntbk.exceptions import WatcherRunningException
+
+PIDFILE = 'watch.pid'
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | \
+    IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+
+def is_notebook_file(filesystem, path):
+    """Whether the path is a markdown file in the log or collections folder
+
+    Arguments:
+        filesystem -- Filesystem instance
+        path -- Path object
+    """
+    if path.suffix != '.md':
+        return False
+    return any(base in path.parents for base in
+        (filesystem.get_log_base_path(), filesystem.get_collection_base_path()))
+
+
+class InotifyWatcher():
+    """Reports changed notebook files using Linux inotify. Every folder in the notebook
+    (except hidden ones like .ntbk) is watched, and new folders are watched as they appear.
+
+    Arguments:
+        filesystem -- Filesystem instance
+
+    Attributes:
+        filesystem -- Filesystem instance
+        fd -- inotify file descriptor
+        watches -- dict of watch descriptor -> Path object of the watched folder
+        files -- set of Path objects of the notebook files known to exist, used to report
+            every file in a folder that is moved away or deleted
+    """
+
+    name = 'inotify'
+
+    def __init__(self, filesystem):
+        import ctypes
+        import ctypes.util
+
+        self.filesystem = filesystem
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches = {}
+        self.files = set()
+        self._add_tree(filesystem.get_notebook_base_path())
+
+    @classmethod
+    def is_available(cls):
+        """Whether inotify can be used on this system"""
+        import sys
+
+        return sys.platform.startswith('linux')
+
+    def close(self):
+        """Stop watching"""
+        os.close(self.fd)
+
+    def read_changes(self, timeout):
+        """Wait up to timeout seconds for changes and get a set of the changed notebook
+        files as Path objects (empty if nothing changed). Returns None if the kernel
+        dropped events, in which case everything has to be checked again.
+
+        Arguments:
+            timeout -- seconds
+        """
+        import select
+        import struct
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        overflowed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = struct.unpack_from('iIII', data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b'\0')
+                offset += 16 + length
+                if mask & IN_Q_OVERFLOW:
+                    overflowed = True
+                    continue
+                self._handle_event(wd, mask, os.fsdecode(name), changed)
+
+        if overflowed:
+            self.files = {Path(entry.path) for entry in self.filesystem.iter_notebook_files()}
+            return None
+        return {path for path in changed if is_notebook_file(self.filesystem, path)}
+
+    def _handle_event(self, wd, mask, name, changed):
+        """Add the files affected by one inotify event to the changed set"""
+        folder = self.watches.get(wd)
+        if folder is None:
+            return
+        if mask & IN_IGNORED:
+            # the folder was deleted or moved away - its contents were handled by the
+            # event on its parent folder
+            del self.watches[wd]
+            return
+        if not name:
+            return
+
+        path = folder / name
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                changed.update(self._add_tree(path))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                gone = {file for file in self.files if path in file.parents}
+                self.files -= gone
+                changed.update(gone)
+                self._remove_tree(path)
+            return
+
+        changed.add(path)
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self.files.discard(path)
+        else:
+            self.files.add(path)
+
+    def _add_tree(self, path):
+        """Watch a folder and every folder below it. Returns the set of notebook files in
+        it, as they may have been written before the watches were added.
+
+        Arguments:
+            path -- Path object to a folder
+        """
+        import ctypes
+
+        found = set()
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                # removed again before it could be watched
+                return found
+            raise OSError(error, f'Could not watch {path}. Raising '\
+                'fs.inotify.max_user_watches may help')
+        self.watches[wd] = path
+
+        try:
+            with os.scandir(path) as entries:
+                entries = list(entries)
+        except (FileNotFoundError, NotADirectoryError):
+            return found
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith('.'):
+                    found.update(self._add_tree(Path(entry.path)))
+            elif is_notebook_file(self.filesystem, Path(entry.path)):
+                found.add(Path(entry.path))
+        self.files.update(found)
+        return found
+
+    def _remove_tree(self, path):
+        """Stop watching a folder and every folder below it. A folder that was moved keeps
+        its watch, which would otherwise go on reporting files under the old path.
+
+        Arguments:
+            path -- Path object to a folder
+        """
+        for wd, folder in list(self.watches.items()):
+            if folder == path or path in folder.parents:
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+
+class PollingWatcher():
+    """Reports changed notebook files by comparing the mtime and size of every file
+    every interval seconds. Used where inotify isn't available.
+
+    Arguments:
+        filesystem -- Filesystem instance
+        interval -- seconds between checks
+
+    Attributes:
+        filesystem -- Filesystem instance
+        interval -- seconds between checks
+        files -- dict of Path object -> (mtime_ns, size) from the last check
+    """
+
+    name = 'polling'
+
+    def __init__(self, filesystem, interval=2.0):
+        self.filesystem = filesystem
+        self.interval = interval
+        self.files = self._snapshot()
+        self.checked = time.monotonic()
+
+    def close(self):
+        """Stop watching"""
+
+    def read_changes(self, timeout):
+        """Wait up to timeout seconds for changes and get a set of the changed notebook
+        files as Path objects (empty if nothing changed)
+
+        Arguments:
+            timeout -- seconds
+        """
+        wait = self.checked + self.interval - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(wait, 0))
+
+        files = self._snapshot()
+        self.checked = time.monotonic()
+        changed = {path for path, signature in files.items()
+            if self.files.get(path) != signature}
+        changed.update(path for path in self.files if path not in files)
+        self.files = files
+        return changed
+
+    def _snapshot(self):
+        """Get a dict of Path -> (mtime_ns, size) for every notebook file"""
+        snapshot = {}
+        for entry in self.filesystem.iter_notebook_files():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+
+def get_watcher(filesystem, poll=False, interval=2.0):
+    """Get an InotifyWatcher if possible, otherwise a PollingWatcher
+
+    Arguments:
+        filesystem -- Filesystem instance
+        poll -- True to always poll
+        interval -- seconds between checks when polling
+    """
+    if not poll and InotifyWatcher.is_available():
+        try:
+            return InotifyWatcher(filesystem)
+        except (OSError, AttributeError):
+            # AttributeError: libc has no inotify functions
+            pass
+    return PollingWatcher(filesystem, interval)
+
+
+def collect_batch(watcher, debounce, max_delay, timeout=1.0):
+    """Wait for changes and keep collecting them until none arrive for debounce seconds
+    (or max_delay seconds have passed, so a file that is written constantly still gets
+    picked up). Returns a set of changed Paths, empty if nothing changed within timeout,
+    or None if everything has to be checked again.
+
+    Arguments:
+        watcher -- InotifyWatcher or PollingWatcher
+        debounce -- seconds without changes that end the batch
+        max_delay -- max seconds to collect one batch for
+        timeout -- seconds to wait for the first change
+    """
+    changed = watcher.read_changes(timeout)
+    if not changed:
+        return changed
+
+    started = time.monotonic()
+    while time.monotonic() - started < max_delay:
+        more = watcher.read_changes(debounce)
+        if more is None:
+            return None
+        if not more:
+            break
+        changed |= more
+    return changed
+
+
+def get_pidfile_path(filesystem):
+    """Get the Path object to the file holding the pid of the running watcher"""
+    return filesystem.get_cache_base_path() / PIDFILE
+
+
+def is_running(filesystem):
+    """Whether `ntbk watch` is running for the notebook, so indexes are kept up to date
+    and don't need to be checked for changes before they are used.
+
+    The watcher holds a lock on its pid file for as long as it runs, so a pid file left
+    behind by a watcher that was killed (even if its pid was reused since) isn't locked.
+
+    Arguments:
+        filesystem -- Filesystem instance
+    """
+    try:
+        fd = os.open(get_pidfile_path(filesystem), os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        if fcntl is None:
+            return _is_pid_alive(os.read(fd, 32))
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        return False
+    finally:
+        # closing the file releases the lock if we got it
+        os.close(fd)
+
+
+def _is_pid_alive(data):
+    """Whether the pid in the pid file's contents is a running process (for systems
+    without flock, where a reused pid can't be told apart)"""
+    try:
+        os.kill(int(data), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        # running, but as another user
+        return True
+    return True
+
+
+def _lock_pidfile(pidfile):
+    """Create and lock the pid file, writing our pid to it. Returns the open file
+    descriptor, which holds the lock until it is closed. Raises a WatcherRunningException
+    if another watcher holds it.
+    """
+    pidfile.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(pidfile, os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError as err:
+            os.close(fd)
+            raise WatcherRunningException(pidfile.parent.parent) from err
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    return fd
+
+
+def watch(filesystem, watcher, *, on_batch=None, debounce=0.2, max_delay=2.0, #pylint: disable=too-many-arguments
+        resync=None, stop=None):
+    """Push changed notebook files to the filesystem's listeners as 'change' events until
+    stop is set (or forever). A locked pid file in the .ntbk folder tells other ntbk
+    commands the watcher is running while it does. Raises a WatcherRunningException if
+    another watcher is already running for the notebook.
+
+    Arguments:
+        filesystem -- Filesystem instance
+        watcher -- InotifyWatcher or PollingWatcher
+        on_batch -- optional callable called with the set of changed Paths after each batch
+        debounce -- seconds without changes that end a batch
+        max_delay -- max seconds to collect one batch for
+        resync -- optional callable that checks everything again when events were lost
+        stop -- optional threading.Event to stop watching
+    """
+    pidfile = get_pidfile_path(filesystem)
+    try:
+        pidfile_fd = _lock_pidfile(pidfile)
+    except WatcherRunningException:
+        watcher.close()
+        raise
+    try:
+        while stop is None or not stop.is_set():
+            changed = collect_batch(watcher, debounce, max_delay)
+            if changed is None:
+                if resync is not None:
+                    resync()
+                continue
+            for path in sorted(changed):
+                filesystem.notify_listeners('change', path)
+            if changed and on_batch is not None:
+                on_batch(changed)
+    finally:
+        watcher.close()
+        try:
+            pidfile.unlink()
+        except FileNotFoundError:
+            pass
+        os.close(pidfile_fd)
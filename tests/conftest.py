@@ -70,3 +70,17 @@ def template_factory_fixture(config, filesystem):
         (template_path / (name + '.md')).write_text(content)
         return Template(config, filesystem, name)
     return _template
+
+@pytest.fixture(name='file_factory')
+def file_factory_fixture(filesystem):
+    """Return a function for writing notebook files"""
+    # path is relative to the notebook (or absolute), or to the log folder of the
+    # ISO date given as day. Parent folders are created and the file's Path is returned
+    def _file(path='index.md', content='', day=None):
+        base = filesystem.get_notebook_base_path() if day is None else \
+            filesystem.get_log_date_path(date.fromisoformat(day))
+        file_path = base / path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+        return file_path
+    return _file
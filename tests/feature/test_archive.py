@@ -0,0 +1,188 @@
+"""Tests for the 'archive' command and reading from archived log years"""
+
+# system imports
+import fcntl
+import io
+import os
+from datetime import date
+
+# 3rd party imports
+import pytest
+from freezegun import freeze_time
+
+# app imports
+from ntbk import archive, export
+from ntbk.entities.logs import LogFile, iter_log_dates
+
+
+def make_archive(dispatcher, file_factory):
+    """Write logs in 2019, 2020 and 2021 and archive the years before 2021"""
+    paths = [
+        file_factory(content='old spice', day='2019-03-01'),
+        file_factory(content='summer #travel', day='2020-06-01'),
+        file_factory('work/notes.md', 'packed', day='2020-06-01'),
+        file_factory(content='new year', day='2021-01-01'),
+    ]
+    os.utime(paths[1], ns=(1_500_000_000_123_456_789, 1_500_000_000_123_456_789))
+    dispatcher.run(['archive', '--before', '2021'])
+    return paths
+
+@freeze_time('2021-12-30')
+def test_archive_packs_old_years(dispatcher, filesystem, file_factory):
+    """Test old years are packed into zip files and their folders removed"""
+    paths = make_archive(dispatcher, file_factory)
+    log_base = filesystem.get_log_base_path()
+
+    assert sorted(entry.name for entry in os.scandir(log_base)) == \
+        ['2019.zip', '2020.zip', '2021']
+    assert filesystem.archive.get_years() == [2019, 2020]
+    assert not paths[0].exists() and paths[3].exists()
+
+    # transparent reads, keeping the exact modification time
+    assert filesystem.exists(paths[1])
+    assert filesystem.read_text(paths[1]) == 'summer #travel'
+    assert filesystem.stat(paths[1]).st_mtime_ns == 1_500_000_000_123_456_789
+
+@freeze_time('2021-12-30')
+def test_archive_rejects_current_year(dispatcher):
+    """Test the current year can't be archived"""
+    with pytest.raises(SystemExit):
+        dispatcher.run(['archive', '--before', '2022'])
+
+@freeze_time('2021-12-30')
+def test_archived_days_are_listed(config, dispatcher, filesystem, capsys, file_factory):
+    """Test archived days are walked by date range and listed like any other day"""
+    make_archive(dispatcher, file_factory)
+    capsys.readouterr()
+
+    logdates = iter_log_dates(config, filesystem, date.min, date.max)
+    assert [logdate.get_date() for logdate in logdates] == \
+        [date(2019, 3, 1), date(2020, 6, 1), date(2021, 1, 1)]
+
+    dispatcher.run(['date', '2020-06-01', '--list'])
+    assert capsys.readouterr().out.splitlines() == ['index', '\x1b[34mwork/\x1b[0m']
+
+    dispatcher.run(['range', '2019-01-01', '2021-12-31', 'index', '--find'])
+    assert len(capsys.readouterr().out.splitlines()) == 3
+
+    dispatcher.run(['range', '2020-01-01', '2020-12-31', '--list', '-r'])
+    assert capsys.readouterr().out.splitlines() == ['2020-06-01 index',
+        '2020-06-01 \x1b[34mwork/\x1b[0m', f'2020-06-01 work{os.sep}notes']
+    assert not (filesystem.get_log_base_path() / '2019').exists()
+
+    logfile = LogFile(config, filesystem, date(2020, 6, 1), 'work')
+    assert logfile.is_dir()
+
+@freeze_time('2021-12-30')
+def test_archived_files_are_exported_and_searched(config, dispatcher, filesystem, capsys,
+        file_factory):
+    """Test export, grep and the indexes read archived files"""
+    make_archive(dispatcher, file_factory)
+    capsys.readouterr()
+
+    out = io.BytesIO()
+    export.export(filesystem, export.iter_export_files(config, filesystem), 'md', out)
+    assert b'old spice' in out.getvalue() and b'packed' in out.getvalue()
+
+    dispatcher.run(['grep', 'spice'])
+    assert '2019-03-01/index.md' in capsys.readouterr().out
+
+    dispatcher.run(['tag', 'travel'])
+    assert 'summer #travel' in capsys.readouterr().out
+
+@freeze_time('2021-12-30')
+def test_writing_unpacks_the_day(config, dispatcher, filesystem, file_factory):
+    """Test writing to an archived day unpacks only that day"""
+    paths = make_archive(dispatcher, file_factory)
+
+    filesystem.append_to_file(paths[1], '\nmore')
+
+    assert paths[1].read_text() == 'summer #travel\nmore'
+    assert paths[2].read_text() == 'packed'
+    # the 2020 pack only held this day, so it's gone. 2019 is untouched
+    assert filesystem.archive.get_years() == [2019]
+    assert filesystem.read_text(paths[0]) == 'old spice'
+
+    dispatcher.run(['date', '2019-03-01'])
+    assert paths[0].read_text() == 'old spice'
+    assert filesystem.archive.get_years() == []
+    assert LogFile(config, filesystem, date(2019, 3, 1), 'index').exists()
+
+@freeze_time('2021-12-30')
+def test_unpacked_day_keeps_mtime(dispatcher, filesystem, file_factory):
+    """Test unpacking restores the files' modification times, so indexes don't reindex them"""
+    paths = make_archive(dispatcher, file_factory)
+
+    assert filesystem.unarchive(paths[1])
+    assert paths[1].stat().st_mtime_ns == 1_500_000_000_123_456_789
+    assert not filesystem.unarchive(paths[1])
+
+@freeze_time('2021-12-30')
+def test_archive_merges_into_existing_pack(dispatcher, filesystem, file_factory):
+    """Test archiving again after an archived day was unpacked merges it back"""
+    paths = make_archive(dispatcher, file_factory)
+    filesystem.append_to_file(paths[0], '\nmore')
+    file_factory(content='april', day='2019-04-01')
+    file_factory(content='january', day='2020-01-01')
+
+    dispatcher.run(['archive', '--before', '2021'])
+
+    assert not (filesystem.get_log_base_path() / '2019').exists()
+    days = filesystem.archive.get_days(2019) + filesystem.archive.get_days(2020)
+    assert days == [date(2019, 3, 1), date(2019, 4, 1), date(2020, 1, 1), date(2020, 6, 1)]
+    assert filesystem.read_text(paths[0]) == 'old spice\nmore'
+
+@freeze_time('2021-12-30')
+def test_files_written_while_packing_are_kept(dispatcher, filesystem, mocker, file_factory):
+    """Test a file appended to after it was packed is left on disk, where it wins"""
+    path = file_factory(content='first', day='2020-06-01')
+    sibling = file_factory('work.md', 'sibling', day='2020-06-01')
+    remove = archive._remove_packed_file #pylint: disable=protected-access
+
+    def append_then_remove(file_path, signature):
+        if file_path == path:
+            filesystem.append_to_file(path, '\nsecond')
+        remove(file_path, signature)
+
+    mocker.patch('ntbk.archive._remove_packed_file', side_effect=append_then_remove)
+    dispatcher.run(['archive', '--before', '2021'])
+
+    assert path.read_text() == 'first\nsecond'
+    assert not sibling.exists()
+    assert filesystem.read_text(path) == 'first\nsecond'
+    # unpacking the day for a write doesn't overwrite the newer file
+    filesystem.append_to_file(sibling, '\nmore')
+    assert path.read_text() == 'first\nsecond'
+    assert sibling.read_text() == 'sibling\nmore'
+
+@freeze_time('2021-12-30')
+def test_locked_files_are_kept(dispatcher, filesystem, file_factory):
+    """Test a file that is being written to while packing isn't removed"""
+    path = file_factory(content='first', day='2020-06-01')
+    fd = os.open(path, os.O_RDONLY)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        dispatcher.run(['archive', '--before', '2021'])
+    finally:
+        os.close(fd)
+    assert path.read_text() == 'first'
+    assert filesystem.archive.get_years() == [2020]
+
+@freeze_time('2021-12-30')
+def test_archive_skips_symlinks_and_odd_folders(config, dispatcher, filesystem, tmp_path,
+        file_factory):
+    """Test symlinks are left in place and only YYYY folders are log years"""
+    path = file_factory(content='first', day='2020-06-01')
+    (tmp_path / 'elsewhere').mkdir()
+    link = path.parent / 'linked'
+    link.symlink_to(tmp_path / 'elsewhere', target_is_directory=True)
+    old_copy = filesystem.get_log_base_path() / '2015-old/06-june/2015-06-02'
+    old_copy.mkdir(parents=True)
+    (old_copy / 'index.md').write_text('old copy')
+
+    dispatcher.run(['archive', '--before', '2021'])
+
+    assert link.is_symlink() and not path.exists()
+    assert filesystem.read_text(path) == 'first'
+    logdates = iter_log_dates(config, filesystem, date.min, date.max)
+    assert [logdate.get_date() for logdate in logdates] == [date(2020, 6, 1)]
@@ -0,0 +1,116 @@
+"""Tests for the 'create' command"""
+
+# system imports
+import io
+
+# 3rd party imports
+import pytest
+
+
+def log_path(ntbk_dir, day, name='index'):
+    """Get the path to a log file for a day in December 2021"""
+    return ntbk_dir / f'log/2021/12-december/2021-12-{day:02d}/{name}.md'
+
+def test_create_logs_for_range(dispatcher, config, ntbk_dir, template_factory, capsys):
+    """Test log files are created from the default template for every day in the range"""
+    template_factory('day', '# {{ log_date }} {{ team }}')
+    config.set('default_templates', {'log': {'index': 'day'}})
+
+    dispatcher.run(['create', '--from', '2021-12-01', '--to', '2021-12-03', '--vars', 'team=ops'])
+
+    for day in range(1, 4):
+        assert log_path(ntbk_dir, day).read_text() == f'# 2021-12-{day:02d} ops'
+    assert not log_path(ntbk_dir, 4).exists()
+    assert 'Created 3 files, skipped 0 that already existed' in capsys.readouterr().out
+    dispatcher.filesystem.open_file_in_editor.assert_not_called()
+
+def test_create_skips_existing_files(dispatcher, ntbk_dir, template_factory, capsys):
+    """Test files that already exist are left alone"""
+    template_factory('day', 'new')
+    existing = log_path(ntbk_dir, 2, 'work')
+    existing.parent.mkdir(parents=True)
+    existing.write_text('my notes')
+
+    dispatcher.run(['create', '--from', '2021-12-01', '--to', '2021-12-02',
+        '--file', 'work', '--template', 'day'])
+
+    assert existing.read_text() == 'my notes'
+    assert log_path(ntbk_dir, 1, 'work').read_text() == 'new'
+    assert 'Created 1 file, skipped 1 that already existed' in capsys.readouterr().out
+
+def test_create_without_template_makes_empty_files(dispatcher, ntbk_dir):
+    """Test files are still created when there is no template"""
+    dispatcher.run(['create', '--from', '2021-12-01', '--to', '2021-12-01'])
+    assert log_path(ntbk_dir, 1).read_text() == ''
+
+def test_create_updates_indexes(dispatcher, ntbk_dir, mocker):
+    """Test listeners hear about every created file"""
+    listener = mocker.Mock()
+    dispatcher.filesystem.add_listener(listener)
+
+    dispatcher.run(['create', '--from', '2021-12-01', '--to', '2021-12-02'])
+
+    listener.assert_has_calls([
+        mocker.call('bulk_create', log_path(ntbk_dir, 1)),
+        mocker.call('bulk_create', log_path(ntbk_dir, 2))])
+
+@pytest.mark.parametrize('args', [
+    ['create'],
+    ['create', '--from', '2021-12-01'],
+    ['create', '--from', '2021-12-05', '--to', '2021-12-01'],
+    ['create', '--from', '2021-12-01', '--to', '2021-12-02', '--manifest', 'files.csv'],
+])
+def test_create_invalid_args(dispatcher, args):
+    """Test a range or a manifest is required, but not both"""
+    with pytest.raises(SystemExit):
+        dispatcher.run(args)
+
+def test_create_from_csv_manifest(dispatcher, config, ntbk_dir, tmp_path, template_factory):
+    """Test collection files are created from a CSV manifest, extra columns are variables"""
+    template_factory('book', '# {{ title }} by {{ author }}')
+    template_factory('film', 'film: {{ title }}')
+    config.set('default_templates', {'collection': {'books': 'book'}})
+    manifest = tmp_path / 'files.csv'
+    manifest.write_text('collection,file,template,title,author\n'
+        'books,dune,,Dune,Frank Herbert\n'
+        'books/scifi,solaris,film,Solaris,\n')
+
+    dispatcher.run(['create', '--manifest', str(manifest)])
+
+    collections = ntbk_dir / 'collections'
+    assert (collections / 'books/dune.md').read_text() == '# Dune by Frank Herbert'
+    assert (collections / 'books/scifi/solaris.md').read_text() == 'film: Solaris'
+
+def test_create_from_ndjson_manifest_on_stdin(dispatcher, ntbk_dir, template_factory, mocker):
+    """Test an NDJSON manifest can be read from stdin, with --vars as defaults"""
+    template_factory('trip', '{{ place }} with {{ who }}')
+    mocker.patch('sys.stdin', io.StringIO(
+        '{"collection": "travel", "file": "utah", "template": "trip", "vars": {"place": "Utah"}}\n'
+        '\n'
+        '{"collection": "travel", "file": "iowa", "template": "trip", '
+        '"vars": {"place": "Iowa", "who": "Sam"}}\n'))
+
+    dispatcher.run(['create', '--manifest', '-', '--vars', 'who=Alex'])
+
+    assert (ntbk_dir / 'collections/travel/utah.md').read_text() == 'Utah with Alex'
+    assert (ntbk_dir / 'collections/travel/iowa.md').read_text() == 'Iowa with Sam'
+
+@pytest.mark.parametrize('content', [
+    'collection,file\nbooks,\n',
+    '{"collection": "books"}\n',
+    '{"collection": "books", "file": "dune", "vars": [1]}\n',
+    '{"collection": "books", "file": "dune", "template": 3}\n',
+    '{"collection": ["books"], "file": "dune"}\n',
+    '{"collection": "books", "file": 5}\n',
+    'not json\n',
+])
+def test_create_invalid_manifest(dispatcher, tmp_path, content, capsys):
+    """Test rows without a collection and file, values of the wrong type or bad JSON are
+    reported with a line number
+    """
+    manifest = tmp_path / ('files.csv' if content.startswith('collection,') else 'files.ndjson')
+    manifest.write_text(content)
+
+    with pytest.raises(SystemExit):
+        dispatcher.run(['create', '--manifest', str(manifest)])
+    assert 'line ' in capsys.readouterr().err
@@ -0,0 +1,69 @@
+"""Tests for the 'export' command"""
+
+# system imports
+import io
+import json
+import tarfile
+from datetime import date
+
+# 3rd party imports
+import pytest
+
+# app imports
+from ntbk import export
+
+
+@pytest.fixture(name='notebook')
+def notebook_fixture(file_factory):
+    """Create two log days and two collections"""
+    return [
+        file_factory(content='second day', day='2021-01-02'),
+        file_factory(content='first day', day='2021-01-01'),
+        file_factory('collections/books/dune.md', 'spice'),
+        file_factory('collections/recipes/chili.md', 'beans'),
+    ]
+
+@pytest.mark.usefixtures('notebook')
+def test_export_jsonl_everything(dispatcher, capsysbinary):
+    """Test exporting the whole notebook as JSON lines, logs in date order first"""
+    dispatcher.run(['export'])
+    records = [json.loads(line) for line in capsysbinary.readouterr().out.splitlines()]
+    assert [(record['path'], record['date'], record['collection'], record['content'])
+        for record in records] == [
+            ('log/2021/01-january/2021-01-01/index.md', '2021-01-01', None, 'first day'),
+            ('log/2021/01-january/2021-01-02/index.md', '2021-01-02', None, 'second day'),
+            ('collections/books/dune.md', None, 'books', 'spice'),
+            ('collections/recipes/chili.md', None, 'recipes', 'beans')]
+
+@pytest.mark.usefixtures('notebook')
+def test_export_filters(config, filesystem):
+    """Test dates only export logs and collections only export those collections"""
+    files = export.iter_export_files(config, filesystem, date_from=date(2021, 1, 2))
+    assert [file.name for file in files] == ['log/2021/01-january/2021-01-02/index.md']
+    files = export.iter_export_files(config, filesystem, collections=['recipes'])
+    assert [file.name for file in files] == ['collections/recipes/chili.md']
+
+@pytest.mark.usefixtures('notebook')
+def test_export_markdown(dispatcher, capsysbinary):
+    """Test exporting into a single markdown document"""
+    dispatcher.run(['export', '--collection', 'books', '--format', 'md'])
+    assert capsysbinary.readouterr().out == b'# collections/books/dune.md\n\nspice\n\n'
+
+@pytest.mark.usefixtures('notebook')
+def test_export_tar(dispatcher, tmp_path):
+    """Test exporting to a tar file keeps notebook relative paths and contents"""
+    output = tmp_path / 'export.tar'
+    dispatcher.run(['export', '--format', 'tar', '--output', str(output)])
+    with tarfile.open(output) as tar:
+        assert len(tar.getnames()) == 4
+        assert tar.extractfile('collections/books/dune.md').read() == b'spice'
+
+@pytest.mark.usefixtures('notebook')
+def test_export_progress(config, filesystem):
+    """Test the progress report counts files and bytes"""
+    stream = io.StringIO()
+    progress = export.Progress(stream)
+    export.export(filesystem, export.iter_export_files(config, filesystem), 'jsonl',
+        io.BytesIO(), progress)
+    assert (progress.files, progress.bytes) == (4, 29)
+    assert stream.getvalue().startswith('\r4 files, 0.0 MB in ')
@@ -0,0 +1,72 @@
+"""Tests for the 'grep' command"""
+
+# 3rd party imports
+import pytest
+
+# app imports
+from ntbk import grep
+
+
+@pytest.fixture(name='notebook')
+def notebook_fixture(file_factory):
+    """Create three log days (one empty) and two collections"""
+    return [
+        file_factory(content='Bought spice\n', day='2021-02-01'),
+        file_factory(content='nothing\nspice one\nspice two\n', day='2021-01-01'),
+        file_factory(day='2021-01-02'),
+        file_factory('collections/books/dune.md', '# Dune\nThe SPICE must flow'),
+        file_factory('collections/recipes/chili.md', 'beans\ncumin\n'),
+    ]
+
+@pytest.mark.usefixtures('notebook')
+def test_grep_streams_in_date_order(dispatcher, capsys):
+    """Test matches are printed with line numbers, logs in date order then collections"""
+    dispatcher.run(['grep', 'sp.ce'])
+    lines = [line.split(':', 2)[::2] for line in capsys.readouterr().out.splitlines()]
+    assert [line[-1] for line in lines] == ['spice one', 'spice two', 'Bought spice']
+    assert all('2021-0' in line[0] for line in lines)
+
+@pytest.mark.usefixtures('notebook')
+def test_grep_ignore_case_and_filters(dispatcher, capsys):
+    """Test -i, --collection and --from/--to"""
+    dispatcher.run(['grep', 'spice', '-i', '--collection', 'books'])
+    assert capsys.readouterr().out.rstrip().endswith('The SPICE must flow')
+    dispatcher.run(['grep', 'spice', '--from', '2021-02-01', '-l'])
+    assert capsys.readouterr().out.splitlines() == [
+        '\x1b[34mlog/2021/02-february/2021-02-01/index.md\x1b[0m']
+
+@pytest.mark.usefixtures('notebook')
+def test_grep_no_matches(dispatcher, capsys):
+    """Test a message is shown when nothing matches"""
+    dispatcher.run(['grep', 'saffron'])
+    assert capsys.readouterr().out == 'No matches found\n'
+
+def test_grep_invalid_pattern(dispatcher, capsys):
+    """Test an invalid regex is a usage error"""
+    try:
+        dispatcher.run(['grep', '('])
+    except SystemExit as err:
+        assert err.code == 2
+    assert 'invalid pattern' in capsys.readouterr().err
+
+def test_scan_file_line_numbers(tmp_path):
+    """Test each matching line is reported once with its line number, mmap'd or not"""
+    path = tmp_path / 'big.md'
+    filler = 'x' * 100 + '\n'
+    path.write_text('a match\n' + filler * (grep.MMAP_MIN_SIZE // 100) + 'match, match\r\n')
+    regex = grep.compile_pattern('match')
+    last_line = grep.MMAP_MIN_SIZE // 100 + 2
+    assert grep.scan_file(path, regex) == [(1, 'a match'), (last_line, 'match, match')]
+    assert not grep.scan_file(path, grep.compile_pattern('^$'))
+    assert not grep.scan_file(tmp_path / 'missing.md', regex)
+
+def test_grep_keeps_order_with_many_files(config, filesystem, file_factory):
+    """Test results come back in file order even with more files than the look-ahead window"""
+    from ntbk.export import iter_export_files
+
+    for number in range(50):
+        file_factory(f'collections/notes/{number:03}.md', f'note {number}')
+    files = iter_export_files(config, filesystem, collections=['notes'])
+    results = list(grep.grep(filesystem, files, grep.compile_pattern(r'\d+'),
+        workers=2))
+    assert [matches[0].line for _file, matches in results] == [f'note {n}' for n in range(50)]
@@ -1,7 +1,18 @@
 """Test listing templates, collections, and files"""
+import io
+import json
+import os
+import re
+import sys
+from datetime import date, datetime
 from unittest.mock import call
 from colorama import Fore, Style
 from freezegun import freeze_time
+from ntbk import colors
+from ntbk.entities.collections import Collection
+from ntbk.entities.logs import LogFile
+from ntbk.filesystem import BLANK_CHUNK_SIZE
+from ntbk.indexes.manifest import Manifest
 
 def test_listing_templates(dispatcher, filesystem, mocker):
     """Test 'templates' command lists all templates"""
@@ -39,9 +50,8 @@ def test_listing_collections(dispatcher, filesystem, mocker):
         print.reset_mock()
 
 @freeze_time("2020-01-01")
-def test_listing_log_files_for_day(dispatcher, filesystem, mocker):
+def test_listing_log_files_for_day(dispatcher, filesystem, capsys):
     """Test --list flag on log lists all files"""
-    mocker.patch('builtins.print')
     log_base = filesystem.get_log_base_path()
     day_path = log_base / '2020/01-january/2020-01-01'
     day_path.mkdir(parents=True)
@@ -52,16 +62,13 @@ def test_listing_log_files_for_day(dispatcher, filesystem, mocker):
 
     dispatcher.run(['today', '--list'])
 
-    # With any_order=False we make sure they are printed in this order too
-    print.assert_has_calls([
-        call('index'),
-        call(Fore.BLUE + 'subdir/' + Style.RESET_ALL),
-        call('work')],
-        any_order=False)
+    assert capsys.readouterr().out.splitlines() == [
+        'index',
+        Fore.BLUE + 'subdir/' + Style.RESET_ALL,
+        'work']
 
-def test_listing_collection_files(dispatcher, filesystem, mocker):
+def test_listing_collection_files(dispatcher, filesystem, capsys):
     """test --list flag on collection lists all collection files"""
-    mocker.patch('builtins.print')
     col_base = filesystem.get_collection_base_path()
     col_path = col_base / 'travel'
     col_path.mkdir(parents=True)
@@ -73,17 +80,14 @@ def test_listing_collection_files(dispatcher, filesystem, mocker):
 
     dispatcher.run(['collection', 'travel', '--list'])
 
-    # With any_order=False we make sure they are printed in this order too
-    print.assert_has_calls([
-        call('alaska'),
-        call('montana'),
-        call('utah'),
-        call(Fore.BLUE + 'wyoming/' + Style.RESET_ALL)],
-        any_order=False)
-
-def test_listing_collection_subdir_files(dispatcher, filesystem, mocker):
+    assert capsys.readouterr().out.splitlines() == [
+        'alaska',
+        'montana',
+        'utah',
+        Fore.BLUE + 'wyoming/' + Style.RESET_ALL]
+
+def test_listing_collection_subdir_files(dispatcher, filesystem, capsys):
     """test --list flag on a nested collection lists all files"""
-    mocker.patch('builtins.print')
     col_base = filesystem.get_collection_base_path()
     col_path = col_base / 'travel'
     col_path.mkdir(parents=True)
@@ -95,16 +99,13 @@ def test_listing_collection_subdir_files(dispatcher, filesystem, mocker):
 
     dispatcher.run(['collection', 'travel/wyoming', '--list'])
 
-    # With any_order=False we make sure they are printed in this order too
-    print.assert_has_calls([
-        call('index'),
-        call(Fore.BLUE + 'laramie/' + Style.RESET_ALL)],
-        any_order=False)
+    assert capsys.readouterr().out.splitlines() == [
+        'index',
+        Fore.BLUE + 'laramie/' + Style.RESET_ALL]
 
 @freeze_time("2020-01-01")
-def test_listing_log_subdir_files_for_day(dispatcher, filesystem, mocker):
+def test_listing_log_subdir_files_for_day(dispatcher, filesystem, capsys):
     """Test --list flag on log lists all files"""
-    mocker.patch('builtins.print')
     log_base = filesystem.get_log_base_path()
     day_path = log_base / '2020/01-january/2020-01-01'
     day_path.mkdir(parents=True)
@@ -116,15 +117,12 @@ def test_listing_log_subdir_files_for_day(dispatcher, filesystem, mocker):
     # For LogDate the path is in the file, but must end with a slash
     dispatcher.run(['today', 'journal/', '--list'])
 
-    # With any_order=False we make sure they are printed in this order too
-    print.assert_has_calls([
-        call('evening'),
-        call('morning')],
-        any_order=False)
+    assert capsys.readouterr().out.splitlines() == [
+        'evening',
+        'morning']
 
-def test_listing_collection_subdir_files_recursive(dispatcher, filesystem, mocker):
+def test_listing_collection_subdir_files_recursive(dispatcher, filesystem, capsys):
     """test -lr flag on a nested collection lists all files"""
-    mocker.patch('builtins.print')
     col_base = filesystem.get_collection_base_path()
     col_path = col_base / 'travel'
     col_path.mkdir(parents=True)
@@ -137,20 +135,17 @@ def test_listing_collection_subdir_files_recursive(dispatcher, filesystem, mocke
 
     dispatcher.run(['collection', 'travel', '-lr'])
 
-    # With any_order=False we make sure they are printed in this order too
-    print.assert_has_calls([
-        call('alaska'),
-        call('montana'),
-        call(Fore.BLUE + 'wyoming/' + Style.RESET_ALL),
-        call('wyoming/index'),
-        call(Fore.BLUE + 'wyoming/laramie/' + Style.RESET_ALL),
-        call('wyoming/laramie/restaurants')],
-        any_order=False)
+    assert capsys.readouterr().out.splitlines() == [
+        'alaska',
+        'montana',
+        Fore.BLUE + 'wyoming/' + Style.RESET_ALL,
+        'wyoming/index',
+        Fore.BLUE + 'wyoming/laramie/' + Style.RESET_ALL,
+        'wyoming/laramie/restaurants']
 
 @freeze_time("2020-01-01")
-def test_listing_log_files_for_day_recursive(dispatcher, filesystem, mocker):
+def test_listing_log_files_for_day_recursive(dispatcher, filesystem, capsys):
     """Test -lr flag on log lists all files"""
-    mocker.patch('builtins.print')
     log_base = filesystem.get_log_base_path()
     day_path = log_base / '2020/01-january/2020-01-01'
     day_path.mkdir(parents=True)
@@ -162,18 +157,15 @@ def test_listing_log_files_for_day_recursive(dispatcher, filesystem, mocker):
     # For LogDate the path is in the file, but must end with a slash
     dispatcher.run(['today', '-lr'])
 
-    # With any_order=False we make sure they are printed in this order too
-    print.assert_has_calls([
-        call('index'),
-        call(Fore.BLUE + 'journal/' + Style.RESET_ALL),
-        call('journal/evening'),
-        call('journal/morning')],
-        any_order=False)
+    assert capsys.readouterr().out.splitlines() == [
+        'index',
+        Fore.BLUE + 'journal/' + Style.RESET_ALL,
+        'journal/evening',
+        'journal/morning']
 
 @freeze_time("2020-01-01")
-def test_listing_log_subdir_recursive(dispatcher, filesystem, mocker):
+def test_listing_log_subdir_recursive(dispatcher, filesystem, capsys):
     """Test -lr flag on log subdirectory lists all files in that subdir"""
-    mocker.patch('builtins.print')
     log_base = filesystem.get_log_base_path()
     day_path = log_base / '2020/01-january/2020-01-01'
     day_path.mkdir(parents=True)
@@ -187,10 +179,303 @@ def test_listing_log_subdir_recursive(dispatcher, filesystem, mocker):
     # For LogDate the path is in the file, but must end with a slash
     dispatcher.run(['today', 'journal/', '-lr'])
 
-    # With any_order=False we make sure they are printed in this order too
-    print.assert_has_calls([
-        call(Fore.BLUE + 'afternoon/' + Style.RESET_ALL),
-        call('afternoon/index'),
-        call('evening'),
-        call('morning')],
-        any_order=False)
+    assert capsys.readouterr().out.splitlines() == [
+        Fore.BLUE + 'afternoon/' + Style.RESET_ALL,
+        'afternoon/index',
+        'evening',
+        'morning']
+
+def age_dir(path, seconds=60):
+    """Set a folder's mtime in the past so the manifest will cache its listing"""
+    mtime_ns = path.stat().st_mtime_ns - seconds * 1_000_000_000
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return mtime_ns
+
+def test_listing_collections_uses_manifest(dispatcher, filesystem, mocker):
+    """Test an unchanged folder is listed from the manifest without being read"""
+    mocker.patch('builtins.print')
+    col_path = filesystem.get_collection_base_path()
+    (col_path / 'books').mkdir(parents=True)
+    mtime_ns = age_dir(col_path)
+
+    dispatcher.run(['collections'])
+    assert (filesystem.get_cache_base_path() / 'manifest.json').exists()
+
+    # add a folder behind ntbk's back without changing the mtime - the cached listing is used
+    (col_path / 'recipes').mkdir()
+    os.utime(col_path, ns=(mtime_ns, mtime_ns))
+    scandir = mocker.spy(os, 'scandir')
+    print.reset_mock()
+    dispatcher.run(['collections'])
+
+    scandir.assert_not_called()
+    print.assert_has_calls([call('books')])
+    assert print.call_count == 1
+
+def test_listing_collections_rereads_changed_folder(dispatcher, filesystem, mocker):
+    """Test a folder is read again once its mtime changes"""
+    mocker.patch('builtins.print')
+    col_path = filesystem.get_collection_base_path()
+    (col_path / 'books').mkdir(parents=True)
+    age_dir(col_path)
+    dispatcher.run(['collections'])
+
+    (col_path / 'recipes').mkdir()
+    age_dir(col_path, 30)
+    print.reset_mock()
+    dispatcher.run(['collections'])
+
+    print.assert_has_calls([call('books'), call('recipes')], any_order=False)
+
+def test_recently_modified_folder_not_cached(filesystem):
+    """Test folders changed within the last couple of seconds are not cached"""
+    template_path = filesystem.get_templates_base_path()
+    template_path.mkdir(parents=True)
+    (template_path / 'one.md').touch()
+
+    assert filesystem.list_dir(template_path) == [('one.md', False)]
+    assert str(template_path) not in filesystem.manifest.dirs
+
+def test_recursive_listing_uses_manifest(dispatcher, filesystem, capsys, mocker):
+    """Test -lr only reads the subfolders that changed"""
+    col_path = filesystem.get_collection_base_path() / 'travel'
+    (col_path / 'wyoming').mkdir(parents=True)
+    (col_path / 'utah').mkdir()
+    (col_path / 'wyoming' / 'index.md').touch()
+    for path in (col_path, col_path / 'wyoming', col_path / 'utah'):
+        age_dir(path)
+    dispatcher.run(['collection', 'travel', '-lr'])
+
+    (col_path / 'utah' / 'moab.md').touch()
+    age_dir(col_path / 'utah', 30)
+    scandir = mocker.spy(os, 'scandir')
+    capsys.readouterr()
+    dispatcher.run(['collection', 'travel', '-lr'])
+
+    scandir.assert_called_once_with(col_path / 'utah')
+    assert capsys.readouterr().out.splitlines() == [
+        Fore.BLUE + 'utah/' + Style.RESET_ALL,
+        'utah/moab',
+        Fore.BLUE + 'wyoming/' + Style.RESET_ALL,
+        'wyoming/index']
+
+def test_listing_plain_format(dispatcher, filesystem, capsys):
+    """Test --format plain lists without colors"""
+    col_path = filesystem.get_collection_base_path() / 'travel'
+    (col_path / 'wyoming').mkdir(parents=True)
+    (col_path / 'utah.md').touch()
+
+    dispatcher.run(['collection', 'travel', '--list', '--format', 'plain'])
+
+    assert capsys.readouterr().out.splitlines() == ['utah', 'wyoming/']
+
+def test_listing_json_formats(dispatcher, filesystem, capsys):
+    """Test --format json and ndjson output one object per entry"""
+    col_path = filesystem.get_collection_base_path() / 'travel'
+    (col_path / 'wyoming').mkdir(parents=True)
+    (col_path / 'wyoming' / 'index.md').touch()
+    (col_path / 'utah.md').touch()
+    expected = [
+        {'name': 'utah', 'type': 'file', 'path': str(col_path / 'utah.md')},
+        {'name': 'wyoming', 'type': 'dir', 'path': str(col_path / 'wyoming')},
+        {'name': 'wyoming/index', 'type': 'file', 'path': str(col_path / 'wyoming/index.md')}]
+
+    dispatcher.run(['collection', 'travel', '-lr', '--format', 'json'])
+    assert json.loads(capsys.readouterr().out) == expected
+
+    dispatcher.run(['collection', 'travel', '-lr', '--format', 'ndjson'])
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == expected
+
+def test_listing_empty_json(dispatcher, filesystem, capsys):
+    """Test an empty listing is still valid JSON"""
+    filesystem.get_collection_base_path().joinpath('travel').mkdir(parents=True)
+
+    dispatcher.run(['collection', 'travel', '--list', '--format', 'json'])
+
+    assert json.loads(capsys.readouterr().out) == []
+
+def test_listing_long(dispatcher, filesystem, capsys):
+    """Test --long shows the size, modification time and emptiness of each entry"""
+    col_path = filesystem.get_collection_base_path() / 'travel'
+    (col_path / 'wyoming').mkdir(parents=True)
+    (col_path / 'utah.md').write_text(' \n\n')
+    (col_path / 'wyoming' / 'index.md').write_text('x' * 3000)
+    for path in (col_path / 'utah.md', col_path / 'wyoming', col_path / 'wyoming/index.md'):
+        os.utime(path, (1640000000, 1640000000))
+    mtime = datetime.fromtimestamp(1640000000).strftime('%Y-%m-%d %H:%M')
+
+    dispatcher.run(['collection', 'travel', '-lr', '--long', '--format', 'plain'])
+
+    assert capsys.readouterr().out.splitlines() == [
+        f'     3  {mtime}  utah  (empty)',
+        f'     -  {mtime}  wyoming/',
+        f'  2.9K  {mtime}  wyoming/index']
+
+    dispatcher.run(['collection', 'travel', '--list', '--long', '--format', 'ndjson'])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(record['size'], record['mtime'], record['empty']) for record in records] == [
+        (3, 1640000000, True), (None, 1640000000, None)]
+
+def test_is_empty_reads_past_leading_whitespace(config, filesystem, collection_file):
+    """Test a file is only empty if it has nothing but whitespace, however much of it"""
+    assert collection_file.is_empty() # doesn't exist
+
+    collection_file.get_path().write_text(' \n' * 5000)
+    assert collection_file.is_empty()
+    assert LogFile(config, filesystem, date(2021, 1, 1), 'index').is_empty()
+
+    collection_file.get_path().write_text(' \n' * 5000 + 'text')
+    assert not collection_file.is_empty()
+
+def test_is_empty_ignores_unicode_whitespace(filesystem, collection_file):
+    """Test no-break and ideographic spaces count as whitespace, even split between reads"""
+    path = collection_file.get_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text('\u00a0\n' + ' ' * (BLANK_CHUNK_SIZE - 4) + '\u3000\u3000', encoding='utf-8')
+    assert collection_file.is_empty()
+    assert filesystem.list_metadata(path.parent)[0].empty
+
+    path.write_text(' ' * (BLANK_CHUNK_SIZE - 1) + '\u00e9', encoding='utf-8')
+    assert not collection_file.is_empty()
+
+def test_listing_long_unreadable_entries(dispatcher, filesystem, capsys, mocker):
+    """Test entries that can't be read are shown with a '-' instead of failing the listing"""
+    col_path = filesystem.get_collection_base_path() / 'travel'
+    col_path.mkdir(parents=True)
+    (col_path / 'utah.md').write_text('secret')
+    os.mkfifo(col_path / 'pipe')
+    mocker.patch('ntbk.filesystem._is_blank', side_effect=PermissionError)
+
+    records = filesystem.list_metadata(col_path)
+    assert [(record.name, record.size, record.empty) for record in records] == [
+        ('pipe', None, None), ('utah.md', 6, None)]
+
+    mocker.patch('ntbk.filesystem._get_metadata', side_effect=PermissionError)
+    dispatcher.run(['collection', 'travel', '--list', '--long', '--format', 'plain'])
+    assert [line.split()[:2] for line in capsys.readouterr().out.splitlines()] == \
+        [['-', '-'], ['-', '-']]
+
+def make_collections(filesystem):
+    """Create three collections of different sizes and ages"""
+    col_path = filesystem.get_collection_base_path()
+    files = {'books/dune.md': 'x' * 2000, 'books/fiction/1984.md': 'x' * 100,
+        'recipes/chili.md': 'x' * 10, 'Travel/utah.md': '', 'Travel/notes.txt': 'ignored'}
+    for mtime, (name, content) in enumerate(files.items(), 1640000000):
+        path = col_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        os.utime(path, (mtime, mtime))
+    (col_path / 'empty').mkdir()
+
+def test_collection_stats(dispatcher, filesystem, capsys):
+    """Test 'collections --stats' totals the markdown files of each collection"""
+    make_collections(filesystem)
+    modified = [datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M')
+        for mtime in (1640000001, 1640000002, 1640000003)]
+
+    dispatcher.run(['collections', '--stats'])
+
+    lines = [re.sub(r'\x1b\[\d+m', '', line) for line in capsys.readouterr().out.splitlines()]
+    assert lines == [
+        'collection   files    size  modified',
+        f'books            2    2.1K  {modified[0]}',
+        'empty            0       0  -',
+        f'recipes          1      10  {modified[1]}',
+        f'Travel           1       0  {modified[2]}']
+
+def test_collection_stats_sorting(dispatcher, filesystem, capsys):
+    """Test 'collections --stats' sorts by any column, largest or newest first"""
+    make_collections(filesystem)
+
+    def names(*args):
+        dispatcher.run(['collections', '--stats', *args])
+        lines = capsys.readouterr().out.splitlines()[1:]
+        return [re.sub(r'\x1b\[\d+m', '', line).split()[0] for line in lines]
+
+    assert names('--sort', 'files') == ['books', 'recipes', 'Travel', 'empty']
+    assert names('--sort', 'size') == ['books', 'recipes', 'empty', 'Travel']
+    assert names('--sort', 'modified') == ['Travel', 'recipes', 'books', 'empty']
+    assert names('--sort', 'modified', '--reverse') == ['empty', 'books', 'recipes', 'Travel']
+    assert names('--reverse') == ['Travel', 'recipes', 'empty', 'books']
+
+def test_collection_file_count(config, filesystem):
+    """Test counting the entries of a collection without listing it"""
+    make_collections(filesystem)
+    assert Collection(config, filesystem, 'books').get_file_count() == 2
+    assert Collection(config, filesystem, 'missing').get_file_count() == 0
+
+def test_manifest_keeps_recently_used_folders(filesystem, mocker):
+    """Test the manifest only keeps the most recently used folders"""
+    mocker.patch.object(Manifest, 'MAX_DIRS', 2)
+    col_path = filesystem.get_collection_base_path()
+    folders = [col_path / name for name in ('a', 'b', 'c')]
+    for folder in folders:
+        folder.mkdir(parents=True)
+        age_dir(folder)
+
+    filesystem.list_dir(folders[0])
+    filesystem.list_dir(folders[1])
+    # a cache hit makes 'a' the most recently used, so 'b' is dropped for 'c'
+    filesystem.list_dir(folders[0])
+    filesystem.list_dir(folders[2])
+
+    manifest = Manifest(filesystem)
+    manifest.load()
+    assert list(manifest.dirs) == [str(folders[0]), str(folders[2])]
+
+def test_recursive_listing_does_not_follow_symlinks(dispatcher, filesystem, capsys):
+    """Test a symlink loop in a collection doesn't make -lr recurse forever"""
+    col_path = filesystem.get_collection_base_path() / 'travel'
+    col_path.mkdir(parents=True)
+    (col_path / 'utah.md').touch()
+    (col_path / 'loop').symlink_to(col_path, target_is_directory=True)
+
+    dispatcher.run(['collection', 'travel', '-lr'])
+    assert capsys.readouterr().out.splitlines() == [Fore.BLUE + 'loop/' + Style.RESET_ALL, 'utah']
+
+    dispatcher.run(['collection', 'travel', '-lr', '--long'])
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+def test_symlinked_collection_is_listed(dispatcher, filesystem, capsys, tmp_path):
+    """Test a collection that is a symlink to a folder is listed like any other"""
+    col_path = filesystem.get_collection_base_path()
+    (col_path / 'real/sub').mkdir(parents=True)
+    (col_path / 'real/one.md').write_text('one')
+    (tmp_path / 'elsewhere').mkdir()
+    (tmp_path / 'elsewhere/two.md').write_text('two')
+    (col_path / 'linked').symlink_to(tmp_path / 'elsewhere', target_is_directory=True)
+    (col_path / 'real/link').symlink_to(col_path / 'real/sub', target_is_directory=True)
+    age_dir(col_path)
+
+    for _ in range(2):
+        # the second run lists from the manifest
+        dispatcher.run(['collections'])
+        assert capsys.readouterr().out.splitlines() == ['linked', 'real']
+
+    dispatcher.run(['collections', '--stats'])
+    lines = capsys.readouterr().out.splitlines()
+    assert 'linked' in lines[1] and 'real' in lines[2]
+    assert lines[1].split()[1] == '1'
+
+    dispatcher.run(['collection', 'real', '--list'])
+    assert capsys.readouterr().out.splitlines() == [
+        Fore.BLUE + 'link/' + Style.RESET_ALL, 'one', Fore.BLUE + 'sub/' + Style.RESET_ALL]
+
+def test_listing_to_a_pipe_has_no_colors(dispatcher, filesystem, monkeypatch):
+    """Test colors are stripped when stdout isn't a terminal, as they are for other output"""
+    col_path = filesystem.get_collection_base_path() / 'travel'
+    (col_path / 'sub').mkdir(parents=True)
+    (col_path / 'utah.md').write_text('utah')
+    monkeypatch.setitem(colors._STATE, 'init_on_first_use', True) #pylint: disable=protected-access
+    monkeypatch.setitem(colors._STATE, 'initialized', False) #pylint: disable=protected-access
+    for args in ([], ['--long']):
+        pipe = io.StringIO()
+        monkeypatch.setattr(sys, 'stdout', pipe)
+        monkeypatch.setattr(sys, 'stderr', io.StringIO())
+        monkeypatch.setitem(colors._STATE, 'initialized', False) #pylint: disable=protected-access
+
+        dispatcher.run(['collection', 'travel', '--list', *args])
+
+        assert '\x1b' not in pipe.getvalue()
+        assert pipe.getvalue().splitlines()[0].endswith('sub/')
@@ -1,10 +1,21 @@
 """Tests for log sub-commands"""
 
+# system imports
+import io
+
 # 3rd party imports
 import pytest
 from freezegun import freeze_time
 from colorama import Fore, Style
 
+# app imports
+from ntbk.exceptions import FileLockTimeoutException
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 
 @freeze_time("2021-12-30")
 def test_no_args_opens_today(dispatcher, ntbk_dir):
@@ -167,3 +178,62 @@ def test_jot_other_file_timestamped(dispatcher, ntbk_dir, mocker):
     dispatcher.run(['jot', 'hello world', 'work', '-s'])
     assert expected_path.read_text() == '\n\n[10:15 AM]\nhello world'
     print.assert_called_once_with(f"{Fore.GREEN}Jotted note to today's work file{Style.RESET_ALL}")
+
+@freeze_time("2021-12-30 10:15 AM")
+def test_jot_from_stdin(dispatcher, ntbk_dir, mocker):
+    """Test jotting every line from stdin with a single write"""
+    mocker.patch('builtins.print')
+    mocker.patch('sys.stdin', io.StringIO('first note\n\nsecond note\n'))
+    append = mocker.spy(dispatcher.filesystem, 'append_to_file')
+    expected_path = ntbk_dir / 'log/2021/12-december/2021-12-30/index.md'
+    dispatcher.run(['jot', '-', '-s'])
+    assert expected_path.read_text() == '\n\n[10:15 AM]\nfirst note\n\n[10:15 AM]\nsecond note'
+    append.assert_called_once()
+    print.assert_called_once_with(
+        f"{Fore.GREEN}Jotted 2 notes to today's index file{Style.RESET_ALL}")
+
+@freeze_time("2021-12-30")
+def test_jot_ndjson_from_stdin(dispatcher, ntbk_dir, mocker):
+    """Test NDJSON notes are grouped by their file and date"""
+    mocker.patch('builtins.print')
+    mocker.patch('sys.stdin', io.StringIO(
+        '{"text": "one"}\n'
+        '{"text": "two", "file": "work"}\n'
+        '{"text": "three", "timestamp": "2021-12-01T08:30:00"}\n'
+        '{"text": "four"}\n'))
+    append = mocker.spy(dispatcher.filesystem, 'append_to_file')
+    dispatcher.run(['jot', '-', '--ndjson'])
+    log_base = ntbk_dir / 'log/2021/12-december'
+    assert (log_base / '2021-12-30/index.md').read_text() == '\n\none\n\nfour'
+    assert (log_base / '2021-12-30/work.md').read_text() == '\n\ntwo'
+    assert (log_base / '2021-12-01/index.md').read_text() == '\n\n[08:30 AM]\nthree'
+    assert append.call_count == 3
+    print.assert_any_call(f"{Fore.GREEN}Jotted 1 note to 2021-12-01's index file{Style.RESET_ALL}")
+
+def test_jot_invalid_ndjson(dispatcher, mocker):
+    """Test invalid NDJSON stops the program before anything is written"""
+    mocker.patch('sys.stdin', io.StringIO('{"text": "one"}\nnot json\n'))
+    append = mocker.spy(dispatcher.filesystem, 'append_to_file')
+    with pytest.raises(SystemExit):
+        dispatcher.run(['jot', '-', '--ndjson'])
+    append.assert_not_called()
+
+def test_jot_ndjson_wrong_type(dispatcher, mocker, capsys):
+    """Test a value of the wrong type is reported with its line number, not a traceback"""
+    mocker.patch('sys.stdin', io.StringIO('{"text": "one"}\n{"text": "two", "date": 20240101}\n'))
+    with pytest.raises(SystemExit):
+        dispatcher.run(['jot', '-', '--ndjson'])
+    assert 'invalid NDJSON on line 2: "date" must be a string' in capsys.readouterr().err
+
+@pytest.mark.skipif(fcntl is None, reason='advisory locks need fcntl')
+@freeze_time("2021-12-30", tick=True) # the lock timeout needs the clock to move
+def test_jot_waits_for_lock_timeout(dispatcher, ntbk_dir):
+    """Test jotting gives up when another process holds the file's lock for too long"""
+    dispatcher.config.set('lock_timeout', 0.05)
+    path = ntbk_dir / 'log/2021/12-december/2021-12-30/index.md'
+    path.parent.mkdir(parents=True)
+    with path.open('a') as other_writer:
+        fcntl.flock(other_writer, fcntl.LOCK_EX)
+        with pytest.raises(FileLockTimeoutException):
+            dispatcher.run(['jot', 'hello world'])
+    assert path.read_text() == ''
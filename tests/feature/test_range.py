@@ -0,0 +1,77 @@
+"""Tests for the 'range' command and walking the log by date range"""
+
+# system imports
+import os
+from datetime import date
+from unittest.mock import call
+
+# 3rd party imports
+import pytest
+from colorama import Fore, Style
+
+# app imports
+from ntbk.entities.logs import iter_log_dates
+
+
+def test_iter_log_dates_in_order_and_range(config, filesystem, file_factory):
+    """Test only days inside the range are returned, in date order"""
+    for day in ('2020-12-31', '2021-02-01', '2021-01-15', '2021-03-01', '2022-01-01'):
+        file_factory(day=day)
+    (filesystem.get_log_base_path() / 'notes.txt').touch() # ignored
+
+    logdates = iter_log_dates(config, filesystem, date(2021, 1, 1), date(2021, 2, 28))
+
+    assert [logdate.get_date() for logdate in logdates] == [date(2021, 1, 15), date(2021, 2, 1)]
+
+def test_iter_log_dates_skips_other_years(config, filesystem, mocker, file_factory):
+    """Test years outside of the range are never read"""
+    for day in ('2019-06-01', '2021-06-01'):
+        file_factory(day=day)
+    scandir = mocker.spy(os, 'scandir')
+
+    assert len(list(iter_log_dates(config, filesystem, date(2021, 1, 1), date(2021, 12, 31)))) == 1
+    assert len(scandir.call_args_list) == 3 # log/, log/2021/, log/2021/06-june/
+
+def test_range_list(dispatcher, filesystem, mocker, file_factory):
+    """Test listing the files for a range of days"""
+    mocker.patch('builtins.print')
+    for day in ('2021-01-01', '2021-01-03', '2021-02-01'):
+        file_factory(day=day)
+    (filesystem.get_log_base_path() / '2021/01-january/2021-01-03/work').mkdir()
+
+    dispatcher.run(['range', '2021-01-01', '2021-01-31', '--list'])
+
+    print.assert_has_calls([
+        call('2021-01-01 index'),
+        call('2021-01-03 index'),
+        call('2021-01-03 ' + Fore.BLUE + 'work/' + Style.RESET_ALL)],
+        any_order=False)
+    assert print.call_count == 3
+
+def test_range_find(dispatcher, mocker, file_factory):
+    """Test finding the paths of a file for a range of days"""
+    mocker.patch('builtins.print')
+    paths = [file_factory(day=day) for day in ('2021-01-01', '2021-01-03')]
+
+    dispatcher.run(['range', '2021-01-01', '2021-01-31', 'index', '--find'])
+
+    print.assert_has_calls([call(path) for path in paths], any_order=False)
+
+def test_range_backwards_fails(dispatcher):
+    """Test the start date can't be after the end date"""
+    with pytest.raises(SystemExit):
+        dispatcher.run(['range', '2021-02-01', '2021-01-01'])
+
+def test_range_reads_each_day_once(dispatcher, mocker, file_factory):
+    """Test each day folder is read with one os.scandir and nothing is stat'ed"""
+    mocker.patch('builtins.print')
+    for number in range(1, 11):
+        file_factory(day=f'2021-01-{number:02}')
+    scandir = mocker.spy(os, 'scandir')
+    stat = mocker.spy(os, 'stat')
+
+    dispatcher.run(['range', '2021-01-01', '2021-12-31', '--list'])
+
+    assert print.call_count == 10
+    assert scandir.call_count == 13 # log/, log/2021/, log/2021/01-january/ and the 10 days
+    stat.assert_not_called()
@@ -0,0 +1,114 @@
+"""Tests for the most recently used files list and the 'recent' command"""
+
+# system imports
+import os
+import re
+
+# 3rd party imports
+import pytest
+
+# app imports
+from ntbk.filesystem import Filesystem
+from ntbk.recent import RecentFiles
+
+
+def recent_paths(dispatcher, capsys, *args):
+    """Run 'recent' and get the listed paths"""
+    dispatcher.run(['recent', *args])
+    lines = [re.sub(r'\x1b\[\d+m', '', line) for line in capsys.readouterr().out.splitlines()]
+    return [line.split()[3] for line in lines]
+
+def test_recent_lists_used_files(dispatcher, filesystem, capsys):
+    """Test files that are jotted to, created and opened are listed, most recent first"""
+    dispatcher.run(['jot', 'a note'])
+    # the editor is mocked in tests, so send the event it would have sent
+    filesystem.notify_listeners('open', filesystem.get_collection_base_path() / 'books/dune.md')
+    dispatcher.run(['jot', 'another note', 'work'])
+    capsys.readouterr()
+
+    paths = recent_paths(dispatcher, capsys)
+
+    assert len(paths) == 3
+    assert paths[0].endswith('/work.md')
+    assert paths[1] == 'collections/books/dune.md'
+    assert paths[2].endswith('/index.md')
+
+def test_recent_limit_and_empty(dispatcher, filesystem, capsys):
+    """Test -n limits the list and an empty list shows a message"""
+    dispatcher.run(['recent'])
+    assert capsys.readouterr().out == 'No recent files\n'
+
+    for number in range(5):
+        filesystem.create_file(filesystem.get_collection_base_path() / f'n/{number}.md', '')
+    assert recent_paths(dispatcher, capsys, '-n', '2') == \
+        ['collections/n/4.md', 'collections/n/3.md']
+
+    for number in ('0', '-3'):
+        with pytest.raises(SystemExit):
+            dispatcher.run(['recent', '-n', number])
+        assert '--number must be at least 1' in capsys.readouterr().err
+
+def test_recent_list_is_bounded(filesystem, mocker):
+    """Test the list never grows past MAX_ENTRIES and each file is listed once"""
+    mocker.patch.object(RecentFiles, 'MAX_ENTRIES', 3)
+    recent = RecentFiles(filesystem)
+    paths = [filesystem.get_collection_base_path() / f'n/{number}.md' for number in range(5)]
+    for path in paths + [paths[2]]:
+        recent.on_file_used('append', path)
+
+    assert [entry.path for entry in recent.get_entries()] == [paths[2], paths[4], paths[3]]
+    assert len(recent.get_path().read_text().splitlines()) == 3
+    # events not caused by ntbk using the file aren't recorded
+    recent.on_file_used('change', paths[0])
+    assert len(recent.get_entries()) == 3
+
+def test_recent_open(dispatcher, filesystem, capsys):
+    """Test --open K opens the K-th most recent file"""
+    first = filesystem.get_collection_base_path() / 'books/first.md'
+    second = filesystem.get_collection_base_path() / 'books/second.md'
+    filesystem.create_file(first, '')
+    filesystem.create_file(second, '')
+
+    dispatcher.run(['recent', '--open', '2'])
+    filesystem.open_file_in_editor.assert_called_with(first)
+
+    for number in ('3', '0', '-1'):
+        with pytest.raises(SystemExit):
+            dispatcher.run(['recent', '--open', number])
+        assert f'there is no recent file number {number}' in capsys.readouterr().err
+
+def test_opening_in_editor_is_recorded(config, tmp_path):
+    """Test files opened in the editor are recorded, without re-indexing them"""
+    config.set('editor', 'true')
+    filesystem = Filesystem(config)
+    recent = RecentFiles(filesystem)
+    filesystem.add_listener(recent.on_file_used)
+    path = tmp_path / 'collections/books/dune.md'
+
+    filesystem.open_file_in_editor(path)
+
+    assert [(entry.path, entry.event) for entry in recent.get_entries()] == [(path, 'open')]
+
+def test_recent_reconcile(dispatcher, filesystem, capsys):
+    """Test --reconcile moves files edited outside of ntbk up and drops deleted ones"""
+    col_base = filesystem.get_collection_base_path()
+    paths = [col_base / 'n/edited.md', col_base / 'n/deleted.md', col_base / 'n/latest.md']
+    for path in paths:
+        filesystem.create_file(path, '')
+    paths[1].unlink()
+    future_ns = dispatcher.recent_files.get_entries()[0].time_ns + 1_000_000_000
+    os.utime(paths[0], ns=(future_ns, future_ns))
+
+    assert recent_paths(dispatcher, capsys) == \
+        ['collections/n/latest.md', 'collections/n/deleted.md', 'collections/n/edited.md']
+    assert recent_paths(dispatcher, capsys, '--reconcile') == \
+        ['collections/n/edited.md', 'collections/n/latest.md']
+    assert dispatcher.recent_files.get_entries()[0].event == 'edit'
+
+def test_bulk_created_files_are_not_recorded(dispatcher, filesystem, capsys):
+    """Test pre-creating a range of logs doesn't push the files actually used out"""
+    filesystem.create_file(filesystem.get_collection_base_path() / 'books/dune.md', '')
+    dispatcher.run(['create', '--from', '2022-01-01', '--to', '2022-04-30'])
+    capsys.readouterr()
+
+    assert recent_paths(dispatcher, capsys) == ['collections/books/dune.md']
@@ -0,0 +1,104 @@
+"""Tests for the 'search' command and the search index"""
+
+# system imports
+from datetime import date
+
+# 3rd party imports
+import pytest
+from colorama import Fore, Style
+from freezegun import freeze_time
+
+# app imports
+from ntbk.exceptions import InvalidSearchQueryException
+from ntbk.indexes.search import quote_query
+
+
+def test_search_ranks_hits(dispatcher, filesystem, mocker, file_factory):
+    """Test searching prints matching files, best match first"""
+    mocker.patch('builtins.print')
+    log_base = filesystem.get_log_base_path()
+    col_base = filesystem.get_collection_base_path()
+    once = file_factory(log_base / '2021/01-january/2021-01-01/index.md', 'read dune today')
+    twice = file_factory(col_base / 'books/dune.md', 'dune is a book. dune again')
+    file_factory(col_base / 'books/1984.md', 'nothing to see here')
+
+    dispatcher.run(['search', 'dune'])
+
+    printed = [c.args[0] for c in print.call_args_list]
+    assert printed[0] == f'{Fore.BLUE}{twice}{Style.RESET_ALL}'
+    assert printed[2] == f'{Fore.BLUE}{once}{Style.RESET_ALL}'
+    assert len(printed) == 4
+
+def test_search_date_and_collection_filters(dispatcher, filesystem, file_factory):
+    """Test --from/--to and --collection narrow down the results"""
+    log_base = filesystem.get_log_base_path()
+    col_base = filesystem.get_collection_base_path()
+    file_factory(log_base / '2020/12-december/2020-12-31/index.md', 'coffee')
+    jan = file_factory(log_base / '2021/01-january/2021-01-02/index.md', 'coffee')
+    fiction = file_factory(col_base / 'books/fiction/dune.md', 'coffee')
+    file_factory(col_base / 'recipes/index.md', 'coffee')
+    index = dispatcher.search_index
+    index.refresh()
+
+    hits = index.search('coffee', date_from=date(2021, 1, 1), date_to=date(2021, 1, 31))
+    assert [hit.path for hit in hits] == [jan]
+    hits = index.search('coffee', collection='books')
+    assert [hit.path for hit in hits] == [fiction]
+
+def test_refresh_is_incremental(dispatcher, filesystem, file_factory):
+    """Test refreshing only re-indexes files that changed and drops deleted files"""
+    col_base = filesystem.get_collection_base_path()
+    file_factory(col_base / 'books/dune.md', 'spice')
+    removed = file_factory(col_base / 'books/1984.md', 'big brother')
+    index = dispatcher.search_index
+
+    assert index.refresh() == (2, 0)
+    assert index.refresh() == (0, 0)
+    removed.unlink()
+    assert index.refresh() == (0, 1)
+    assert index.search('brother') == []
+
+@freeze_time('2021-12-30')
+def test_jot_updates_existing_index(dispatcher, mocker):
+    """Test jotting to a file updates the index without needing a refresh"""
+    mocker.patch('builtins.print')
+    index = dispatcher.search_index
+    index.refresh()
+    dispatcher.run(['jot', 'remember the milk'])
+    assert len(index.search('milk')) == 1
+
+def test_jot_does_not_build_index(dispatcher, mocker):
+    """Test writing files doesn't create the index if it was never built"""
+    mocker.patch('builtins.print')
+    dispatcher.run(['jot', 'remember the milk'])
+    assert not dispatcher.search_index.exists()
+
+def test_invalid_query(dispatcher):
+    """Test a malformed query raises a friendly exception"""
+    dispatcher.search_index.refresh()
+    with pytest.raises(InvalidSearchQueryException):
+        dispatcher.search_index.search('"unbalanced')
+
+@pytest.mark.parametrize('text, expected', [
+    ('foo-bar', '"foo-bar"'),
+    ('c++ follow-up', '"c++" "follow-up"'),
+    ('dune OR "frank herbert"', '"dune" OR "frank herbert"'),
+    ('herb* NOT spice', '"herb"* NOT "spice"'),
+    ('"unbalanced', '"""unbalanced"'),
+])
+def test_quote_query(text, expected):
+    """Test each word is quoted, keeping phrases, operators and prefixes"""
+    assert quote_query(text) == expected
+
+def test_search_with_punctuation(dispatcher, capsys, file_factory):
+    """Test words with punctuation are searched for, and --raw uses FTS5 syntax as it is"""
+    path = file_factory('collections/work/notes.md', 'plan the follow-up with foo-bar')
+
+    for query in (['follow-up'], ['foo-bar'], ['"unbalanced']):
+        dispatcher.run(['search', *query])
+    out = capsys.readouterr().out
+    assert out.count(str(path)) == 2
+    assert out.endswith('No results found\n')
+
+    with pytest.raises(InvalidSearchQueryException):
+        dispatcher.run(['search', '--raw', 'foo-bar'])
@@ -0,0 +1,173 @@
+"""
+Tests for running commands through `ntbk serve` with the thin client
+"""
+
+import io
+import threading
+from pathlib import Path
+import pytest
+from freezegun import freeze_time
+from ntbk import client, main, server
+from ntbk.dispatcher import Dispatcher
+from ntbk.exceptions import ServerRunningException
+from tests.conftest import FAKE_TODAY
+
+pytestmark = pytest.mark.skipif(not hasattr(server.socket, 'AF_UNIX'),
+    reason="Unix sockets are not available")
+
+
+@pytest.fixture(name='socket_path')
+def socket_path_fixture(config, tmp_path):
+    """Start a server for the test config in a thread and return its socket path"""
+    config.set('editor', 'vim')
+    socket_path = str(tmp_path / 'ntbk.sock')
+    app = server.App(Dispatcher, tmp_path / '.config/ntbk/ntbk.yml')
+    ntbk_server = server.Server(socket_path, app)
+    thread = threading.Thread(target=ntbk_server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield socket_path
+    ntbk_server.shutdown()
+    ntbk_server.server_close()
+    thread.join()
+
+
+def run_client(socket_path, argv, stdin=''):
+    """Forward the command and return (exit code, stdout, stderr)"""
+    out, err = io.BytesIO(), io.BytesIO()
+    code = client.forward(argv, socket_path, io.StringIO(stdin), out, err)
+    return code, out.getvalue().decode(), err.getvalue().decode()
+
+
+def test_forward_without_server_returns_none(tmp_path):
+    """Test the client falls back to running in-process when no server is running"""
+    assert client.forward(['today'], str(tmp_path / 'missing.sock')) is None
+
+
+def test_forward_with_stale_socket_returns_none(tmp_path):
+    """Test a socket file left behind by a dead server is ignored"""
+    stale = server.socket.socket(server.socket.AF_UNIX, server.socket.SOCK_STREAM)
+    stale.bind(str(tmp_path / 'stale.sock'))
+    stale.close()
+    assert client.forward(['today'], str(tmp_path / 'stale.sock')) is None
+
+
+@freeze_time(FAKE_TODAY)
+def test_jot_is_run_by_server(socket_path, ntbk_dir):
+    """Test jot runs on the server and its output comes back to the client"""
+    code, out, err = run_client(socket_path, ['jot', 'hello from the client'])
+
+    assert (code, err) == (0, '')
+    assert "Jotted note to today's index file" in out
+    path = ntbk_dir / 'log/2021/12-december/2021-12-30/index.md'
+    assert path.read_text() == '\n\nhello from the client'
+
+
+@freeze_time(FAKE_TODAY)
+def test_jot_stdin_is_forwarded(socket_path, ntbk_dir):
+    """Test 'jot -' sends the client's stdin to the server"""
+    code, out, _err = run_client(socket_path, ['jot', '-'], stdin='one\ntwo\n')
+
+    assert code == 0
+    assert "Jotted 2 notes to today's index file" in out
+    path = ntbk_dir / 'log/2021/12-december/2021-12-30/index.md'
+    assert path.read_text() == '\n\none\n\ntwo'
+
+
+@freeze_time(FAKE_TODAY)
+def test_editor_is_opened_by_client(socket_path, ntbk_dir, mocker):
+    """Test the client opens the file in the editor instead of the server"""
+    run = mocker.patch('subprocess.run')
+    code, _out, _err = run_client(socket_path, ['today'])
+
+    assert code == 0
+    path = ntbk_dir / 'log/2021/12-december/2021-12-30/index.md'
+    run.assert_called_once_with(['vim', str(path)])
+
+
+def test_argument_errors_are_returned(socket_path):
+    """Test argparse errors come back on stderr with argparse's exit code"""
+    code, _out, err = run_client(socket_path, ['date', 'not-a-date'])
+
+    assert code == 2
+    assert 'not-a-date' in err
+
+
+def test_find_output_is_streamed_back(socket_path, ntbk_dir):
+    """Test output is streamed back the same as running in-process"""
+    code, out, _err = run_client(socket_path, ['date', '2021-01-01', '--find'])
+
+    assert code == 0
+    assert Path(out.strip()) == ntbk_dir / 'log/2021/01-january/2021-01-01/index.md'
+
+
+@freeze_time(FAKE_TODAY)
+def test_config_changes_are_picked_up(socket_path, config, ntbk_dir):
+    """Test the server rebuilds the app when the config file changes"""
+    run_client(socket_path, ['jot', 'first'])
+    config.set('default_filename', 'notes')
+    run_client(socket_path, ['jot', 'second'])
+
+    day = ntbk_dir / 'log/2021/12-december/2021-12-30'
+    assert (day / 'index.md').read_text() == '\n\nfirst'
+    assert (day / 'notes.md').read_text() == '\n\nsecond'
+
+
+@freeze_time(FAKE_TODAY)
+def test_invalid_config_is_reported(socket_path, config, ntbk_dir):
+    """Test an invalid config edit is reported on every command until it's fixed"""
+    config.set('ntbk_dir', '')
+    for _ in range(2):
+        code, _out, err = run_client(socket_path, ['jot', 'lost'])
+        assert code == 1
+        assert err.startswith('Configuration file is not valid.')
+        assert 'Traceback' not in err
+
+    config.set('ntbk_dir', str(ntbk_dir))
+    code, _out, _err = run_client(socket_path, ['jot', 'kept'])
+    assert code == 0
+    assert (ntbk_dir / 'log/2021/12-december/2021-12-30/index.md').read_text() == '\n\nkept'
+
+
+@freeze_time(FAKE_TODAY)
+def test_new_notebook_folder_is_created(socket_path, config, tmp_path):
+    """Test moving the notebook in the config creates the new notebook's folders"""
+    config.set('ntbk_dir', str(tmp_path / 'moved'))
+    code, _out, _err = run_client(socket_path, ['jot', 'moved'])
+
+    assert code == 0
+    assert (tmp_path / 'moved/_templates/log_default.md').exists()
+    assert (tmp_path / 'moved/log/2021/12-december/2021-12-30/index.md').exists()
+
+
+def test_server_refuses_socket_in_use(socket_path):
+    """Test a second server won't take over the socket of a running one"""
+    with pytest.raises(ServerRunningException):
+        server.Server(socket_path, None)
+
+
+def test_socket_is_private(socket_path):
+    """Test only the owner can talk to the server"""
+    assert Path(socket_path).stat().st_mode & 0o777 == 0o600
+
+
+@freeze_time(FAKE_TODAY)
+def test_long_running_commands_are_refused(socket_path, ntbk_dir):
+    """Test the server won't run 'watch', which would block it for every other command"""
+    code, _out, err = run_client(socket_path, ['watch'])
+    assert code == 1
+    assert "ntbk watch can't be run by the server" in err
+
+    code, _out, _err = run_client(socket_path, ['jot', 'not blocked'])
+    assert code == 0
+    assert (ntbk_dir / 'log/2021/12-december/2021-12-30/index.md').exists()
+
+
+def test_long_running_commands_are_not_forwarded(mocker):
+    """Test 'watch' and 'serve' run in the client's process even when a server is running"""
+    forward = mocker.patch('ntbk.client.forward', return_value=0)
+    run_in_process = mocker.patch('ntbk.main.run_in_process')
+    for argv in (['watch'], ['serve']):
+        mocker.patch('sys.argv', ['ntbk', *argv])
+        main.run()
+        run_in_process.assert_called_with(argv)
+    forward.assert_not_called()
@@ -0,0 +1,84 @@
+"""Tests for the 'stats' command and the per-day stats store"""
+
+# system imports
+import json
+from datetime import date
+
+# 3rd party imports
+import pytest
+from freezegun import freeze_time
+
+
+def test_reconcile_totals(dispatcher, file_factory):
+    """Test per-day, per-month and per-year totals"""
+    file_factory(content='one two', day='2020-12-31')
+    file_factory(content='one two three', day='2021-01-01')
+    file_factory('work.md', 'four', day='2021-01-01')
+    file_factory(content='five six', day='2021-03-05')
+    stats = dispatcher.stats_index
+
+    assert stats.reconcile() == 3
+    assert stats.reconcile() == 0
+    totals = stats.to_dict()
+    assert totals['years'] == {
+        '2020': {'files': 1, 'bytes': 7, 'words': 2},
+        '2021': {'files': 3, 'bytes': 25, 'words': 6}}
+    assert totals['months']['2021-01'] == {'files': 2, 'bytes': 17, 'words': 4}
+    assert list(totals['days']) == ['2020-12-31', '2021-01-01', '2021-03-05']
+
+def test_reconcile_picks_up_outside_changes(dispatcher, file_factory):
+    """Test edits and deletes made outside of ntbk are found by reconcile"""
+    edited = file_factory(content='one', day='2021-01-01')
+    deleted = file_factory(content='one', day='2021-01-02')
+    stats = dispatcher.stats_index
+    stats.reconcile()
+
+    edited.write_text('one two three')
+    deleted.unlink()
+    deleted.parent.rmdir()
+
+    assert stats.reconcile() == 2
+    assert stats.get_totals(date(2021, 1, 1), date(2021, 12, 31))['words'] == 3
+
+@pytest.mark.parametrize('cut', [1, 5, 20, 33])
+def test_corrupt_stats_file_is_rebuilt(dispatcher, cut, file_factory):
+    """Test a truncated stats file is treated as missing and rebuilt"""
+    file_factory(content='one two', day='2021-01-01')
+    stats = dispatcher.stats_index
+    stats.reconcile()
+    stats.get_path().write_bytes(stats.get_path().read_bytes()[:cut])
+
+    stats.load()
+    assert stats.start is None
+    assert stats.reconcile() == 1
+    assert stats.get_totals(date(2021, 1, 1), date(2021, 1, 1))['words'] == 2
+
+@freeze_time('2021-12-30')
+def test_jot_updates_existing_stats(dispatcher, mocker):
+    """Test jotting updates the stats store without a reconcile"""
+    mocker.patch('builtins.print')
+    stats = dispatcher.stats_index
+    stats.reconcile()
+    dispatcher.run(['jot', 'hello world'])
+    stats.load()
+    assert stats.get_totals(date(2021, 12, 30), date(2021, 12, 30))['words'] == 2
+
+@freeze_time('2021-12-30')
+def test_stats_json(dispatcher, capsys, file_factory):
+    """Test the --json output"""
+    file_factory(content='hello world', day='2021-06-01')
+    dispatcher.run(['stats', '--json'])
+    output = json.loads(capsys.readouterr().out)
+    assert output['days'] == {'2021-06-01': {'files': 1, 'bytes': 11, 'words': 2}}
+
+@freeze_time('2021-12-30')
+def test_stats_heatmap(dispatcher, capsys, file_factory):
+    """Test the heatmap shades the busiest day darkest"""
+    file_factory(content='word ' * 100, day='2021-01-04') # a monday
+    file_factory(content='word', day='2021-01-05') # a tuesday
+    dispatcher.run(['stats'])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith('    Jan')
+    assert lines[1].startswith('Mon   ██')
+    assert lines[2].startswith('      ░░')
+    assert lines[-1] == '2021: 2 files, 101 words, 504 bytes on 2 days'
@@ -0,0 +1,81 @@
+"""Tests for the 'tags' and 'tag' commands and the tag index"""
+
+# system imports
+import re
+from datetime import date
+
+# 3rd party imports
+import pytest
+
+# app imports
+from ntbk.indexes.tags import find_tags
+
+
+@pytest.fixture(name='notebook')
+def notebook_fixture(file_factory):
+    """Create two log days and a collection file with tags"""
+    return [
+        file_factory(content='Call with @Alice about #ntbk\n', day='2021-02-01'),
+        file_factory(content='nothing\nworked on #ntbk/tags and #ntbk\n#other_thing\n',
+            day='2021-01-01'),
+        file_factory('collections/people/alice.md',
+            '# Alice\nmail alice@example.com\n```\n#include <stdio.h>\n```\n'),
+    ]
+
+def test_find_tags():
+    """Test tags are found per line, lowercased, skipping emails, urls and code blocks"""
+    body = '# Heading\n#One and #one, @bob.\nsee http://x.org/#anchor a@b.com\n' \
+        '```\n#code\n```\n#two-words/nested-tag'
+    assert list(find_tags(body)) == [
+        (2, '#one', '#One and #one, @bob.'), (2, '@bob', '#One and #one, @bob.'),
+        (7, '#two-words/nested-tag', '#two-words/nested-tag')]
+
+@pytest.mark.usefixtures('notebook')
+def test_tags_counts(dispatcher, capsys):
+    """Test 'tags' lists every tag with its line and file counts, most used first"""
+    dispatcher.run(['tags'])
+    output = re.sub(r'\x1b\[\d+m', '', capsys.readouterr().out)
+    assert output.splitlines() == [
+        '#ntbk             2 in 2 files',
+        '#ntbk/tags        1 in 1 file',
+        '#other_thing      1 in 1 file',
+        '@alice            1 in 1 file']
+
+@pytest.mark.usefixtures('notebook')
+def test_tags_since(dispatcher, capsys):
+    """Test --since only counts later log days"""
+    dispatcher.run(['tags', '--since', '2021-02-01'])
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+@pytest.mark.usefixtures('notebook')
+def test_tag_lines_in_date_order(dispatcher, capsys):
+    """Test 'tag' shows every tagged line in date order, including nested tags"""
+    dispatcher.run(['tag', 'ntbk'])
+    lines = [line.rsplit(':', 1)[-1] for line in capsys.readouterr().out.splitlines()]
+    assert lines == ['worked on #ntbk/tags and #ntbk', 'Call with @Alice about #ntbk']
+
+@pytest.mark.usefixtures('notebook')
+def test_tag_without_matches(dispatcher, capsys):
+    """Test a message is shown for unknown tags and that #other doesn't match #other_thing"""
+    dispatcher.run(['tag', '#other'])
+    assert capsys.readouterr().out == 'No lines tagged #other\n'
+
+@pytest.mark.usefixtures('notebook')
+def test_jot_is_indexed_at_once(dispatcher, mocker):
+    """Test jotting updates an existing tag index without a refresh"""
+    dispatcher.tag_index.refresh()
+    refresh = mocker.spy(dispatcher.tag_index, 'refresh')
+    mocker.patch('ntbk.helpers.get_date_object_for_alias', return_value=date(2021, 3, 1))
+    dispatcher.run(['jot', 'met @bob'])
+    assert refresh.call_count == 0
+    assert [line.text for line in dispatcher.tag_index.get_lines('@bob')] == ['met @bob']
+
+def test_tag_index_picks_up_outside_changes(dispatcher, file_factory, notebook):
+    """Test changed and deleted files are re-indexed on refresh"""
+    index = dispatcher.tag_index
+    index.refresh()
+    path = file_factory('collections/people/alice.md', 'now with #tag and a longer body')
+    notebook[0].unlink()
+    assert index.refresh() == (1, 1)
+    assert [line.path for line in index.get_lines('tag')] == [path]
+    assert not index.get_lines('alice')
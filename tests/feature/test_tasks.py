@@ -0,0 +1,103 @@
+"""Tests for the 'tasks' command, the task index and the open_tasks template variable"""
+
+# system imports
+import re
+from datetime import date
+
+# 3rd party imports
+import pytest
+from freezegun import freeze_time
+
+# app imports
+from ntbk.indexes.tasks import find_tasks
+
+
+@pytest.fixture(name='notebook')
+def notebook_fixture(file_factory):
+    """Create two log days and a collection file with tasks"""
+    return [
+        file_factory(content='# Friday\n- [ ] buy milk\n- [ ] call bob due:2021-01-05\n'
+            '- [x] write tests\n', day='2021-01-01'),
+        file_factory(content='- [x] buy milk\n* [ ] fix #ntbk bug due:2022-01-01\n'
+            '- [>] call bob due:2021-01-05\n', day='2021-01-02'),
+        file_factory('collections/books/list.md', '+ [ ] read dune\n'),
+    ]
+
+def run(dispatcher, capsys, args):
+    """Run a command and get its output lines without colors"""
+    dispatcher.run(args)
+    return re.sub(r'\x1b\[\d+m', '', capsys.readouterr().out).splitlines()
+
+def test_find_tasks():
+    """Test tasks are found with their state and due date"""
+    body = 'intro\n- [ ] a due:2021-02-03\n  * [X] b\n- [-] c\n- [>] d\n- [] not a task\n-[ ] nor'
+    assert list(find_tasks(body)) == [(2, 'open', 'a due:2021-02-03', '2021-02-03'),
+        (3, 'done', 'b', None), (4, 'cancelled', 'c', None), (5, 'migrated', 'd', None)]
+
+def test_impossible_due_date_is_ignored(dispatcher, capsys, file_factory):
+    """Test a due date that matches the pattern but isn't a real date is treated as none"""
+    assert list(find_tasks('- [ ] pay rent due:2021-02-30')) == \
+        [(1, 'open', 'pay rent due:2021-02-30', None)]
+
+    file_factory(content='- [ ] pay rent due:2021-02-30\n', day='2021-01-01')
+    dispatcher.run(['tasks'])
+    assert 'pay rent due:2021-02-30' in capsys.readouterr().out
+
+@pytest.mark.usefixtures('notebook')
+def test_tasks_lists_all_in_date_order(dispatcher, capsys):
+    """Test 'tasks' lists every task, logs in date order"""
+    lines = run(dispatcher, capsys, ['tasks'])
+    assert [line.split(': ', 1)[1] for line in lines] == [
+        '[ ] buy milk', '[ ] call bob due:2021-01-05', '[x] write tests', '[x] buy milk',
+        '[ ] fix #ntbk bug due:2022-01-01', '[>] call bob due:2021-01-05', '[ ] read dune']
+    assert lines[0] == 'log/2021/01-january/2021-01-01/index.md:2: [ ] buy milk'
+
+@pytest.mark.usefixtures('notebook')
+def test_tasks_open_uses_latest_copy(dispatcher, capsys):
+    """Test --open only shows tasks whose latest copy is still open"""
+    lines = run(dispatcher, capsys, ['tasks', '--open'])
+    assert [line.split(': ', 1)[1] for line in lines] == [
+        '[ ] fix #ntbk bug due:2022-01-01', '[ ] read dune']
+
+@freeze_time('2022-01-02')
+@pytest.mark.usefixtures('notebook')
+def test_tasks_overdue(dispatcher, capsys):
+    """Test --overdue only shows open tasks due before today"""
+    assert run(dispatcher, capsys, ['tasks', '--overdue']) == [
+        'log/2021/01-january/2021-01-02/index.md:2: [ ] fix #ntbk bug due:2022-01-01']
+
+def test_tasks_none(dispatcher, capsys):
+    """Test a message is shown without any tasks"""
+    assert run(dispatcher, capsys, ['tasks', '--open']) == ['No tasks found']
+
+@pytest.mark.usefixtures('notebook')
+def test_open_tasks_template_variable(dispatcher, filesystem, template_factory):
+    """Test a new day's log can carry forward the open tasks of earlier days"""
+    template = template_factory(
+        content='{% for task in open_tasks %}- [ ] {{ task.text }}\n{% endfor %}')
+    dispatcher.run(['date', '2021-01-03', '-t', template.get_name()])
+    path = filesystem.get_log_date_path(date(2021, 1, 3)) / 'index.md'
+    assert path.read_text() == '- [ ] fix #ntbk bug due:2022-01-01\n'
+
+@pytest.mark.usefixtures('notebook')
+def test_open_tasks_only_from_earlier_logs(template_factory):
+    """Test open_tasks only includes logs before the log being rendered"""
+    template = template_factory(content='{{ open_tasks | map(attribute="text") | join(",") }}')
+    template.set_extra_vars({'log_date': date(2021, 1, 2)})
+    assert template.render() == 'buy milk,call bob due:2021-01-05'
+
+def test_open_tasks_not_read_if_unused(filesystem, template_factory, mocker):
+    """Test templates that don't use open_tasks never touch the task index"""
+    refresh = mocker.patch('ntbk.indexes.tasks.TaskIndex.refresh')
+    template = template_factory(content='no tasks here')
+    assert template.render() == 'no tasks here'
+    assert refresh.call_count == 0
+    assert not (filesystem.get_cache_base_path() / 'tasks.db').exists()
+
+@pytest.mark.usefixtures('notebook')
+def test_jot_task_is_indexed_at_once(dispatcher, mocker):
+    """Test a jotted task is in an existing index without a refresh"""
+    dispatcher.task_index.refresh()
+    mocker.patch('ntbk.helpers.get_date_object_for_alias', return_value=date(2021, 3, 1))
+    dispatcher.run(['jot', '- [ ] new task'])
+    assert dispatcher.task_index.get_open_tasks(logs_only=True)[-1].text == 'new task'
@@ -1,6 +1,11 @@
 """Test using templates with commands"""
 
+import os
+from pathlib import Path
+import pytest
 from freezegun import freeze_time
+from ntbk.entities.templates import Template, get_environment
+from ntbk.variables import get_referenced_names
 
 @freeze_time('2021-01-01')
 def test_creating_new_log_with_default_template(dispatcher, ntbk_dir, template_factory):
@@ -115,3 +120,97 @@ def test_template_that_doesnt_exist(dispatcher, ntbk_dir, mocker):
     print.assert_called_once_with('Template "does-not-exist" not found.')
     dispatcher.filesystem.open_file_in_editor.assert_called_with(expected_file)
     assert expected_file.read_text() == ''
+
+def test_templates_share_compiled_environment(filesystem, template_factory):
+    """Test templates in the same folder share one jinja2 environment and bytecode cache"""
+    template = template_factory(content='{{ today_iso }}')
+    other = template_factory(name='other', content='other')
+    template.render()
+    other.render()
+    assert get_environment(filesystem) is get_environment(filesystem)
+    assert len(list((filesystem.get_cache_base_path() / 'jinja').iterdir())) == 2
+
+def test_changed_template_is_recompiled(template_factory):
+    """Test editing a template file is picked up even though compiled templates are cached"""
+    template = template_factory(content='before')
+    assert template.render() == 'before'
+    template_file = template.get_path().with_suffix('.md')
+    template_file.write_text('after')
+    stat = template_file.stat()
+    os.utime(template_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert template.render() == 'after'
+
+def test_only_used_variables_are_computed(config, template_factory, mocker):
+    """Test variables the template doesn't reference (even via includes) aren't computed"""
+    counter = config.get('ntbk_dir') + '/calls.txt'
+    config.set('template_vars', {
+        'branch': {'command': f'echo x >> {counter}; echo main', 'ttl': 0}})
+    get_task_variables = mocker.spy(Template, 'get_task_variables')
+
+    template = template_factory(content='{{ today_iso }}')
+    template.render()
+    assert not os.path.exists(counter)
+    assert get_task_variables.call_count == 0
+
+    template_factory(name='footer', content='on {{ branch }}')
+    template = template_factory(content='{% include "footer.md" %}')
+    assert template.render() == 'on main'
+    assert template.render() == 'on main'
+    # ttl 0 - the command runs every time
+    assert Path(counter).read_text(encoding='utf-8') == 'x\nx\n'
+
+def test_provider_values_are_cached(config, filesystem, template_factory):
+    """Test command and file providers, and that values are reused for their ttl"""
+    counter = config.get('ntbk_dir') + '/calls.txt'
+    (filesystem.get_notebook_base_path() / 'weather.json').write_text('{"sky": "sunny"}')
+    config.set('template_vars', {
+        'branch': {'command': f'echo x >> {counter}; echo main'},
+        'weather': {'file': 'weather.json', 'json': True},
+        'plain': {'command': 'not a provider', 'other': 'key'}})
+    template = template_factory(content='{{ branch }} {{ weather.sky }} {{ plain.other }}')
+
+    assert template.render() == 'main sunny key'
+    assert template.render() == 'main sunny key'
+    assert Path(counter).read_text(encoding='utf-8') == 'x\n'
+
+    # changing the provider's config invalidates its cached value
+    config.set('template_vars', {'branch': {'command': 'echo dev'}})
+    assert template_factory(name='other', content='{{ branch }}').render() == 'dev'
+
+def test_failed_provider_renders_empty(config, template_factory, capsys):
+    """Test a failing command renders as an empty string with a warning"""
+    config.set('template_vars', {'branch': {'command': 'exit 3'}})
+    template = template_factory(content='[{{ branch }}]')
+
+    assert template.render() == '[]'
+    assert 'Template variable "branch" could not be read: exit status 3' in \
+        capsys.readouterr().err
+
+@pytest.mark.parametrize('provider, message', [
+    ({'command': 'echo main', 'ttl': '5m'}, '"ttl" must be a number of seconds'),
+    ({'command': 'echo main', 'timeout': None, 'ttl': -1}, '"ttl" must be a number of seconds'),
+    ({'command': 'echo main', 'timeout': 'soon'}, '"timeout" must be a number of seconds'),
+    ({'file': ['weather.txt']}, '"file" must be a string'),
+    ({'command': 'echo main', 'json': 'yes'}, '"json" must be true or false'),
+])
+def test_invalid_provider_renders_empty(config, template_factory, capsys, provider, message):
+    """Test a provider with values of the wrong type renders empty with a warning"""
+    config.set('template_vars', {'branch': provider})
+    template = template_factory(content='[{{ branch }}]')
+
+    assert template.render() == '[]'
+    assert f'Template variable "branch" could not be read: {message}' in capsys.readouterr().err
+
+@freeze_time('2026-10-18 14:13:09')
+def test_changed_template_is_analyzed_again(filesystem, template_factory):
+    """Test the cached variable names are refreshed when the template file changes"""
+    template = template_factory(content='{{ today_iso }}')
+    template.render()
+    template_file = template.get_path().with_suffix('.md')
+    template_file.write_text('{{ today_long }} {{ now_iso }}')
+    stat = template_file.stat()
+    os.utime(template_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert get_referenced_names(get_environment(filesystem), filesystem,
+        'test_template.md') == {'today_long', 'now_iso'}
+    assert template.render() == 'Sunday, October 18, 2026 2026-10-18T14:13:09'
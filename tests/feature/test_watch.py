@@ -0,0 +1,151 @@
+"""Tests for the 'watch' command and the file watchers"""
+
+# system imports
+import os
+import threading
+import time
+
+# 3rd party imports
+import pytest
+
+# app imports
+from ntbk import watcher
+from ntbk.exceptions import WatcherRunningException
+
+
+def wait_for_changes(file_watcher, expected, timeout=5.0):
+    """Read changes until all the expected paths were reported (or timeout)"""
+    changed = set()
+    deadline = time.monotonic() + timeout
+    while not expected <= changed and time.monotonic() < deadline:
+        changed |= file_watcher.read_changes(0.1) or set()
+    return changed
+
+class FakeWatcher():
+    """Watcher returning a scripted list of read_changes results"""
+    name = 'fake'
+
+    def __init__(self, results, stop):
+        self.results = list(results)
+        self.stop = stop
+        self.closed = False
+
+    def read_changes(self, _timeout):
+        """Return the next scripted result, stopping the watch once they run out"""
+        if not self.results:
+            self.stop.set()
+            return set()
+        return self.results.pop(0)
+
+    def close(self):
+        """Record that the watcher was closed"""
+        self.closed = True
+
+@pytest.fixture(name='inotify')
+def inotify_fixture(filesystem):
+    """Return an InotifyWatcher for the notebook, skipping where inotify isn't available"""
+    filesystem.get_log_base_path().mkdir(parents=True, exist_ok=True)
+    filesystem.get_collection_base_path().mkdir(parents=True, exist_ok=True)
+    if not watcher.InotifyWatcher.is_available():
+        pytest.skip('inotify is only available on Linux')
+    file_watcher = watcher.InotifyWatcher(filesystem)
+    yield file_watcher
+    file_watcher.close()
+
+def test_inotify_reports_changed_files(inotify, filesystem, file_factory):
+    """Test created, modified and deleted notebook files are reported, other files aren't"""
+    col_base = filesystem.get_collection_base_path()
+    dune = file_factory(col_base / 'books/dune.md', 'spice')
+    file_factory(filesystem.get_cache_base_path() / 'other.md', 'not in the notebook')
+    file_factory(col_base / 'books/notes.txt', 'not markdown')
+    assert wait_for_changes(inotify, {dune}) == {dune}
+
+    dune.write_text('more spice')
+    assert wait_for_changes(inotify, {dune}) == {dune}
+    dune.unlink()
+    assert wait_for_changes(inotify, {dune}) == {dune}
+
+def test_inotify_follows_folders(inotify, filesystem, file_factory):
+    """Test files in new folders are reported, and moving a folder reports its files
+    under both the old and the new path"""
+    day = filesystem.get_log_base_path() / '2021/01-january/2021-01-01'
+    index = file_factory(day / 'index.md', 'hello')
+    assert wait_for_changes(inotify, {index}) == {index}
+
+    moved = filesystem.get_collection_base_path() / 'old-log'
+    os.rename(day.parent.parent, moved)
+    moved_index = moved / '01-january/2021-01-01/index.md'
+    assert wait_for_changes(inotify, {index, moved_index}) == {index, moved_index}
+
+    moved_index.write_text('changed')
+    assert wait_for_changes(inotify, {moved_index}) == {moved_index}
+
+def test_polling_reports_changed_files(filesystem, file_factory):
+    """Test the polling fallback finds created, modified and deleted files"""
+    col_base = filesystem.get_collection_base_path()
+    dune = file_factory(col_base / 'books/dune.md', 'spice')
+    emma = file_factory(col_base / 'books/emma.md', 'austen')
+    file_watcher = watcher.PollingWatcher(filesystem, interval=0)
+    assert file_watcher.read_changes(0) == set()
+
+    dune.write_text('more spice')
+    emma.unlink()
+    new = file_factory(col_base / 'recipes/chili.md', 'beans')
+    assert file_watcher.read_changes(0) == {dune, emma, new}
+
+def test_collect_batch_debounces(filesystem):
+    """Test bursts of changes are merged into one batch, and lost events ask for a resync"""
+    one, two = filesystem.get_log_base_path() / 'one.md', filesystem.get_log_base_path() / 'two.md'
+    stop = threading.Event()
+    fake = FakeWatcher([{one}, {two}, set(), {one}, None], stop)
+    assert watcher.collect_batch(fake, 0, 10) == {one, two}
+    assert watcher.collect_batch(fake, 0, 10) is None
+
+def test_watch_pushes_changes_to_listeners(dispatcher, filesystem, mocker, file_factory):
+    """Test changed files are sent to the indexes and lost events resync everything"""
+    path = file_factory(filesystem.get_collection_base_path() / 'books/dune.md', '#scifi')
+    dispatcher.tag_index.refresh()
+    path.write_text('#fantasy')
+    resync = mocker.Mock()
+    batches = []
+    stop = threading.Event()
+    fake = FakeWatcher([{path}, set(), None], stop)
+
+    watcher.watch(filesystem, fake, on_batch=batches.append, resync=resync, stop=stop)
+
+    assert [count.tag for count in dispatcher.tag_index.get_counts()] == ['#fantasy']
+    assert batches == [{path}]
+    assert resync.call_count == 1
+    assert fake.closed
+    assert not watcher.get_pidfile_path(filesystem).exists()
+
+def test_indexes_not_rescanned_while_watching(dispatcher, filesystem, mocker, capsys, file_factory):
+    """Test commands skip checking the notebook for changes while the watcher runs"""
+    file_factory(filesystem.get_collection_base_path() / 'books/dune.md', '#scifi - [ ] read')
+    dispatcher.run(['tags'])
+    refresh = mocker.spy(dispatcher.tag_index, 'refresh')
+    pidfile = watcher.get_pidfile_path(filesystem)
+    pidfile_fd = watcher._lock_pidfile(pidfile) #pylint: disable=protected-access
+    assert watcher.is_running(filesystem)
+
+    dispatcher.run(['tags'])
+    assert refresh.call_count == 0
+    assert '#scifi' in capsys.readouterr().out
+
+    # a pid file left behind by a killed watcher isn't locked, even if its pid is in use
+    os.close(pidfile_fd)
+    assert pidfile.read_text() == str(os.getpid())
+    assert not watcher.is_running(filesystem)
+    dispatcher.run(['tags'])
+    assert refresh.call_count == 1
+
+def test_second_watcher_is_refused(filesystem):
+    """Test only one watcher can run for a notebook at a time"""
+    stop = threading.Event()
+    first = FakeWatcher([], stop)
+    pidfile_fd = watcher._lock_pidfile(watcher.get_pidfile_path(filesystem)) #pylint: disable=protected-access
+
+    with pytest.raises(WatcherRunningException):
+        watcher.watch(filesystem, first, stop=stop)
+    assert first.closed
+    os.close(pidfile_fd)
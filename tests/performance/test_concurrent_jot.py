@@ -0,0 +1,59 @@
+"""
+Stress test for many processes appending to the same log file at once.
+Every process appends records bigger than the pipe buffer, so a non-atomic append would
+interleave or tear them. Size it with NTBK_STRESS_PROCESSES, NTBK_STRESS_JOTS and
+NTBK_STRESS_MIN_RATE (appends/second that must be reached), and run with -s to see the rate.
+"""
+
+# system imports
+import multiprocessing
+import os
+import re
+import time
+from pathlib import Path
+
+# app imports
+from ntbk.config import Config
+from ntbk.filesystem import Filesystem
+
+PROCESSES = int(os.environ.get('NTBK_STRESS_PROCESSES', 8))
+JOTS = int(os.environ.get('NTBK_STRESS_JOTS', 100))
+MIN_RATE = float(os.environ.get('NTBK_STRESS_MIN_RATE', 100))
+
+# bigger than PIPE_BUF (4096 on linux), the most a plain write is guaranteed atomic for
+PAYLOAD_SIZE = 10_000
+
+RECORD = re.compile(r'<(\d+):(\d+)>(x+)</\1:\2>\n')
+
+
+def jot_many(ntbk_dir, worker):
+    """Append JOTS records to the same file (runs in a separate process)"""
+    config = Config({'ntbk_dir': ntbk_dir, 'editor': 'true'}, Path(ntbk_dir) / 'ntbk.yml')
+    filesystem = Filesystem(config)
+    path = filesystem.get_log_base_path() / 'stress.md'
+    for jot in range(JOTS):
+        filesystem.append_to_file(path, f'<{worker}:{jot}>' + 'x' * PAYLOAD_SIZE +
+            f'</{worker}:{jot}>\n')
+
+
+def test_concurrent_appends_are_atomic(tmp_path):
+    """Test N processes x M jots to one file leaves every record whole and in order"""
+    context = multiprocessing.get_context('spawn')
+    started = time.perf_counter()
+    with context.Pool(PROCESSES) as pool:
+        pool.starmap(jot_many, [(str(tmp_path), worker) for worker in range(PROCESSES)])
+    elapsed = time.perf_counter() - started
+
+    content = (tmp_path / 'log' / 'stress.md').read_text()
+    records = RECORD.findall(content)
+    assert len(records) == PROCESSES * JOTS
+    assert sum(len(match.group(0)) for match in RECORD.finditer(content)) == len(content)
+    assert all(len(payload) == PAYLOAD_SIZE for _worker, _jot, payload in records)
+    for worker in range(PROCESSES):
+        jots = [int(jot) for record_worker, jot, _payload in records
+            if int(record_worker) == worker]
+        assert jots == list(range(JOTS))
+
+    rate = PROCESSES * JOTS / elapsed
+    print(f'\n{PROCESSES} processes x {JOTS} jots: {rate:.0f} appends/s')
+    assert rate >= MIN_RATE
@@ -0,0 +1,78 @@
+"""
+Cold-start budget for the ntbk entry point.
+Runs the app in a fresh interpreter with `python -X importtime` and fails if the commands
+import modules they don't need, or if the time spent importing exceeds the budget.
+The budget can be raised on slow machines with the NTBK_STARTUP_BUDGET_MS env var.
+"""
+
+# system imports
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# 3rd party imports
+import pytest
+import yaml
+
+PROJECT_ROOT = Path(__file__).parents[2]
+
+# milliseconds spent importing modules, on top of what a bare interpreter imports
+STARTUP_BUDGET_MS = float(os.environ.get('NTBK_STARTUP_BUDGET_MS', 100))
+
+# import times are noisy, so the best of this many runs is compared against the budget
+RUNS = 3
+
+# modules that must not be imported for each command
+FORBIDDEN_MODULES = {
+    '--help': ['jinja2', 'yaml', 'colorama', 'sqlite3', 'subprocess'],
+    'jot': ['jinja2', 'yaml', 'sqlite3', 'subprocess', 'shutil'],
+}
+
+
+def import_times(args, env):
+    """Run python -X importtime with the given args and return a dict of module -> self usecs"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', *args],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(self_us)
+    return times
+
+
+@pytest.fixture(name='home_env')
+def home_env_fixture(tmp_path):
+    """Environment with HOME pointing at a temporary, already configured, notebook"""
+    config_file = tmp_path / '.config/ntbk/ntbk.yml'
+    config_file.parent.mkdir(parents=True)
+    config_file.write_text(yaml.dump({
+        'ntbk_dir': str(tmp_path / 'ntbk'),
+        'editor': 'true',
+        'default_filename': 'index',
+        'template_dir': '_templates',
+        'default_templates': {},
+        'template_vars': {}
+    }))
+    (tmp_path / 'ntbk' / 'log').mkdir(parents=True)
+    return dict(os.environ, HOME=str(tmp_path), PYTHONPATH=str(PROJECT_ROOT))
+
+
+@pytest.mark.parametrize('command', [['--help'], ['jot', 'hello']])
+def test_startup_budget(command, home_env):
+    """Test ntbk only imports what the command needs and stays within the import budget"""
+    baseline = import_times(['-c', 'pass'], home_env)
+    # the first run parses the yaml config and caches it, like the first run after editing it
+    import_times(['-m', 'ntbk.main', *command], home_env)
+    spent_ms = []
+    for _ in range(RUNS):
+        times = import_times(['-m', 'ntbk.main', *command], home_env)
+        for module in FORBIDDEN_MODULES[command[0]]:
+            assert module not in times, f'{module} imported by ntbk {command[0]}'
+        spent_ms.append(sum(us for name, us in times.items() if name not in baseline) / 1000)
+
+    spent_ms = min(spent_ms)
+    assert spent_ms < STARTUP_BUDGET_MS, \
+        f'ntbk {command[0]} spent {spent_ms:.1f}ms importing (budget {STARTUP_BUDGET_MS}ms)'
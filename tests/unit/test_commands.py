@@ -0,0 +1,58 @@
+"""Tests for the declarative command registry"""
+from ntbk import commands
+from ntbk.dispatcher import Dispatcher
+
+def test_select_invoked_command():
+    """Test only the invoked command is selected, by name or alias"""
+    assert commands.select_commands(['jot', 'hello']) == (commands.COMMANDS_BY_NAME['jot'],)
+    assert commands.select_commands(['tod', '-l']) == (commands.COMMANDS_BY_NAME['today'],)
+    assert commands.select_commands(['today', '--help']) == (commands.COMMANDS_BY_NAME['today'],)
+
+def test_select_no_commands_without_args():
+    """Test no subparsers are needed to default to today's log"""
+    assert not commands.select_commands([])
+
+def test_select_all_commands_for_help_and_unknown_commands():
+    """Test help and errors get every command so they can list them"""
+    assert commands.select_commands(['--help']) == commands.COMMANDS
+    assert commands.select_commands(['-h', 'today']) == commands.COMMANDS
+    assert commands.select_commands(['bogus']) == commands.COMMANDS
+
+def test_every_command_has_a_handler():
+    """Test each command's handler exists on the Dispatcher"""
+    for command in commands.COMMANDS:
+        assert callable(getattr(Dispatcher, command.handler))
+
+def test_log_commands_share_arguments():
+    """Test the log and collection commands get the same file arguments"""
+    flags = [
+        [argument.flags for argument in commands.COMMANDS_BY_NAME[name].arguments][-8:]
+        for name in ('today', 'yesterday', 'tomorrow', 'date', 'collection')]
+    assert all(command_flags == flags[0] for command_flags in flags)
+
+def test_dispatcher_builds_only_invoked_subparser(dispatcher, mocker):
+    """Test running a command only builds that command's subparser, once"""
+    mocker.patch('builtins.print')
+    dispatcher.run(['templates'])
+    parser = dispatcher.parser
+
+    assert set(dispatcher.subparsers.choices) == {'templates'}
+    dispatcher.run(['templates'])
+    assert dispatcher.parser is parser
+
+def test_cached_parser_keeps_its_subparsers(dispatcher, mocker):
+    """Test a cached parser is used with its own subparsers, not the last ones built"""
+    mocker.patch('builtins.print')
+    dispatcher.run(['templates'])
+    dispatcher.run(['collections'])
+    dispatcher.run(['templates'])
+
+    assert set(dispatcher.subparsers.choices) == {'templates'}
+    assert dispatcher.subparsers in dispatcher.parser._subparsers._group_actions #pylint: disable=protected-access
+
+def test_default_filename_from_config(dispatcher, config, mocker):
+    """Test file arguments default to the configured default_filename"""
+    config.set('default_filename', 'notes')
+    handler = mocker.patch.object(Dispatcher, 'handle_logfile_command')
+    dispatcher.run(['today'])
+    assert handler.call_args[0][0].file == 'notes'
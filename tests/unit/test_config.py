@@ -0,0 +1,64 @@
+"""Tests for the Config class"""
+
+import yaml
+
+from ntbk.config import Config
+
+
+def write_config(path, values):
+    """Write a yaml config file for the tests"""
+    path.write_text(yaml.dump(values))
+
+def test_load_reuses_parsed_cache(tmp_path, mocker):
+    """Test the yaml is not parsed again while the config file is unchanged"""
+    config_file = tmp_path / 'ntbk.yml'
+    write_config(config_file, {'ntbk_dir': '~/ntbk', 'editor': 'vim'})
+    assert Config(file_path=config_file).get('editor') == 'vim'
+    assert Config(file_path=config_file).get_cache_path().exists()
+
+    mocker.patch('yaml.load', side_effect=AssertionError('yaml parsed'))
+    assert Config(file_path=config_file).get('editor') == 'vim'
+
+def test_changed_config_file_invalidates_cache(tmp_path):
+    """Test editing the config file outside of ntbk is picked up"""
+    config_file = tmp_path / 'ntbk.yml'
+    write_config(config_file, {'editor': 'vim'})
+    Config(file_path=config_file)
+    write_config(config_file, {'editor': 'emacs'})
+    assert Config(file_path=config_file).get('editor') == 'emacs'
+
+def test_set_updates_file_and_cache(tmp_path, mocker):
+    """Test Config.set writes both the yaml and a cache that matches it"""
+    config_file = tmp_path / 'ntbk.yml'
+    conf = Config({'ntbk_dir': '~/ntbk'}, config_file)
+    conf.set('editor', 'nano')
+    assert yaml.safe_load(config_file.read_text())['editor'] == 'nano'
+
+    mocker.patch('yaml.load', side_effect=AssertionError('yaml parsed'))
+    assert Config(file_path=config_file).get('editor') == 'nano'
+
+def test_values_marshal_cant_store_skip_cache(tmp_path):
+    """Test configs containing dates still load, they just aren't cached"""
+    config_file = tmp_path / 'ntbk.yml'
+    config_file.write_text('editor: vim\nstarted: 2021-01-01\n')
+    conf = Config(file_path=config_file)
+    assert conf.get('started').isoformat() == '2021-01-01'
+    assert not conf.get_cache_path().exists()
+
+def test_edit_while_parsing_is_not_cached(tmp_path, mocker):
+    """Test a config parsed while the file was being edited isn't cached as the new file"""
+    config_file = tmp_path / 'ntbk.yml'
+    write_config(config_file, {'editor': 'vim'})
+    real_load = yaml.load
+
+    def load_then_edit(file, Loader): #pylint: disable=invalid-name
+        values = real_load(file, Loader=Loader)
+        write_config(config_file, {'editor': 'emacs, the longer name'})
+        return values
+
+    mocker.patch('yaml.load', side_effect=load_then_edit)
+    conf = Config(file_path=config_file)
+    assert conf.get('editor') == 'vim'
+    assert not conf.get_cache_path().exists()
+    mocker.stopall()
+    assert Config(file_path=config_file).get('editor') == 'emacs, the longer name'
@@ -1,7 +1,7 @@
 """Tests for helper functions"""
 
 import argparse
-from datetime import date
+from datetime import date, datetime
 
 import pytest
 from freezegun import freeze_time
@@ -51,3 +51,59 @@ def test_arparse_valid_iso_date_fails():
     """Test argparse_valid_iso_date() fails with non-iso date"""
     with pytest.raises(argparse.ArgumentTypeError):
         helpers.argparse_valid_iso_date('01/01/2021')
+
+def test_format_jot():
+    """Test formatting a jotted note with and without a timestamp"""
+    assert helpers.format_jot('note') == '\n\nnote'
+    assert helpers.format_jot('note', datetime(2021, 1, 1, 13, 5)) == '\n\n[01:05 PM]\nnote'
+
+def test_parse_ndjson_jot():
+    """Test parsing an NDJSON jot uses the timestamp's day when no date is given"""
+    entry = helpers.parse_ndjson_jot('{"text": "hi", "timestamp": "2021-01-02T09:00:00"}')
+    assert entry == {'text': 'hi', 'file': None,
+        'timestamp': datetime(2021, 1, 2, 9), 'date': date(2021, 1, 2)}
+
+def test_parse_ndjson_jot_requires_text():
+    """Test NDJSON jots without text are rejected"""
+    with pytest.raises(ValueError):
+        helpers.parse_ndjson_jot('{"file": "work"}')
+
+@pytest.mark.parametrize('line', [
+    '{"text": "hi", "date": 20240101}',
+    '{"text": "hi", "file": ["work"]}',
+    '{"text": 5}',
+])
+def test_parse_ndjson_jot_checks_types(line):
+    """Test values of the wrong type are rejected with a ValueError"""
+    with pytest.raises(ValueError):
+        helpers.parse_ndjson_jot(line)
+
+def test_parse_create_manifest_csv():
+    """Test CSV manifest rows, with extra columns as variables and empty cells skipped"""
+    lines = ['collection,file,template,title\n', 'books,dune,,Dune\n', 'books,emma,novel,\n']
+    assert helpers.parse_create_manifest(lines, 'csv') == [
+        {'collection': 'books', 'file': 'dune', 'template': None, 'vars': {'title': 'Dune'}},
+        {'collection': 'books', 'file': 'emma', 'template': 'novel', 'vars': {}}]
+
+def test_parse_create_manifest_ndjson():
+    """Test NDJSON manifest rows, with variables in a 'vars' object"""
+    lines = ['{"collection": "books", "file": "dune", "vars": {"title": "Dune"}}\n', '\n']
+    assert helpers.parse_create_manifest(lines, 'ndjson') == [
+        {'collection': 'books', 'file': 'dune', 'template': None, 'vars': {'title': 'Dune'}}]
+
+def test_parse_create_manifest_reports_line():
+    """Test invalid rows are reported with their line number"""
+    with pytest.raises(ValueError, match='line 3'):
+        helpers.parse_create_manifest(['collection,file\n', 'a,b\n', 'c,\n'], 'csv')
+    with pytest.raises(ValueError, match='line 2'):
+        helpers.parse_create_manifest(['{"collection": "a", "file": "b"}\n', '{\n'], 'ndjson')
+
+@pytest.mark.parametrize('line', [
+    '{"collection": "a", "file": "b", "template": 3}',
+    '{"collection": ["a"], "file": "b"}',
+    '{"collection": "a", "file": 5}',
+])
+def test_parse_create_manifest_checks_types(line):
+    """Test NDJSON values of the wrong type are rejected with the line number"""
+    with pytest.raises(ValueError, match='line 2: .* must be a string'):
+        helpers.parse_create_manifest(['{"collection": "a", "file": "b"}\n', line], 'ndjson')
@@ -0,0 +1,65 @@
+"""Tests for the --profile timing spans"""
+import io
+import pstats
+from ntbk import profiling
+
+def test_parse_args_removes_profile_option(monkeypatch):
+    """Test --profile is taken out of the args wherever it is"""
+    monkeypatch.delenv('NTBK_PROFILE', raising=False)
+    assert profiling.parse_args(['today', '--list']) == (['today', '--list'], None)
+    assert profiling.parse_args(['--profile', 'today']) == (['today'], '1')
+    assert profiling.parse_args(['jot', 'hi', '--profile=out.prof']) == (['jot', 'hi'], 'out.prof')
+
+def test_parse_args_reads_environment(monkeypatch):
+    """Test NTBK_PROFILE turns on profiling, and --profile overrides it"""
+    monkeypatch.setenv('NTBK_PROFILE', 'env.prof')
+    assert profiling.parse_args(['today']) == (['today'], 'env.prof')
+    assert profiling.parse_args(['--profile', 'today']) == (['today'], '1')
+
+def test_parse_args_environment_off(monkeypatch):
+    """Test NTBK_PROFILE=0 (or false/no/off) leaves profiling off"""
+    for value in ('0', 'false', 'No', 'off', ''):
+        monkeypatch.setenv('NTBK_PROFILE', value)
+        assert profiling.parse_args(['today']) == (['today'], None)
+    monkeypatch.setenv('NTBK_PROFILE', 'TRUE')
+    assert profiling.parse_args(['today']) == (['today'], '1')
+
+def test_span_does_nothing_when_disabled():
+    """Test spans aren't recorded unless profiling was started"""
+    with profiling.span('phase') as phase_span:
+        pass
+    assert phase_span is profiling.span('other')
+
+def test_timing_table():
+    """Test nested spans are reported under their parent with their call counts"""
+    out = io.StringIO()
+    profiling.start('1')
+    with profiling.span('run command'):
+        for _ in range(3):
+            with profiling.span('list folder'):
+                pass
+    profiling.finish(out)
+
+    lines = out.getvalue().splitlines()
+    assert lines[0].split() == ['phase', 'calls', 'ms', '%']
+    assert lines[1].split()[:2] == ['run', 'command']
+    assert lines[1].split()[2] == '1'
+    assert lines[2].startswith('  list folder')
+    assert lines[2].split()[2] == '3'
+    assert lines[3].startswith('total')
+    assert len(lines) == 4
+
+def test_profile_file_and_peak_memory(tmp_path):
+    """Test --profile=FILE writes cProfile stats and reports peak memory"""
+    out = io.StringIO()
+    output = tmp_path / 'run.prof'
+    profiling.start(str(output))
+    with profiling.span('allocate'):
+        data = [str(number) for number in range(10000)]
+    profiling.finish(out)
+
+    assert data
+    assert 'peak memory' in out.getvalue()
+    assert pstats.Stats(str(output)).total_calls > 0
+    # profiling is off again afterwards
+    assert profiling.span('phase') is profiling.span('other')